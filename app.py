@@ -1,26 +1,79 @@
+import time
+
+# import 시작 시각 (import-to-ready 시간 측정용)
+IMPORT_STARTED_AT = time.perf_counter()
+
 from flask import (
-    Flask, render_template, request, jsonify, send_file
+    Flask, Response, g, has_request_context, render_template, request, jsonify, send_file, send_from_directory
 )
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import inspect, text
-import yt_dlp
+from sqlalchemy import event, inspect, or_, text
+from sqlalchemy.engine import Engine
+import atexit
+import bisect
+import gzip
+import hashlib
+import hmac
+import itertools
 import os
+import shutil
+import signal
 import socket
+import sqlite3
 import threading
 import subprocess
+import sys
 import tempfile
+import json
+import math
+import operator
+import random
+import re
+import urllib.request
 import wave
-from datetime import datetime
-from queue import Queue
+import zipfile
+from array import array
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from queue import Empty, PriorityQueue, Queue
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # --- 다운로더 설정 (기존) ---
 DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', './downloads')
+# 작업별 임시 디렉터리 (같은 파일시스템이어야 완료 파일 이동이 원자적이다)
+JOB_WORK_FOLDER = os.path.join(DOWNLOAD_FOLDER, '.jobs')
 MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', 3))
+# 재사용 YoutubeDL 풀 (추출기/서명 캐시/HTTP 연결 유지). 캐시 디렉터리는 재시작 후에도 유지된다.
+YTDL_CACHE_DIR = os.getenv('YTDL_CACHE_DIR', os.path.join(DOWNLOAD_FOLDER, '.cache', 'yt-dlp'))
+YTDL_POOL_SIZE = int(os.getenv('YTDL_POOL_SIZE', MAX_CONCURRENT_DOWNLOADS + 2))
+YTDL_POOL_MAX_USES = int(os.getenv('YTDL_POOL_MAX_USES', 50))
+# 풀의 다운로드 인스턴스마다 두는 출력 디렉터리 (작업 디렉터리를 옮겨 오므로 JOB_WORK_FOLDER와 같은 파일시스템)
+YTDL_CONTEXT_FOLDER = os.path.join(DOWNLOAD_FOLDER, '.ytdl')
+# 적응형 동시성 제어 (429/403/저속 신호에 따라 MAX_CONCURRENT_DOWNLOADS 이하로 자동 조절)
+DOWNLOAD_MIN_CONCURRENCY = int(os.getenv('DOWNLOAD_MIN_CONCURRENCY', 1))
+DOWNLOAD_CONCURRENCY_COOLDOWN_SECONDS = float(os.getenv('DOWNLOAD_CONCURRENCY_COOLDOWN_SECONDS', 30))
+DOWNLOAD_SLOW_BYTES_PER_SECOND = int(os.getenv('DOWNLOAD_SLOW_KBPS', 64)) * 1024
+DOWNLOAD_RETRY_MAX = int(os.getenv('DOWNLOAD_RETRY_MAX', 3))
+DOWNLOAD_RETRY_BASE_SECONDS = float(os.getenv('DOWNLOAD_RETRY_BASE_SECONDS', 10))
+DOWNLOAD_RETRY_MAX_SECONDS = float(os.getenv('DOWNLOAD_RETRY_MAX_SECONDS', 300))
+# 병합/MP3 변환 전용 워커 수 (기본값: CPU 코어 수). 네트워크 슬롯과 따로 동작한다.
+POSTPROCESS_WORKERS = int(os.getenv('POSTPROCESS_WORKERS', 0)) or os.cpu_count() or 1
+POSTPROCESS_TIMEOUT_SECONDS = int(os.getenv('POSTPROCESS_TIMEOUT_SECONDS', 3600))
+MP3_BITRATE = os.getenv('MP3_BITRATE', '192k')
+# 구간(클립) 다운로드: 요청 하나에 받을 수 있는 최대 구간 수,
+# 자르는 지점에 키프레임을 만들어 정확히 자를지 여부 (기본은 재인코딩 없이 키프레임 단위 스트림 복사)
+CLIP_MAX_SECTIONS = int(os.getenv('CLIP_MAX_SECTIONS', 20))
+CLIP_PRECISE_CUTS = os.getenv('CLIP_PRECISE_CUTS', 'False').strip().lower() in ('1', 'true', 'yes', 'on')
+ACTIVE_JOB_STATUSES = ('queued', 'downloading', 'postprocessing')
+TERMINAL_JOB_STATUSES = ('completed', 'error', 'cancelled')
 DEBUG_MODE = os.getenv('DEBUG', 'True').strip().lower() in ('1', 'true', 'yes', 'on')
 SUBTITLE_FOLDER = os.getenv('SUBTITLE_FOLDER', './subtitles')
+THUMBNAIL_FOLDER = os.getenv('THUMBNAIL_FOLDER', './thumbnails')
+THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 320))
+THUMBNAIL_CACHE_SECONDS = 365 * 24 * 3600
 STT_TIMEOUT_SECONDS = int(os.getenv('STT_TIMEOUT_SECONDS', 1800))
 STT_GRPC_SERVER = os.getenv('STT_GRPC_SERVER', '192.168.0.67:9031')
 STT_LANGUAGE_CODE = os.getenv('STT_LANGUAGE_CODE', os.getenv('STT_LANGUAGE', 'multi'))
@@ -28,16 +81,113 @@ STT_WAV_SAMPLE_RATE = int(os.getenv('STT_WAV_SAMPLE_RATE', 16000))
 STT_MAX_SUBTITLE_SECONDS = float(os.getenv('STT_MAX_SUBTITLE_SECONDS', 5))
 STT_MAX_SUBTITLE_WORDS = int(os.getenv('STT_MAX_SUBTITLE_WORDS', 12))
 STT_ENABLE_AUTOMATIC_PUNCTUATION = os.getenv('STT_ENABLE_AUTOMATIC_PUNCTUATION', 'True').strip().lower() in ('1', 'true', 'yes', 'on')
+# STT 전송 오디오 인코딩 (linear_pcm | flac | ogg_opus)
+STT_AUDIO_ENCODING = os.getenv('STT_AUDIO_ENCODING', 'linear_pcm').strip().lower()
+STT_OPUS_BITRATE = os.getenv('STT_OPUS_BITRATE', '32k')
+# 자막 작업 메모리 예산 (0이면 제한 없음). 예산보다 큰 작업은 STT_CHUNK_SECONDS 단위로 나눠 전송한다.
+STT_MEMORY_BUDGET_BYTES = int(float(os.getenv('STT_MEMORY_BUDGET_MB', 2048)) * 1024 ** 2)
+STT_MEMORY_OVERHEAD_FACTOR = float(os.getenv('STT_MEMORY_OVERHEAD_FACTOR', 3))
+STT_MEMORY_BASE_BYTES = int(float(os.getenv('STT_MEMORY_BASE_MB', 64)) * 1024 ** 2)
+STT_CHUNK_SECONDS = int(os.getenv('STT_CHUNK_SECONDS', 600))
+# 켜면(초 > 0) 이 길이마다 ASR 결과를 받아 자막에 이어 붙인다. 기본은 꺼짐(전체 파일 한 번에 인식, 끝날 때 저장)
+STT_PROGRESSIVE_CHUNK_SECONDS = int(os.getenv('STT_PROGRESSIVE_CHUNK_SECONDS', 0))
+# 청크 경계를 단어 중간이 아닌 무음에서 자르도록 각 청크 끝 이 길이(초) 안에서 무음(VAD 임계값 미만)을 찾는다 (0이면 끄기)
+STT_CHUNK_SNAP_SECONDS = float(os.getenv('STT_CHUNK_SNAP_SECONDS', 5))
+# 자막 작업 전체(대기 포함) 마감 시간과 우선순위 (숫자가 작을수록 먼저 처리)
+STT_JOB_DEADLINE_SECONDS = int(os.getenv('STT_JOB_DEADLINE_SECONDS', 3600))
+SUBTITLE_PRIORITIES = {'interactive': 0, 'bulk': 10}
+# 같은 우선순위 안에서는 짧은 작업 먼저 (SJF). 기다린 1초가 미디어 길이 AGING_RATE초만큼 앞당겨져 긴 작업도 결국 처리된다.
+STT_SCHEDULE_AGING_RATE = float(os.getenv('STT_SCHEDULE_AGING_RATE', 1))
+STT_UNKNOWN_DURATION_SECONDS = float(os.getenv('STT_UNKNOWN_DURATION_SECONDS', 1800))
+# 처리 기록이 없을 때 ETA 계산에 쓰는 처리 시간/미디어 길이 비율
+STT_DEFAULT_REALTIME_FACTOR = float(os.getenv('STT_DEFAULT_REALTIME_FACTOR', 0.2))
+SUBTITLE_PRIORITY_SPAN = 1e11  # 우선순위 단계 간격 (초). 에이징이 단계를 넘지 않게 충분히 크게 둔다.
+# 무음 구간 제거 (에너지 기반 VAD)
+STT_VAD_ENABLED = os.getenv('STT_VAD_ENABLED', 'False').strip().lower() in ('1', 'true', 'yes', 'on')
+STT_VAD_FRAME_MS = int(os.getenv('STT_VAD_FRAME_MS', 30))
+STT_VAD_THRESHOLD_DBFS = float(os.getenv('STT_VAD_THRESHOLD_DBFS', -45))
+STT_VAD_MIN_SILENCE_MS = int(os.getenv('STT_VAD_MIN_SILENCE_MS', 1000))
+STT_VAD_PADDING_MS = int(os.getenv('STT_VAD_PADDING_MS', 300))
+
+# --- 저장 공간 설정 ---
+STORAGE_QUOTA_BYTES = int(float(os.getenv('STORAGE_QUOTA_GB', 0)) * 1024 ** 3)  # 0이면 무제한
+STORAGE_MIN_FREE_BYTES = int(float(os.getenv('STORAGE_MIN_FREE_MB', 0)) * 1024 ** 2)  # 0이면 여유 공간 기준 정리 안 함
+# 할당량이나 최소 여유 공간을 설정한 경우에만 미디어를 자동 정리한다
+STORAGE_EVICTION_ENABLED = STORAGE_QUOTA_BYTES > 0 or STORAGE_MIN_FREE_BYTES > 0
+STORAGE_EVICTION_INTERVAL_SECONDS = int(os.getenv('STORAGE_EVICTION_INTERVAL_SECONDS', 60))
+STORAGE_EVICTION_BATCH_SIZE = int(os.getenv('STORAGE_EVICTION_BATCH_SIZE', 5))
+
+# --- DB 설정 ---
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', MAX_CONCURRENT_DOWNLOADS + 5))
+HISTORY_WRITE_INTERVAL_SECONDS = float(os.getenv('HISTORY_WRITE_INTERVAL_SECONDS', 0.5))
+HISTORY_WRITE_BATCH_SIZE = int(os.getenv('HISTORY_WRITE_BATCH_SIZE', 100))
+
+# --- 응답 캐시/압축 설정 ---
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 64))
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', 1024))
+# 프로파일링 (기본 꺼짐. 끄면 요청/쿼리 hook을 등록하지 않아 오버헤드가 없다)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').strip().lower() in ('1', 'true', 'yes', 'on')
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_MAX_SECONDS = int(os.getenv('PROFILING_MAX_SECONDS', 60))
+PROFILING_SAMPLE_INTERVAL_MS = int(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 10))
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+SUBTITLE_CUE_PAGE_SIZE = int(os.getenv('SUBTITLE_CUE_PAGE_SIZE', 200))
+SUBTITLE_CUE_PAGE_MAX = int(os.getenv('SUBTITLE_CUE_PAGE_MAX', 1000))
+SUBTITLE_CUE_INDEX_CACHE_SIZE = int(os.getenv('SUBTITLE_CUE_INDEX_CACHE_SIZE', 32))
+SUBTITLE_SEARCH_LIMIT = int(os.getenv('SUBTITLE_SEARCH_LIMIT', 50))
+# ZIP 내보내기 (무압축 스트리밍, 임시 파일 없음)
+EXPORT_MAX_ITEMS = int(os.getenv('EXPORT_MAX_ITEMS', 1000))
+EXPORT_CHUNK_BYTES = 1024 ** 2
+
+# --- 작업 상태 저장소 설정 (local: 프로세스 메모리, sqlite: 여러 프로세스 공유) ---
+JOB_STATE_BACKEND = os.getenv('JOB_STATE_BACKEND', 'local').strip().lower()
+JOB_STATE_DB_PATH = os.getenv('JOB_STATE_DB_PATH', '')
+# 끝난 작업(completed/error/cancelled)은 이 시간이 지나거나 개수를 넘으면 job_archive 테이블로 옮기고 메모리에서 지운다
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 3600))
+JOB_RETENTION_MAX_ITEMS = int(os.getenv('JOB_RETENTION_MAX_ITEMS', 200))
+JOB_RETENTION_INTERVAL_SECONDS = int(os.getenv('JOB_RETENTION_INTERVAL_SECONDS', 60))
+JOB_ARCHIVE_RETENTION_DAYS = int(os.getenv('JOB_ARCHIVE_RETENTION_DAYS', 30))  # 0이면 보관 기록을 지우지 않음
+
+# --- 워커 설정 (embedded: 웹 프로세스 내부 스레드, external: worker.py 프로세스가 공유 큐에서 작업 임대) ---
+WORKER_MODE = os.getenv('WORKER_MODE', 'embedded').strip().lower()
+WORKER_STT_SLOTS = int(os.getenv('WORKER_STT_SLOTS', 1))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+WORKER_HEARTBEAT_SECONDS = int(os.getenv('WORKER_HEARTBEAT_SECONDS', 15))
+WORKER_POLL_SECONDS = float(os.getenv('WORKER_POLL_SECONDS', 1))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+# 다른 호스트의 워커는 공유 SQLite 파일 대신 웹 프로세스의 워커 API(HTTP)로 큐/상태/이력을 쓴다
+WORKER_API_URL = os.getenv('WORKER_API_URL', '').strip().rstrip('/')
+WORKER_API_TOKEN = os.getenv('WORKER_API_TOKEN', '')
+WORKER_API_TIMEOUT_SECONDS = float(os.getenv('WORKER_API_TIMEOUT_SECONDS', 30))
 
 app = Flask(__name__)
 
 # --- SQLite 데이터베이스 설정 ---
 instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
-os.makedirs(instance_path, exist_ok=True)
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(instance_path, "app.db")}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': DB_POOL_SIZE,
+    'max_overflow': DB_POOL_SIZE,
+    'pool_pre_ping': True,
+    'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False},
+}
 db = SQLAlchemy(app)
 
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """WAL 모드로 워커의 쓰기와 API의 읽기가 서로를 막지 않도록 한다."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
 # --- DownloadHistory 모델 ---
 class DownloadHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -54,11 +204,400 @@ class DownloadHistory(db.Model):
     subtitle_filename = db.Column(db.String(500))
     subtitle_error = db.Column(db.String(1000))
     subtitle_created_at = db.Column(db.DateTime)
+    stage_timeline = db.Column(db.Text)  # 다운로드 단계별 시각 (compact JSON)
+    subtitle_timeline = db.Column(db.Text)  # 자막 작업 단계별 시각 (compact JSON)
+    last_accessed_at = db.Column(db.DateTime)  # 마지막 파일 다운로드 시각 (LRU 기준)
+    media_evicted_at = db.Column(db.DateTime)  # 용량 정리로 미디어 파일이 삭제된 시각
+    thumbnail_key = db.Column(db.String(64))  # 로컬 썸네일 캐시 키 (YouTube 비디오 ID 또는 url-<원본 썸네일 URL 해시>)
+    subtitle_metrics = db.Column(db.Text)  # 자막 작업 지표 (JSON, 예: VAD로 건너뛴 오디오 길이)
+    duration = db.Column(db.Float)  # 미디어 길이 (초)
+    format_plan = db.Column(db.Text)  # 포맷 계획 (JSON: progressive/merge_copy/merge, format_ids)
+    subtitle_progress = db.Column(db.Integer)  # 자막 작업에서 처리한 오디오 비율 (%)
+    clip_section = db.Column(db.Text)  # 구간 다운로드 범위 (JSON: start, end, title), 전체 영상이면 NULL
+
+
+class JobArchive(db.Model):
+    """메모리 보관 기간이 지난 끝난 작업 기록 (API는 job_store와 같은 모양으로 돌려준다)"""
+    __tablename__ = 'job_archive'
+
+    job_id = db.Column(db.String(100), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='download')
+    status = db.Column(db.String(20), index=True)
+    video_title = db.Column(db.String(500))
+    data = db.Column(db.Text, nullable=False)  # 작업 상태 (compact JSON)
+    finished_at = db.Column(db.DateTime, index=True)
+
+
+def stamp_finished_at(fields):
+    """끝난 상태로 바뀌는 갱신에 종료 시각을 붙인다 (보관 기간 계산 기준)."""
+    if fields.get('status') in TERMINAL_JOB_STATUSES and 'finished_at' not in fields:
+        return {**fields, 'finished_at': time.time()}
+    return fields
+
+
+class LocalJobStore:
+    """단일 프로세스용 작업 상태 저장소 (메모리)"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._kinds = {}
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def version(self):
+        return self._version
+
+    def create(self, job_id, data, kind='download'):
+        with self._lock:
+            self._jobs[job_id] = stamp_finished_at(dict(data))
+            self._kinds[job_id] = kind
+            self._cancel_events[job_id] = threading.Event()
+            self._version += 1
+
+    def get(self, job_id):
+        with self._lock:
+            data = self._jobs.get(job_id)
+            return dict(data) if data is not None else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(stamp_finished_at(fields))
+                self._version += 1
+
+    def delete(self, job_id):
+        with self._lock:
+            self._kinds.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+            self._version += 1
+            return self._jobs.pop(job_id, None) is not None
+
+    def items(self, kind='download'):
+        with self._lock:
+            return [
+                (job_id, dict(data)) for job_id, data in self._jobs.items()
+                if self._kinds.get(job_id) == kind
+            ]
+
+    def request_cancel(self, job_id):
+        event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        with self._lock:
+            self._version += 1
+        return True
+
+    def is_cancel_requested(self, job_id):
+        # 삭제된 작업은 취소된 것으로 본다
+        event = self._cancel_events.get(job_id)
+        return event is None or event.is_set()
+
+
+class SqliteBackend:
+    """스레드별 autocommit 연결을 쓰는 공유 SQLite 테이블의 공통 부분"""
+
+    schema = ()
+    # 기존 파일에 추가할 컬럼 (이미 있으면 건너뜀)
+    migrations = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.schema:
+                conn.execute(statement)
+            for statement in self.migrations:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    if 'duplicate column' not in str(e):
+                        raise
+            self._local.conn = conn
+        return conn
+
+
+class SqliteJobStore(SqliteBackend):
+    """여러 웹/워커 프로세스가 공유하는 SQLite 작업 상태 저장소"""
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS job_state ('
+        'job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, data TEXT NOT NULL, '
+        'cancel_requested INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)',
+    )
+
+    def version(self):
+        # 모든 변경이 updated_at을 갱신하므로 (행 수, 최근 갱신 시각)으로 변경 여부를 판단한다
+        count, last_updated = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(MAX(updated_at), 0) FROM job_state'
+        ).fetchone()
+        return f'{count}.{last_updated!r}'
+
+    def create(self, job_id, data, kind='download'):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO job_state (job_id, kind, data, cancel_requested, updated_at) VALUES (?, ?, ?, 0, ?)',
+            (job_id, kind, json.dumps(stamp_finished_at(data)), time.time()),
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT data FROM job_state WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
 
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-os.makedirs(SUBTITLE_FOLDER, exist_ok=True)
+    def update(self, job_id, **fields):
+        # json_patch로 한 문장 안에서 병합하므로 다른 프로세스의 갱신을 덮어쓰지 않는다
+        self._connect().execute(
+            'UPDATE job_state SET data = json_patch(data, ?), updated_at = ? WHERE job_id = ?',
+            (json.dumps(stamp_finished_at(fields)), time.time(), job_id),
+        )
+
+    def delete(self, job_id):
+        cursor = self._connect().execute('DELETE FROM job_state WHERE job_id = ?', (job_id,))
+        return cursor.rowcount > 0
 
-download_status = {}
+    def items(self, kind='download'):
+        rows = self._connect().execute(
+            'SELECT job_id, data FROM job_state WHERE kind = ? ORDER BY rowid', (kind,)
+        ).fetchall()
+        return [(job_id, json.loads(data)) for job_id, data in rows]
+
+    def request_cancel(self, job_id):
+        cursor = self._connect().execute(
+            'UPDATE job_state SET cancel_requested = 1, updated_at = ? WHERE job_id = ?', (time.time(), job_id)
+        )
+        return cursor.rowcount > 0
+
+    def is_cancel_requested(self, job_id):
+        # 삭제된 작업은 취소된 것으로 본다
+        row = self._connect().execute(
+            'SELECT cancel_requested FROM job_state WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        return row is None or bool(row[0])
+
+
+class SqliteJobQueue(SqliteBackend):
+    """독립 워커가 시간 제한 임대(lease)로 작업을 가져가는 공유 큐.
+
+    SQLite WAL은 네트워크 파일 시스템에서 동작하지 않으므로 이 파일을 직접 여는 프로세스는 웹 서버와 같은 호스트에 있어야 한다.
+    다른 호스트의 워커는 웹 프로세스의 워커 API(/api/worker/rpc)를 거쳐 같은 큐를 쓴다.
+    """
+
+    # 재시도 한도를 넘겨 실패 처리한 작업을 (kind, payload)로 알려 줄 함수
+    exhausted_handler = None
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS job_queue ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+        'priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT \'pending\', '
+        'lease_owner TEXT, lease_expires_at REAL, attempts INTEGER NOT NULL DEFAULT 0, '
+        'created_at REAL NOT NULL, updated_at REAL NOT NULL, not_before REAL)',
+        'CREATE INDEX IF NOT EXISTS ix_job_queue_claim ON job_queue (kind, status, priority, id)',
+        'CREATE TABLE IF NOT EXISTS worker_nodes ('
+        'node_id TEXT PRIMARY KEY, hostname TEXT, pid INTEGER, '
+        'download_slots INTEGER NOT NULL, stt_slots INTEGER NOT NULL, '
+        'active_downloads INTEGER NOT NULL DEFAULT 0, active_stt INTEGER NOT NULL DEFAULT 0, '
+        'heartbeat_at REAL NOT NULL, transport TEXT)',
+    )
+    migrations = (
+        'ALTER TABLE job_queue ADD COLUMN not_before REAL',
+        'ALTER TABLE worker_nodes ADD COLUMN transport TEXT',
+    )
+
+    def enqueue(self, kind, payload, priority=0, not_before=None):
+        """작업을 넣는다. not_before(epoch 초)가 있으면 그 시각 전에는 임대하지 않는다 (재시도 백오프)."""
+        now = time.time()
+        cursor = self._connect().execute(
+            'INSERT INTO job_queue (kind, payload, priority, created_at, updated_at, not_before) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (kind, json.dumps(payload), priority, now, now, not_before),
+        )
+        return cursor.lastrowid
+
+    def claim(self, kind, owner, lease_seconds=None):
+        """대기 중이거나 임대가 만료된 작업 하나를 owner에게 임대한다."""
+        lease_seconds = JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 재시도 한도를 넘긴 만료 작업은 실패 처리
+            exhausted = conn.execute(
+                "SELECT id, payload FROM job_queue "
+                "WHERE kind = ? AND status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (kind, now, JOB_MAX_ATTEMPTS),
+            ).fetchall()
+            for exhausted_id, _ in exhausted:
+                conn.execute(
+                    "UPDATE job_queue SET status = 'failed', updated_at = ? WHERE id = ?", (now, exhausted_id)
+                )
+            row = conn.execute(
+                "SELECT id, payload FROM job_queue WHERE kind = ? AND "
+                "((status = 'pending' AND (not_before IS NULL OR not_before <= ?)) "
+                "OR (status = 'leased' AND lease_expires_at < ?)) "
+                "ORDER BY priority, id LIMIT 1",
+                (kind, now, now),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE job_queue SET status = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (owner, now + lease_seconds, now, row[0]),
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        # 실패 처리한 작업의 상태(job_state, 이력)도 error로 바꾼다. 그러지 않으면 UI에 대기/진행 중으로 남는다.
+        for _, payload in exhausted:
+            if self.exhausted_handler is not None:
+                try:
+                    self.exhausted_handler(kind, json.loads(payload))
+                except Exception as e:
+                    print(f"[worker] failed to mark exhausted {kind} job: {e}", flush=True)
+        return (row[0], json.loads(row[1])) if row else None
+
+    def heartbeat(self, job_ids, owner, lease_seconds=None):
+        """임대를 연장하고, 아직 owner가 임대하고 있는 작업 ID 목록을 반환한다."""
+        lease_seconds = JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        now = time.time()
+        owned = []
+        for job_id in job_ids:
+            cursor = self._connect().execute(
+                "UPDATE job_queue SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (now + lease_seconds, now, job_id, owner),
+            )
+            if cursor.rowcount > 0:
+                owned.append(job_id)
+        return owned
+
+    def holds_lease(self, job_id, owner):
+        row = self._connect().execute(
+            "SELECT 1 FROM job_queue WHERE id = ? AND lease_owner = ? AND status = 'leased'", (job_id, owner)
+        ).fetchone()
+        return row is not None
+
+    def complete(self, job_id, owner):
+        cursor = self._connect().execute(
+            "UPDATE job_queue SET status = 'done', updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (time.time(), job_id, owner),
+        )
+        return cursor.rowcount > 0
+
+    def count(self, kind, statuses=('pending', 'leased')):
+        placeholders = ', '.join('?' for _ in statuses)
+        row = self._connect().execute(
+            f'SELECT COUNT(*) FROM job_queue WHERE kind = ? AND status IN ({placeholders})',
+            (kind, *statuses),
+        ).fetchone()
+        return row[0]
+
+    def advertise_node(self, node_id, download_slots, stt_slots, active_downloads=0, active_stt=0,
+                       hostname=None, pid=None, transport='sqlite'):
+        """노드 용량을 알린다. transport는 큐를 직접 여는 노드면 sqlite, 워커 API를 거치는 노드면 api."""
+        self._connect().execute(
+            'INSERT OR REPLACE INTO worker_nodes '
+            '(node_id, hostname, pid, download_slots, stt_slots, active_downloads, active_stt, heartbeat_at, transport) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (node_id, hostname or socket.gethostname(), pid or os.getpid(), download_slots, stt_slots,
+             active_downloads, active_stt, time.time(), transport),
+        )
+
+    def remove_node(self, node_id):
+        self._connect().execute('DELETE FROM worker_nodes WHERE node_id = ?', (node_id,))
+
+    def live_nodes(self, max_age_seconds=None):
+        max_age_seconds = WORKER_HEARTBEAT_SECONDS * 3 if max_age_seconds is None else max_age_seconds
+        rows = self._connect().execute(
+            'SELECT node_id, hostname, pid, download_slots, stt_slots, active_downloads, active_stt, heartbeat_at, '
+            "COALESCE(transport, 'sqlite') FROM worker_nodes WHERE heartbeat_at >= ? ORDER BY node_id",
+            (time.time() - max_age_seconds,),
+        ).fetchall()
+        columns = ('node_id', 'hostname', 'pid', 'download_slots', 'stt_slots',
+                   'active_downloads', 'active_stt', 'heartbeat_at', 'transport')
+        return [dict(zip(columns, row)) for row in rows]
+
+
+def create_job_store(backend=None, path=None):
+    backend = backend or JOB_STATE_BACKEND
+    if backend == 'sqlite':
+        return SqliteJobStore(path or JOB_STATE_DB_PATH or os.path.join(instance_path, 'app.db'))
+    if backend != 'local':
+        raise ValueError(f'지원하지 않는 JOB_STATE_BACKEND입니다: {backend}')
+    return LocalJobStore()
+
+
+def encode_worker_api_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} 값은 워커 API로 보낼 수 없습니다.')
+
+
+class WorkerApiClient:
+    """다른 호스트의 워커가 웹 프로세스의 작업 큐/상태 저장소/이력 쓰기를 호출하는 HTTP 클라이언트"""
+
+    def __init__(self, base_url, token, timeout=None):
+        self.base_url = base_url
+        self.token = token
+        self.timeout = WORKER_API_TIMEOUT_SECONDS if timeout is None else timeout
+
+    def call(self, target, method, *args, **kwargs):
+        body = json.dumps(
+            {'target': target, 'method': method, 'args': args, 'kwargs': kwargs}, default=encode_worker_api_value
+        ).encode('utf-8')
+        request_obj = urllib.request.Request(
+            f'{self.base_url}/api/worker/rpc',
+            data=body,
+            headers={'Content-Type': 'application/json', 'X-Worker-Token': self.token},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request_obj, timeout=self.timeout) as response:
+                return json.loads(response.read())['result']
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error')
+            except ValueError:
+                message = None
+            raise Exception(f'워커 API 호출 실패 ({target}.{method}, HTTP {e.code}): {message or e.reason}') from e
+
+
+class WorkerApiProxy:
+    """SqliteJobStore/SqliteJobQueue와 같은 메서드를 워커 API 호출로 바꿔 주는 대리 객체"""
+
+    def __init__(self, client, target):
+        self._client = client
+        self._target = target
+
+    def __getattr__(self, method):
+        if method not in WORKER_API_METHODS[self._target]:
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self._client.call(self._target, method, *args, **kwargs)
+
+
+# 워커 API로 호출할 수 있는 메서드 (target -> 메서드 이름)
+WORKER_API_METHODS = {
+    'store': ('create', 'get', 'update', 'delete', 'items', 'request_cancel', 'is_cancel_requested', 'version'),
+    'queue': ('enqueue', 'claim', 'heartbeat', 'holds_lease', 'complete', 'count',
+              'advertise_node', 'remove_node', 'live_nodes'),
+    'history': ('get', 'apply'),
+}
+
+worker_api = WorkerApiClient(WORKER_API_URL, WORKER_API_TOKEN) if WORKER_API_URL else None
+if worker_api is not None:
+    job_store = WorkerApiProxy(worker_api, 'store')
+    job_queue = WorkerApiProxy(worker_api, 'queue')
+else:
+    job_store = create_job_store()
+    job_queue = SqliteJobQueue(JOB_STATE_DB_PATH or os.path.join(instance_path, 'app.db')) if WORKER_MODE == 'external' else None
+startup_metrics = {'import_seconds': None, 'ready_seconds': None}
 
 
 def get_subtitle_status(history):
@@ -112,6 +651,11 @@ def build_subtitle_filename(history_id, source_filename):
     return f'{history_id}-{safe_base}.srt'
 
 
+def get_partial_subtitle_filename(history_id, source_filename):
+    """자막 생성 중 확정된 큐를 이어 쓰는 파일. 완료되면 지워지고 기존 자막은 그때까지 그대로 둔다."""
+    return build_subtitle_filename(history_id, source_filename)[:-len('.srt')] + '.partial.srt'
+
+
 def get_safe_folder_path(folder, filename):
     if not filename:
         return None
@@ -121,6 +665,56 @@ def get_safe_folder_path(folder, filename):
     return os.path.join(folder, safe_name)
 
 
+class ZipStreamWriter:
+    """zipfile이 쓴 바이트를 모아 두었다가 응답 청크로 넘기는 seek 불가 스트림.
+
+    tell/seek이 없으므로 zipfile은 데이터 디스크립터 방식으로 쓰고, 되돌아가 헤더를 고치지 않는다.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_stream(entries, chunk_bytes=None):
+    """(압축 파일 안 이름, 실제 경로) 목록을 무압축 ZIP으로 만들며 조각씩 yield한다.
+
+    메모리에는 파일 조각 하나만 올라가고, 4GB가 넘는 파일/전체 크기는 ZIP64로 기록된다.
+    도중에 사라진 파일은 건너뛴다.
+    """
+    chunk_bytes = chunk_bytes or EXPORT_CHUNK_BYTES
+    stream = ZipStreamWriter()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, filepath in entries:
+            try:
+                source = open(filepath, 'rb')
+            except OSError:
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(filepath, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with archive.open(info, 'w') as target:
+                    while True:
+                        chunk = source.read(chunk_bytes)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield stream.drain()
+            yield stream.drain()
+    yield stream.drain()
+
+
 def delete_file_in_folder(folder, filename):
     filepath = get_safe_folder_path(folder, filename)
     if not filepath or not os.path.exists(filepath):
@@ -131,9 +725,36 @@ def delete_file_in_folder(folder, filename):
 
 def delete_subtitle_file_for_history(history, subtitle_folder=None):
     subtitle_folder = subtitle_folder or SUBTITLE_FOLDER
+    history_id = getattr(history, 'id', None)
+    if history_id is not None:
+        delete_subtitle_search_index(history_id)
+        delete_file_in_folder(
+            subtitle_folder, get_partial_subtitle_filename(history_id, getattr(history, 'filename', None))
+        )
     return delete_file_in_folder(subtitle_folder, getattr(history, 'subtitle_filename', None))
 
 
+def resolve_subtitle_file(history, subtitle_folder=None):
+    """보여 줄 자막 파일 (경로, 부분 결과 여부). 생성 중이면 지금까지 확정된 부분 자막을 준다. 없으면 (None, False)"""
+    subtitle_folder = subtitle_folder or SUBTITLE_FOLDER
+    status = get_subtitle_status(history)
+    if status == 'processing':
+        partial_path = get_safe_folder_path(
+            subtitle_folder, get_partial_subtitle_filename(history.id, history.filename)
+        )
+        if partial_path and os.path.exists(partial_path):
+            return partial_path, True
+        # 부분 자막이 완성본으로 바뀌었는데 completed 기록이 아직 반영되지 않은 순간
+        filepath = get_safe_folder_path(subtitle_folder, build_subtitle_filename(history.id, history.filename))
+    elif status == 'completed':
+        filepath = get_safe_folder_path(subtitle_folder, getattr(history, 'subtitle_filename', None))
+    else:
+        return None, False
+    if filepath and os.path.exists(filepath):
+        return filepath, False
+    return None, False
+
+
 def read_subtitle_text_for_history(history, subtitle_folder=None):
     subtitle_folder = subtitle_folder or SUBTITLE_FOLDER
     filepath = get_safe_folder_path(subtitle_folder, getattr(history, 'subtitle_filename', None))
@@ -153,6 +774,12 @@ def cleanup_orphan_subtitle_files(histories, subtitle_folder=None):
         for history in histories
         if getattr(history, 'subtitle_filename', None)
     }
+    # 생성 중인 작업의 부분 자막은 남기고, 중단된 작업이 남긴 것만 정리한다
+    referenced_files.update(
+        get_partial_subtitle_filename(history.id, history.filename)
+        for history in histories
+        if get_subtitle_status(history) in ('queued', 'processing')
+    )
     deleted_count = 0
     for filename in os.listdir(subtitle_folder):
         if filename == '.gitkeep' or not filename.lower().endswith('.srt'):
@@ -170,6 +797,205 @@ def format_srt_timestamp(milliseconds):
     return f'{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}'
 
 
+SRT_TIMING_PATTERN = re.compile(
+    rb'^\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})'
+)
+
+subtitle_cue_index_cache = OrderedDict()
+subtitle_cue_index_lock = threading.Lock()
+
+
+def parse_srt_timing_line(line):
+    """'00:00:01,000 --> 00:00:02,500' 형식을 (시작 ms, 종료 ms)로 변환"""
+    match = SRT_TIMING_PATTERN.match(line)
+    if not match:
+        return None
+    groups = match.groups()
+
+    def to_milliseconds(hours, minutes, seconds, fraction):
+        return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, b'0'))
+
+    return to_milliseconds(*groups[:4]), to_milliseconds(*groups[4:])
+
+
+def build_subtitle_cue_index(filepath):
+    """SRT 파일을 한 번 훑어 큐별 (바이트 오프셋, 시작/종료 ms) 색인을 만든다"""
+    offsets, starts, ends = array('q'), array('q'), array('q')
+    block_start = None
+    position = 0
+    with open(filepath, 'rb') as subtitle_file:
+        for line in subtitle_file:
+            if not line.strip():
+                block_start = None
+            elif block_start is None:
+                block_start = position
+            else:
+                timing = parse_srt_timing_line(line)
+                if timing and (not offsets or offsets[-1] != block_start):
+                    offsets.append(block_start)
+                    starts.append(timing[0])
+                    ends.append(timing[1])
+            position += len(line)
+    return {'offsets': offsets, 'starts': starts, 'ends': ends, 'size': position}
+
+
+def get_subtitle_cue_index(filepath):
+    """(경로, mtime, 크기)가 같으면 캐시된 큐 색인을 재사용한다"""
+    stat = os.stat(filepath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with subtitle_cue_index_lock:
+        entry = subtitle_cue_index_cache.get(filepath)
+        if entry and entry[0] == signature:
+            subtitle_cue_index_cache.move_to_end(filepath)
+            return entry[1]
+
+    index = build_subtitle_cue_index(filepath)
+    with subtitle_cue_index_lock:
+        subtitle_cue_index_cache[filepath] = (signature, index)
+        subtitle_cue_index_cache.move_to_end(filepath)
+        while len(subtitle_cue_index_cache) > SUBTITLE_CUE_INDEX_CACHE_SIZE:
+            subtitle_cue_index_cache.popitem(last=False)
+    return index
+
+
+def find_cue_range_for_window(index, from_ms, to_ms):
+    """[from_ms, to_ms) 구간과 겹치는 큐의 색인 범위"""
+    starts, ends = index['starts'], index['ends']
+    first = bisect.bisect_right(starts, from_ms)
+    # 시작이 from_ms 이전이어도 아직 끝나지 않은 큐는 포함한다
+    while first > 0 and ends[first - 1] > from_ms:
+        first -= 1
+    last = bisect.bisect_left(starts, to_ms) if to_ms is not None else len(starts)
+    return first, max(first, last)
+
+
+def read_subtitle_cues(filepath, index, first, last):
+    """색인의 바이트 오프셋으로 필요한 구간만 읽어 큐 목록을 만든다"""
+    offsets = index['offsets']
+    first = max(0, first)
+    last = min(len(offsets), last)
+    if first >= last:
+        return []
+
+    end_offset = offsets[last] if last < len(offsets) else index['size']
+    with open(filepath, 'rb') as subtitle_file:
+        subtitle_file.seek(offsets[first])
+        chunk = subtitle_file.read(end_offset - offsets[first])
+
+    cues = []
+    for position in range(first, last):
+        start = offsets[position] - offsets[first]
+        end = (offsets[position + 1] - offsets[first]) if position + 1 < last else len(chunk)
+        lines = chunk[start:end].decode('utf-8', errors='replace').strip().splitlines()
+        timing_position = next(
+            (line_no for line_no, line in enumerate(lines) if '-->' in line), 0
+        )
+        cues.append({
+            'index': position,
+            'start_ms': index['starts'][position],
+            'end_ms': index['ends'][position],
+            'text': '\n'.join(lines[timing_position + 1:]),
+        })
+    return cues
+
+
+# 자막 검색 색인: rowid = history_id * SUBTITLE_INDEX_ROWID_STRIDE + 큐 번호
+# (이력 하나의 큐를 rowid 범위로 바로 지우기 위해)
+SUBTITLE_INDEX_ROWID_STRIDE = 1_000_000
+
+
+def parse_srt_cues(subtitle_text):
+    """SRT 텍스트를 (시작 ms, 본문) 목록으로 변환"""
+    cues = []
+    for block in re.split(r'\r?\n\s*\r?\n', subtitle_text or ''):
+        lines = block.strip().splitlines()
+        for line_no, line in enumerate(lines):
+            timing = parse_srt_timing_line(line.encode('utf-8'))
+            if timing:
+                body = ' '.join(part.strip() for part in lines[line_no + 1:] if part.strip())
+                if body:
+                    cues.append((timing[0], body))
+                break
+    return cues
+
+
+def get_subtitle_index_rowid_range(history_id):
+    first = history_id * SUBTITLE_INDEX_ROWID_STRIDE
+    return first, first + SUBTITLE_INDEX_ROWID_STRIDE - 1
+
+
+def delete_subtitle_search_index(history_id, connection=None):
+    connection = connection or db.session
+    first, last = get_subtitle_index_rowid_range(history_id)
+    connection.execute(
+        text('DELETE FROM subtitle_cue_fts WHERE rowid BETWEEN :first AND :last'),
+        {'first': first, 'last': last},
+    )
+
+
+def replace_subtitle_search_index(history_id, cues, connection=None):
+    """이력의 자막 큐 색인을 새 내용으로 교체한다 (호출한 쪽 트랜잭션 안에서 실행)"""
+    connection = connection or db.session
+    delete_subtitle_search_index(history_id, connection)
+    first, _ = get_subtitle_index_rowid_range(history_id)
+    rows = [
+        {'rowid': first + position, 'text': body, 'history_id': history_id, 'start_ms': start_ms}
+        for position, (start_ms, body) in enumerate(cues[:SUBTITLE_INDEX_ROWID_STRIDE])
+    ]
+    if rows:
+        connection.execute(
+            text('INSERT INTO subtitle_cue_fts (rowid, text, history_id, start_ms) '
+                 'VALUES (:rowid, :text, :history_id, :start_ms)'),
+            rows,
+        )
+
+
+def build_subtitle_search_query(search):
+    """사용자 입력을 FTS5 질의로 변환. 조사가 붙은 한국어 어절도 찾도록 각 단어를 접두어로 검색한다."""
+    terms = []
+    for term in (search or '').split():
+        term = term.replace('"', '').strip()
+        if term:
+            terms.append(f'"{term}"*')
+    return ' '.join(terms)
+
+
+def search_subtitle_cues(search, limit=None, offset=0, connection=None):
+    connection = connection or db.session
+    query = build_subtitle_search_query(search)
+    if not query:
+        return []
+    limit = max(1, min(limit or SUBTITLE_SEARCH_LIMIT, SUBTITLE_SEARCH_LIMIT))
+    rows = connection.execute(text(
+        "SELECT history_id, start_ms, snippet(subtitle_cue_fts, 0, '«', '»', '…', 16), "
+        'bm25(subtitle_cue_fts) AS score '
+        'FROM subtitle_cue_fts WHERE subtitle_cue_fts MATCH :query '
+        'ORDER BY score LIMIT :limit OFFSET :offset'
+    ), {'query': query, 'limit': limit, 'offset': max(0, offset)}).fetchall()
+    return [
+        {'history_id': row[0], 'start_ms': row[1], 'snippet': row[2], 'score': row[3]}
+        for row in rows
+    ]
+
+
+def backfill_subtitle_search_index(connection):
+    """색인 테이블을 처음 만들 때 이미 생성된 자막 파일을 색인한다."""
+    histories = connection.execute(text(
+        "SELECT id, subtitle_filename FROM download_history "
+        "WHERE subtitle_status = 'completed' AND subtitle_filename IS NOT NULL"
+    )).fetchall()
+    indexed = 0
+    for history_id, subtitle_filename in histories:
+        filepath = get_safe_folder_path(SUBTITLE_FOLDER, subtitle_filename)
+        if not filepath or not os.path.exists(filepath):
+            continue
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as subtitle_file:
+            replace_subtitle_search_index(history_id, parse_srt_cues(subtitle_file.read()), connection)
+        indexed += 1
+    if indexed:
+        print(f"Indexed subtitles for search: {indexed}")
+
+
 def get_word_field(word, field_name, default=None):
     if isinstance(word, dict):
         return word.get(field_name, default)
@@ -204,7 +1030,55 @@ def append_word_text(current_text, word):
     return f'{current_text} {word}'
 
 
-def build_srt_from_word_timestamps(words, max_seconds=None, max_words=None):
+def record_job_stage(timeline, stage, timestamp=None, keep_first=False):
+    """작업 타임라인에 단계 시각을 기록한다. 같은 단계가 있으면 시각을 갱신한다."""
+    timestamp = time.time() if timestamp is None else timestamp
+    for entry in timeline:
+        if entry[0] == stage:
+            if not keep_first:
+                entry[1] = timestamp
+            return timeline
+    timeline.append([stage, timestamp])
+    return timeline
+
+
+def encode_stage_timeline(timeline):
+    """타임라인을 시작 시각 + 단계별 ms 오프셋 형태의 compact JSON으로 변환한다."""
+    if not timeline:
+        return None
+    started_at = timeline[0][1]
+    stages = [[stage, int(round((timestamp - started_at) * 1000))] for stage, timestamp in timeline]
+    return json.dumps({'t0': round(started_at, 3), 's': stages}, separators=(',', ':'))
+
+
+def load_stage_timeline(encoded):
+    """compact JSON 타임라인을 [단계, epoch 초] 목록으로 복원한다."""
+    if not encoded:
+        return []
+    try:
+        data = json.loads(encoded)
+        started_at = float(data['t0'])
+        return [[stage, started_at + offset / 1000] for stage, offset in data['s']]
+    except (ValueError, KeyError, TypeError):
+        return []
+
+
+def serialize_stage_timeline(timeline):
+    """API 응답용 타임라인 (시작 시각 + 단계별 오프셋)"""
+    if not timeline:
+        return None
+    started_at = timeline[0][1]
+    return {
+        'started_at': datetime.utcfromtimestamp(started_at).isoformat(),
+        'stages': [
+            {'stage': stage, 'offset_ms': int(round((timestamp - started_at) * 1000))}
+            for stage, timestamp in timeline
+        ],
+    }
+
+
+def group_words_into_cues(words, max_seconds=None, max_words=None):
+    """word timestamp를 자막 큐로 묶는다. [(시작 ms, 끝 ms, 텍스트, 첫 단어 위치)]"""
     max_seconds = STT_MAX_SUBTITLE_SECONDS if max_seconds is None else max_seconds
     max_words = STT_MAX_SUBTITLE_WORDS if max_words is None else max_words
     entries = []
@@ -212,19 +1086,21 @@ def build_srt_from_word_timestamps(words, max_seconds=None, max_words=None):
     current_start = None
     current_end = None
     current_word_count = 0
+    current_first = None
 
     def flush():
-        nonlocal current_text, current_start, current_end, current_word_count
+        nonlocal current_text, current_start, current_end, current_word_count, current_first
         text_value = current_text.strip()
         if text_value and current_start is not None and current_end is not None:
             end_value = max(current_end, current_start + 1)
-            entries.append((current_start, end_value, text_value))
+            entries.append((current_start, end_value, text_value, current_first))
         current_text = ''
         current_start = None
         current_end = None
         current_word_count = 0
+        current_first = None
 
-    for item in words:
+    for position, item in enumerate(words):
         word = str(get_word_field(item, 'word', '') or '').strip()
         if not word:
             continue
@@ -242,6 +1118,7 @@ def build_srt_from_word_timestamps(words, max_seconds=None, max_words=None):
 
         if current_start is None:
             current_start = start_time
+            current_first = position
 
         current_text = append_word_text(current_text, word)
         current_end = max(current_end or end_time, end_time, start_time)
@@ -252,13 +1129,60 @@ def build_srt_from_word_timestamps(words, max_seconds=None, max_words=None):
             flush()
 
     flush()
+    return entries
+
 
+def format_srt_entries(entries, first_number=1):
     return '\n\n'.join(
-        f'{index}\n{format_srt_timestamp(start)} --> {format_srt_timestamp(end)}\n{text}'
-        for index, (start, end, text) in enumerate(entries, 1)
+        f'{number}\n{format_srt_timestamp(start)} --> {format_srt_timestamp(end)}\n{text}'
+        for number, (start, end, text, _) in enumerate(entries, first_number)
     ) + ('\n' if entries else '')
 
 
+def build_srt_from_word_timestamps(words, max_seconds=None, max_words=None):
+    return format_srt_entries(group_words_into_cues(words, max_seconds, max_words))
+
+
+class ProgressiveSubtitleWriter:
+    """ASR 청크 결과가 나올 때마다 확정된 큐를 SRT 파일 끝에 이어 쓴다.
+
+    마지막 큐는 다음 청크의 단어로 이어질 수 있어 보류했다가 다시 묶는다.
+    묶는 규칙이 같으므로 다 쓴 파일은 build_srt_from_word_timestamps 결과와 같다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending_words = []
+        self.cue_count = 0
+        with open(path, 'w', encoding='utf-8'):
+            pass
+
+    def _append(self, entries):
+        if not entries:
+            return 0
+        text_value = format_srt_entries(entries, self.cue_count + 1)
+        if self.cue_count:
+            text_value = '\n' + text_value
+        with open(self.path, 'a', encoding='utf-8') as subtitle_file:
+            subtitle_file.write(text_value)
+        self.cue_count += len(entries)
+        return len(entries)
+
+    def add_words(self, words):
+        """새 단어를 받아 확정된 큐를 기록하고 기록한 큐 수를 돌려준다."""
+        self.pending_words.extend(words)
+        entries = group_words_into_cues(self.pending_words)
+        if len(entries) < 2:
+            return 0
+        self.pending_words = self.pending_words[entries[-1][3]:]
+        return self._append(entries[:-1])
+
+    def finish(self):
+        entries = group_words_into_cues(self.pending_words)
+        self.pending_words = []
+        return self._append(entries)
+
+
 def ensure_database_schema():
     db.create_all()
 
@@ -273,6 +1197,16 @@ def ensure_database_schema():
         'subtitle_filename': 'VARCHAR(500)',
         'subtitle_error': 'VARCHAR(1000)',
         'subtitle_created_at': 'DATETIME',
+        'stage_timeline': 'TEXT',
+        'subtitle_timeline': 'TEXT',
+        'last_accessed_at': 'DATETIME',
+        'media_evicted_at': 'DATETIME',
+        'thumbnail_key': 'VARCHAR(64)',
+        'subtitle_metrics': 'TEXT',
+        'duration': 'FLOAT',
+        'format_plan': 'TEXT',
+        'subtitle_progress': 'INTEGER',
+        'clip_section': 'TEXT',
     }
 
     with db.engine.begin() as conn:
@@ -280,25 +1214,283 @@ def ensure_database_schema():
             if column_name not in columns:
                 conn.execute(text(f'ALTER TABLE download_history ADD COLUMN {column_name} {column_type}'))
 
+        # download_history/job_archive가 바뀔 때마다 (다른 프로세스의 쓰기 포함) 변경 버전을 올리는 트리거
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS change_version ('
+            'id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)'
+        ))
+        conn.execute(text('INSERT OR IGNORE INTO change_version (id, value) VALUES (1, 0)'))
+        for table_name in ('download_history', 'job_archive'):
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {table_name}_{operation.lower()}_version '
+                    f'AFTER {operation} ON {table_name} BEGIN '
+                    'UPDATE change_version SET value = value + 1 WHERE id = 1; END'
+                ))
 
-def cleanup_partial_files(video_title):
-    """부분 다운로드 파일 삭제 (.part, .ytdl 등)"""
-    if not video_title:
-        return
+        # 자막 큐 전문 검색 색인 (FTS5)
+        if 'subtitle_cue_fts' not in table_names:
+            conn.execute(text(
+                'CREATE VIRTUAL TABLE subtitle_cue_fts USING fts5('
+                "text, history_id UNINDEXED, start_ms UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+            backfill_subtitle_search_index(conn)
+
+
+def get_change_version():
+    """DB 이력과 작업 상태를 합친 전역 변경 버전"""
+    db_version = db.session.execute(text('SELECT value FROM change_version WHERE id = 1')).scalar()
+    return f'{db_version}-{job_store.version()}'
+
+
+def build_list_etag(version, cache_key):
+    digest = hashlib.sha1(repr((version, cache_key)).encode('utf-8')).hexdigest()
+    return digest[:20]
+
+
+def gzip_body(body):
+    return gzip.compress(body, compresslevel=6)
+
+
+def client_accepts_gzip():
+    return 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
 
+
+downloads_response_cache = OrderedDict()
+downloads_response_cache_lock = threading.Lock()
+
+
+def get_cached_response(cache_key, version):
+    with downloads_response_cache_lock:
+        entry = downloads_response_cache.get(cache_key)
+        if entry is None or entry['version'] != version:
+            return None
+        downloads_response_cache.move_to_end(cache_key)
+        return entry
+
+
+def store_cached_response(cache_key, version, body):
+    entry = {'version': version, 'body': body, 'gzip': None}
+    with downloads_response_cache_lock:
+        downloads_response_cache[cache_key] = entry
+        downloads_response_cache.move_to_end(cache_key)
+        while len(downloads_response_cache) > RESPONSE_CACHE_SIZE:
+            downloads_response_cache.popitem(last=False)
+    return entry
+
+
+def get_job_work_dir(video_id, work_folder=None):
+    """작업 전용 임시 디렉터리 경로"""
+    work_folder = work_folder or JOB_WORK_FOLDER
+    return os.path.join(work_folder, os.path.basename(video_id))
+
+
+def cleanup_job_work_dir(video_id, work_folder=None):
+    """작업 디렉터리만 통째로 삭제한다 (.part, .ytdl 등 부분 파일 포함, 다른 작업에는 영향 없음)"""
+    work_dir = get_job_work_dir(video_id, work_folder)
+    if not os.path.isdir(work_dir):
+        return 0
     try:
-        for filename in os.listdir(DOWNLOAD_FOLDER):
-            # 부분 다운로드 파일 패턴 매칭
-            if filename.endswith(('.part', '.ytdl', '.temp')) or \
-               (video_title and video_title in filename and filename.endswith('.part')):
-                filepath = os.path.join(DOWNLOAD_FOLDER, filename)
+        shutil.rmtree(work_dir)
+        print(f"Cleaned up job directory: {work_dir}")
+        return 1
+    except Exception as e:
+        print(f"Failed to clean up {work_dir}: {e}")
+        return 0
+
+
+def move_job_output_into_place(work_path, dest_folder=None):
+    """작업 디렉터리의 완료 파일을 다운로드 폴더로 원자적으로 이동하고 파일명을 반환한다.
+
+    같은 이름의 파일(같은 영상의 다른 화질/포맷 등)이 있으면 덮어쓰지 않고 ' (n)'을 붙인 이름을 쓴다.
+    """
+    dest_folder = dest_folder or DOWNLOAD_FOLDER
+    base, ext = os.path.splitext(os.path.basename(work_path))
+    for index in itertools.count():
+        filename = f'{base}{ext}' if index == 0 else f'{base} ({index}){ext}'
+        dest_path = os.path.join(dest_folder, filename)
+        try:
+            # 하드 링크는 대상이 이미 있으면 실패하므로 확인과 이동 사이에 다른 작업이 끼어들어도 덮어쓰지 않는다
+            os.link(work_path, dest_path)
+        except FileExistsError:
+            continue
+        except OSError:
+            # 하드 링크를 지원하지 않는 파일 시스템
+            if os.path.exists(dest_path):
+                continue
+            os.replace(work_path, dest_path)
+            return filename
+        os.remove(work_path)
+        return filename
+
+
+history_write_queue = Queue()
+
+
+def queue_history_write(action, fields, history_id=None, timeline=None, timeline_field=None, subtitle_cues=None,
+                        job_id=None):
+    """워커 스레드의 DB 쓰기를 write-behind 큐에 넣는다. DB 잠금을 기다리지 않고 바로 반환한다.
+
+    job_id를 주면 커밋이 끝난 뒤 그 작업의 history_pending 표시를 지운다.
+    """
+    if timeline is not None:
+        record_job_stage(timeline, 'persist_queued')
+    history_write_queue.put({
+        'action': action,
+        'history_id': history_id,
+        'fields': fields,
+        'timeline': timeline,
+        'timeline_field': timeline_field,
+        'subtitle_cues': subtitle_cues,
+        'job_id': job_id,
+    })
+
+
+def drain_queue_batch(queue, max_items, timeout):
+    """첫 항목을 timeout까지 기다린 뒤, 이미 쌓여 있는 항목을 max_items까지 모은다."""
+    try:
+        batch = [queue.get(timeout=timeout)]
+    except Empty:
+        return []
+    while len(batch) < max_items:
+        try:
+            batch.append(queue.get_nowait())
+        except Empty:
+            break
+    return batch
+
+
+def apply_history_write(operation):
+    """쓰기 하나를 현재 세션에 반영하고 대상 이력 행을 반환한다 (없으면 None). 커밋은 호출한 쪽에서 한다."""
+    fields = dict(operation['fields'])
+    timeline = operation.get('timeline')
+    if timeline is not None:
+        fields[operation['timeline_field']] = encode_stage_timeline(timeline)
+
+    if operation['action'] == 'insert':
+        history = DownloadHistory(**fields)
+        db.session.add(history)
+        return history
+
+    history = db.session.get(DownloadHistory, operation['history_id'])
+    if not history:
+        return None
+    for name, value in fields.items():
+        setattr(history, name, value)
+    # 자막 상태와 검색 색인이 같은 트랜잭션으로 반영되도록 한다
+    if operation.get('subtitle_cues') is not None:
+        replace_subtitle_search_index(history.id, operation['subtitle_cues'])
+    return history
+
+
+def record_history_persisted(applied):
+    """커밋이 끝난 쓰기에만 persisted 단계를 남기고, 완료 작업을 목록에 남겨 두던 history_pending 표시를 지운다.
+
+    단계 기록이 실패해도 이미 커밋된 이력에는 영향이 없다.
+    """
+    recorded = False
+    for operation, history in applied:
+        if operation.get('job_id'):
+            job_store.update(operation['job_id'], history_pending=False)
+        timeline = operation.get('timeline')
+        if timeline is None or history is None:
+            continue
+        record_job_stage(timeline, 'persisted')
+        setattr(history, operation['timeline_field'], encode_stage_timeline(timeline))
+        recorded = True
+    if not recorded:
+        return
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to record persisted stage: {e}")
+
+
+def apply_history_writes(operations):
+    """모아진 쓰기를 하나의 트랜잭션으로 반영한다. 실패하면 항목별로 다시 시도한다."""
+    if not operations:
+        return
+    with app.app_context():
+        try:
+            applied = [(operation, apply_history_write(operation)) for operation in operations]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"History batch write failed, retrying individually: {e}")
+            applied = []
+            for operation in operations:
                 try:
-                    os.remove(filepath)
-                    print(f"Cleaned up partial file: {filename}")
-                except Exception as e:
-                    print(f"Failed to clean up {filename}: {e}")
+                    history = apply_history_write(operation)
+                    db.session.commit()
+                    applied.append((operation, history))
+                except Exception as item_error:
+                    db.session.rollback()
+                    print(f"Failed to write download history: {item_error}")
+        record_history_persisted(applied)
+
+    if STORAGE_EVICTION_ENABLED and any(operation['action'] == 'insert' for operation in operations):
+        storage_eviction_event.set()
+
+
+def decode_history_write(operation):
+    """워커 API로 받은 쓰기의 날짜 필드(ISO 문자열)를 datetime으로 되돌린다."""
+    columns = DownloadHistory.__table__.columns
+    fields = {
+        name: datetime.fromisoformat(value)
+        if isinstance(value, str) and name in columns and isinstance(columns[name].type, db.DateTime) else value
+        for name, value in operation['fields'].items()
+    }
+    return {**operation, 'fields': fields}
+
+
+def forward_history_writes(operations):
+    """원격 워커는 DB가 없으므로 모아진 쓰기를 웹 프로세스에 넘긴다. 실패하면 다시 큐에 넣는다."""
+    try:
+        worker_api.call('history', 'apply', operations)
+        return True
     except Exception as e:
-        print(f"Cleanup error: {e}")
+        print(f"Failed to forward history writes, will retry: {e}", flush=True)
+        for operation in operations:
+            history_write_queue.put(operation)
+        return False
+
+
+# 자막 작업이 읽는 이력 필드 (원격 워커는 워커 API로 받는다)
+HISTORY_SNAPSHOT_FIELDS = ('id', 'filename', 'duration', 'subtitle_filename', 'subtitle_timeline')
+
+
+def get_history_snapshot(history_id):
+    if worker_api is not None:
+        return worker_api.call('history', 'get', history_id)
+    with app.app_context():
+        history = db.session.get(DownloadHistory, history_id)
+        return {name: getattr(history, name) for name in HISTORY_SNAPSHOT_FIELDS} if history else None
+
+
+def history_writer():
+    while True:
+        batch = drain_queue_batch(history_write_queue, HISTORY_WRITE_BATCH_SIZE, HISTORY_WRITE_INTERVAL_SECONDS)
+        if not batch:
+            continue
+        try:
+            if worker_api is None:
+                apply_history_writes(batch)
+            elif not forward_history_writes(batch):
+                time.sleep(WORKER_POLL_SECONDS)
+        finally:
+            for _ in batch:
+                history_write_queue.task_done()
+
+
+def flush_history_writes():
+    """종료 시 큐에 남은 쓰기를 모두 반영한다."""
+    batch = drain_queue_batch(history_write_queue, history_write_queue.qsize() + 1, 0.01)
+    if worker_api is not None:
+        if batch:
+            forward_history_writes(batch)
+        return
+    apply_history_writes(batch)
 
 
 def save_download_history(video_id, status):
@@ -306,9 +1498,13 @@ def save_download_history(video_id, status):
     # 완료된 것만 저장, 실패/취소는 저장하지 않음
     if status != 'completed':
         return
+    if not holds_job_lease():
+        print(f"Skipping history for {video_id}: lease was taken over by another worker", flush=True)
+        job_store.update(video_id, history_pending=False)
+        return
 
     try:
-        video_data = download_status.get(video_id, {})
+        video_data = job_store.get(video_id) or {}
 
         # 파일 크기 가져오기
         file_size = None
@@ -317,27 +1513,286 @@ def save_download_history(video_id, status):
             if os.path.exists(filepath):
                 file_size = os.path.getsize(filepath)
 
-        with app.app_context():
-            history = DownloadHistory(
-                url=video_data.get('url', ''),
-                video_title=video_data.get('video_title', ''),
-                filename=video_data.get('filename'),
-                quality=video_data.get('quality'),
-                format_type=video_data.get('format_type'),
-                status=status,
-                file_size=file_size,
-                completed_at=datetime.utcnow() if status in ['completed', 'error', 'cancelled'] else None
-            )
-            db.session.add(history)
-            db.session.commit()
+        queue_history_write('insert', {
+            'url': video_data.get('url', ''),
+            'video_title': video_data.get('video_title', ''),
+            'filename': video_data.get('filename'),
+            'quality': video_data.get('quality'),
+            'format_type': video_data.get('format_type'),
+            'thumbnail_key': video_data.get('thumbnail_key'),
+            'duration': video_data.get('duration') or None,
+            'format_plan': json.dumps(video_data['format_plan']) if video_data.get('format_plan') else None,
+            'clip_section': json.dumps(video_data['clip_section']) if video_data.get('clip_section') else None,
+            'status': status,
+            'file_size': file_size,
+            'completed_at': datetime.utcnow() if status in ['completed', 'error', 'cancelled'] else None,
+        }, timeline=video_data.setdefault('timeline', []), timeline_field='stage_timeline', job_id=video_id)
     except Exception as e:
+        job_store.update(video_id, history_pending=False)
         print(f"Failed to save download history: {e}")
-cancel_events = {}
 download_queue = Queue()
-subtitle_queue = Queue()
+postprocess_queue = Queue()
+subtitle_queue = PriorityQueue()  # (우선순위, 순번, history_id, 작업 토큰)
+subtitle_queue_sequence = itertools.count()
 active_downloads = 0
 lock = threading.Lock()
-playlist_groups = {}
+storage_eviction_event = threading.Event()
+
+# 화질별 대략적인 비트레이트 (bytes/sec) - 파일 크기 정보가 없을 때 용량 추정에 사용
+ESTIMATED_BYTES_PER_SECOND = {
+    'best': 2_500_000,
+    '2160p': 2_500_000,
+    '1440p': 1_250_000,
+    '1080p': 625_000,
+    '720p': 320_000,
+    '480p': 150_000,
+    '360p': 100_000,
+}
+ESTIMATED_AUDIO_BYTES_PER_SECOND = 24_000
+
+
+def estimate_download_size(info, quality='best', format_type='video', section=None):
+    """추출된 메타데이터로 다운로드 예상 크기(bytes)를 계산한다. section이 있으면 그 구간 길이만큼만 센다."""
+    size = info.get('filesize') or info.get('filesize_approx')
+    duration = info.get('duration') or 0
+    if section is not None:
+        clip_seconds = section['end'] - section['start']
+        if size and duration:
+            return int(size * min(1, clip_seconds / duration))
+        size, duration = None, clip_seconds
+    if size:
+        return int(size)
+    if format_type.startswith('audio_'):
+        return int(duration * ESTIMATED_AUDIO_BYTES_PER_SECOND)
+    return int(duration * ESTIMATED_BYTES_PER_SECOND.get(quality, ESTIMATED_BYTES_PER_SECOND['best']))
+
+
+def get_reserved_download_bytes():
+    """진행 중인 다운로드가 사용할 것으로 예상되는 용량 합계"""
+    return sum(
+        data.get('estimated_size') or 0
+        for _, data in job_store.items()
+        if data.get('status') in ACTIVE_JOB_STATUSES
+    )
+
+
+def check_storage_admission(estimated_size, folder=None):
+    """새 다운로드를 받을 여유 공간이 있으면 None, 없으면 오류 메시지를 반환한다."""
+    folder = folder or DOWNLOAD_FOLDER
+    free_bytes = shutil.disk_usage(folder).free
+    available = free_bytes - STORAGE_MIN_FREE_BYTES - get_reserved_download_bytes()
+    if estimated_size > available:
+        return (
+            f'저장 공간이 부족합니다. 예상 크기 {estimated_size // (1024 ** 2)}MB, '
+            f'사용 가능 {max(available, 0) // (1024 ** 2)}MB'
+        )
+    return None
+
+
+def get_media_access_time(history):
+    return history.last_accessed_at or history.completed_at or history.created_at or datetime.min
+
+
+def select_eviction_candidates(histories, bytes_to_free, max_items=None):
+    """가장 오래 사용되지 않은 항목부터 bytes_to_free 만큼 정리할 대상을 고른다."""
+    max_items = STORAGE_EVICTION_BATCH_SIZE if max_items is None else max_items
+    candidates = []
+    freed = 0
+    for history in sorted(histories, key=get_media_access_time):
+        if freed >= bytes_to_free or len(candidates) >= max_items:
+            break
+        if not history.filename or getattr(history, 'media_evicted_at', None):
+            continue
+        candidates.append(history)
+        freed += history.file_size or 0
+    return candidates
+
+
+def get_stored_media_bytes():
+    """DB 기준 보관 중인 미디어 용량 합계 (폴더 전체를 스캔하지 않음)"""
+    total = db.session.query(db.func.coalesce(db.func.sum(DownloadHistory.file_size), 0)).filter(
+        DownloadHistory.status == 'completed',
+        DownloadHistory.media_evicted_at.is_(None),
+    ).scalar()
+    return int(total or 0)
+
+
+def get_bytes_to_evict():
+    over_quota = 0
+    if STORAGE_QUOTA_BYTES > 0:
+        over_quota = get_stored_media_bytes() - STORAGE_QUOTA_BYTES
+    low_free = 0
+    if STORAGE_MIN_FREE_BYTES > 0:
+        low_free = STORAGE_MIN_FREE_BYTES - shutil.disk_usage(DOWNLOAD_FOLDER).free
+    return max(over_quota, low_free, 0)
+
+
+def run_storage_eviction_pass():
+    """할당량 초과분을 LRU 순서로 한 배치만큼 정리한다. 이력과 자막은 유지한다."""
+    with app.app_context():
+        bytes_to_free = get_bytes_to_evict()
+        if bytes_to_free <= 0:
+            return 0
+
+        histories = DownloadHistory.query.filter(
+            DownloadHistory.status == 'completed',
+            DownloadHistory.filename.isnot(None),
+            DownloadHistory.media_evicted_at.is_(None),
+            db.or_(
+                DownloadHistory.subtitle_status.is_(None),
+                DownloadHistory.subtitle_status.notin_(['queued', 'processing']),
+            ),
+        ).order_by(
+            db.func.coalesce(DownloadHistory.last_accessed_at, DownloadHistory.completed_at, DownloadHistory.created_at)
+        ).limit(STORAGE_EVICTION_BATCH_SIZE * 4).all()
+
+        evicted = 0
+        for history in select_eviction_candidates(histories, bytes_to_free):
+            try:
+                delete_file_in_folder(DOWNLOAD_FOLDER, history.filename)
+            except OSError as e:
+                print(f"Failed to evict {history.filename}: {e}")
+                continue
+            history.media_evicted_at = datetime.utcnow()
+            evicted += 1
+            print(f"Evicted media (LRU): {history.filename}")
+        db.session.commit()
+        return evicted
+
+
+def storage_worker():
+    while True:
+        storage_eviction_event.wait(timeout=STORAGE_EVICTION_INTERVAL_SECONDS)
+        storage_eviction_event.clear()
+        if not STORAGE_EVICTION_ENABLED:
+            continue
+        try:
+            # 한 배치를 모두 정리했다면 아직 초과 상태일 수 있으므로 바로 다음 배치 진행
+            while run_storage_eviction_pass() >= STORAGE_EVICTION_BATCH_SIZE:
+                time.sleep(0.1)
+        except Exception as e:
+            print(f"Storage eviction error: {e}")
+
+
+# --- 끝난 작업 보관 (메모리 -> job_archive) ---
+ARCHIVE_DROPPED_FIELDS = ('speed', 'token', 'estimated_size')
+
+
+def select_retention_candidates(records, now, max_age_seconds=None, max_items=None):
+    """(job_id, 종료 시각) 목록에서 보관 기간이 지났거나 최신 max_items 개 밖에 있는 작업 ID를 고른다."""
+    max_age_seconds = JOB_RETENTION_SECONDS if max_age_seconds is None else max_age_seconds
+    max_items = JOB_RETENTION_MAX_ITEMS if max_items is None else max_items
+    newest_first = sorted(records, key=lambda record: record[1] or 0, reverse=True)
+    return [
+        job_id for index, (job_id, finished_at) in enumerate(newest_first)
+        if index >= max_items or now - (finished_at or 0) >= max_age_seconds
+    ]
+
+
+def compact_job_data(data):
+    return json.dumps(
+        {key: value for key, value in data.items() if key not in ARCHIVE_DROPPED_FIELDS},
+        separators=(',', ':'),
+    )
+
+
+def get_job_records(job_ids):
+    """작업 상태를 job_store에서 먼저 찾고, 없으면 job_archive에서 찾는다."""
+    records = {}
+    for job_id in job_ids:
+        data = job_store.get(job_id)
+        if data is not None:
+            records[job_id] = data
+    missing = [job_id for job_id in job_ids if job_id not in records]
+    if missing:
+        for archived in JobArchive.query.filter(JobArchive.job_id.in_(missing)).all():
+            records[archived.job_id] = json.loads(archived.data)
+    return records
+
+
+def get_job_record(job_id):
+    return get_job_records([job_id]).get(job_id)
+
+
+def delete_archived_jobs(job_ids=None, statuses=None, kind=None):
+    query = JobArchive.query
+    if job_ids is not None:
+        query = query.filter(JobArchive.job_id.in_(job_ids))
+    if statuses is not None:
+        query = query.filter(JobArchive.status.in_(statuses))
+    if kind is not None:
+        query = query.filter_by(kind=kind)
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def archive_terminal_jobs(now=None):
+    """보관 기간/개수를 넘긴 끝난 작업을 job_archive로 옮기고 job_store에서 지운다. 옮긴 개수를 반환한다."""
+    now = time.time() if now is None else now
+    # 이력 커밋을 기다리는 완료 작업은 목록에서 사라지지 않도록 옮기지 않는다
+    terminal = {
+        job_id: data for job_id, data in job_store.items()
+        if data.get('status') in TERMINAL_JOB_STATUSES and not data.get('history_pending')
+    }
+    selected = select_retention_candidates(
+        [(job_id, data.get('finished_at')) for job_id, data in terminal.items()], now
+    )
+    records = [(job_id, 'download', terminal[job_id]) for job_id in selected]
+
+    # 남은 영상이 모두 메모리에서 빠지는 플레이리스트도 함께 옮긴다
+    leaving = set(selected)
+    for playlist_id, playlist in job_store.items(kind='playlist'):
+        remaining = [
+            vid for vid in playlist['video_ids']
+            if vid not in leaving and job_store.get(vid) is not None
+        ]
+        if not remaining:
+            records.append((playlist_id, 'playlist', playlist))
+
+    if not records:
+        return 0
+
+    with app.app_context():
+        for job_id, kind, data in records:
+            db.session.merge(JobArchive(
+                job_id=job_id,
+                kind=kind,
+                status=data.get('status'),
+                video_title=data.get('video_title') or data.get('title'),
+                data=compact_job_data(data),
+                finished_at=datetime.utcfromtimestamp(data.get('finished_at') or now),
+            ))
+        db.session.commit()
+
+    # DB에 기록된 뒤에만 메모리에서 지운다 (그 사이 재시도로 다시 대기 중이 된 작업은 남긴다)
+    for job_id, kind, _ in records:
+        current = job_store.get(job_id)
+        if current is not None and (kind == 'playlist' or current.get('status') in TERMINAL_JOB_STATUSES):
+            job_store.delete(job_id)
+    return len(records)
+
+
+def prune_job_archive(now=None):
+    if JOB_ARCHIVE_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = datetime.utcfromtimestamp(time.time() if now is None else now) - timedelta(days=JOB_ARCHIVE_RETENTION_DAYS)
+    with app.app_context():
+        deleted = JobArchive.query.filter(JobArchive.finished_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+    return deleted
+
+
+def retention_worker():
+    while True:
+        time.sleep(JOB_RETENTION_INTERVAL_SECONDS)
+        try:
+            archived = archive_terminal_jobs()
+            pruned = prune_job_archive()
+            if archived or pruned:
+                print(f"[retention] archived={archived} pruned={pruned}", flush=True)
+        except Exception as e:
+            print(f"Job retention error: {e}")
 
 def get_format_string(quality, format_type):
     """화질과 포맷에 따른 yt-dlp 포맷 문자열 반환"""
@@ -359,6 +1814,502 @@ def get_format_string(quality, format_type):
     
     return quality_formats.get(quality, 'bestvideo+bestaudio/best')
 
+
+QUALITY_MAX_HEIGHTS = {'2160p': 2160, '1440p': 1440, '1080p': 1080, '720p': 720, '480p': 480, '360p': 360}
+# 스트림 복사만으로 합칠 수 있는 (컨테이너, 비디오 코덱 접두어, 오디오 코덱 접두어), 앞쪽이 우선
+MERGE_COMPATIBLE_CONTAINERS = (
+    ('mp4', ('avc1', 'h264', 'av01'), ('mp4a', 'aac')),
+    ('webm', ('vp9', 'vp09', 'vp8', 'av01'), ('opus', 'vorbis')),
+)
+
+
+def has_codec(fmt, kind):
+    codec = (fmt.get(kind) or 'none').lower()
+    return codec != 'none'
+
+
+def codec_matches(fmt, kind, prefixes):
+    return (fmt.get(kind) or '').lower().startswith(prefixes)
+
+
+def format_bitrate(fmt):
+    return fmt.get('tbr') or fmt.get('vbr') or fmt.get('abr') or 0
+
+
+def plan_download_format(formats, quality='best', format_type='video'):
+    """사용 가능한 포맷 목록으로 다운로드 계획을 세운다.
+
+    요청 화질을 만족하는 progressive(영상+음성 단일 파일) 포맷이 있으면 병합 없이 받고,
+    병합이 필요하면 같은 컨테이너에 들어가는 코덱 조합을 골라 ffmpeg가 스트림 복사만 하게 한다.
+    반환값: {'kind', 'format_ids', 'ext', 'height'} 또는 선택할 포맷이 없으면 None
+    """
+    formats = [fmt for fmt in formats or [] if fmt.get('format_id') and fmt.get('ext') != 'mhtml']
+    if not formats:
+        return None
+
+    if format_type in ('audio_mp3', 'audio_m4a'):
+        audio_formats = [fmt for fmt in formats if has_codec(fmt, 'acodec') and not has_codec(fmt, 'vcodec')]
+        if not audio_formats:
+            # 음성 전용 포맷이 없으면 포맷 문자열(bestaudio/best)에 맡긴다. 비트레이트만 보면 영상 전용 스트림을 고르게 된다.
+            return None
+        if format_type == 'audio_m4a':
+            audio_formats = [fmt for fmt in audio_formats if fmt.get('ext') == 'm4a'] or audio_formats
+        chosen = max(audio_formats, key=format_bitrate)
+        return {'kind': 'audio', 'format_ids': [chosen['format_id']], 'ext': chosen.get('ext'), 'height': None}
+
+    max_height = QUALITY_MAX_HEIGHTS.get(quality)
+    videos = [
+        fmt for fmt in formats
+        if has_codec(fmt, 'vcodec') and fmt.get('height') and (max_height is None or fmt['height'] <= max_height)
+    ]
+    if not videos:
+        # 화질 상한 안의 영상 포맷이 없으면 포맷 문자열 선택(get_format_string)에 맡긴다
+        return None
+
+    target_height = max(fmt['height'] for fmt in videos)
+    progressive = [fmt for fmt in videos if has_codec(fmt, 'acodec') and fmt['height'] >= target_height]
+    if progressive:
+        chosen = max(progressive, key=lambda fmt: (fmt['height'], format_bitrate(fmt)))
+        return {'kind': 'progressive', 'format_ids': [chosen['format_id']], 'ext': chosen.get('ext'), 'height': chosen['height']}
+
+    video_only = [fmt for fmt in videos if not has_codec(fmt, 'acodec') and fmt['height'] == target_height]
+    audio_only = [fmt for fmt in formats if has_codec(fmt, 'acodec') and not has_codec(fmt, 'vcodec')]
+    for container, video_codecs, audio_codecs in MERGE_COMPATIBLE_CONTAINERS:
+        video_candidates = [fmt for fmt in video_only if fmt.get('ext') == container and codec_matches(fmt, 'vcodec', video_codecs)]
+        audio_candidates = [fmt for fmt in audio_only if codec_matches(fmt, 'acodec', audio_codecs)]
+        if video_candidates and audio_candidates:
+            video = max(video_candidates, key=format_bitrate)
+            audio = max(audio_candidates, key=format_bitrate)
+            return {
+                'kind': 'merge_copy',
+                'format_ids': [video['format_id'], audio['format_id']],
+                'ext': container,
+                'height': target_height,
+            }
+
+    video = max(video_only or videos, key=format_bitrate)
+    if not audio_only or has_codec(video, 'acodec'):
+        return {'kind': 'progressive', 'format_ids': [video['format_id']], 'ext': video.get('ext'), 'height': video['height']}
+    audio = max(audio_only, key=format_bitrate)
+    return {'kind': 'merge', 'format_ids': [video['format_id'], audio['format_id']], 'ext': 'mkv', 'height': video['height']}
+
+
+def build_planned_format_selector(quality, format_type, plan_holder):
+    """yt-dlp format 옵션에 넘길 선택 함수. 추출 결과의 포맷 목록으로 계획을 세우고 plan_holder에 기록한다.
+
+    병합 계획이면 비디오와 오디오를 각각 yield해 yt-dlp가 합치지 않고 두 파일로 받게 한다.
+    ydl은 선택을 요청한 YoutubeDL로, 계획을 세울 수 없을 때 그 인스턴스의 params로 포맷 문자열을 해석한다.
+    """
+    def select_format(ctx, ydl):
+        formats = ctx.get('formats') or []
+        plan = plan_download_format(formats, quality, format_type)
+        if plan is None:
+            # 계획을 세울 수 없으면 기존 포맷 문자열로 yt-dlp가 고르게 한다
+            plan_holder.update({'kind': 'selector', 'format_ids': [], 'ext': None, 'height': None})
+            yield from ydl.build_format_selector(get_format_string(quality, format_type))(ctx)
+            return
+        plan_holder.update(plan)
+        # 병합이 필요한 조합도 각각 따로 받는다. 병합은 후처리 워커가 네트워크 슬롯 밖에서 한다.
+        by_id = {fmt['format_id']: fmt for fmt in formats if fmt.get('format_id')}
+        for format_id in plan['format_ids']:
+            yield by_id[format_id]
+
+    return select_format
+
+
+class YoutubeDLPool:
+    """재사용할 YoutubeDL 인스턴스 풀 (프로필별).
+
+    인스턴스마다 추출기, 플레이어 JS/서명 캐시, HTTP 연결 풀(keep-alive)을 유지한다.
+    생성 후에는 params나 yt-dlp 내부 상태를 고치지 않는다. 다운로드 프로필(download_profiles)의 작업별 옵션
+    (format 선택 함수, download_ranges, progress/postprocessor hook)은 생성할 때 넣은 디스패처가
+    현재 작업의 값을 불러 쓰고, 출력 위치는 인스턴스 전용 디렉터리(paths.home)로 고정한다.
+    """
+
+    def __init__(self, profiles, max_idle=None, max_uses=None, download_profiles=(), context_folder=None):
+        self.profiles = profiles
+        self.download_profiles = set(download_profiles)
+        self.context_folder = context_folder or YTDL_CONTEXT_FOLDER
+        self.max_idle = YTDL_POOL_SIZE if max_idle is None else max_idle
+        self.max_uses = YTDL_POOL_MAX_USES if max_uses is None else max_uses
+        self._idle = {profile: [] for profile in profiles}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0}
+
+    @staticmethod
+    def _dispatch_hooks(entry, name, d):
+        for hook in entry['job'].get(name, ()):
+            hook(d)
+
+    def _create(self, profile):
+        import yt_dlp
+
+        entry = {'uses': 0, 'job': {}, 'home': None}
+        params = {'cachedir': YTDL_CACHE_DIR, **self.profiles[profile]}
+        if profile in self.download_profiles:
+            # 여러 프로세스가 같은 폴더를 쓰므로 호스트/프로세스별로 이름을 나눈다
+            entry['home'] = os.path.join(
+                self.context_folder, f'{socket.gethostname()}-{os.getpid()}-{next(self._sequence)}'
+            )
+            params.update(
+                format=lambda ctx: entry['job']['format'](ctx, entry['ydl']),
+                download_ranges=lambda info_dict, ydl: (entry['job'].get('download_ranges') or (lambda *_: [{}]))(info_dict, ydl),
+                paths={'home': entry['home']},
+            )
+        entry['ydl'] = yt_dlp.YoutubeDL(params)
+        entry['ydl'].add_progress_hook(lambda d: self._dispatch_hooks(entry, 'progress_hooks', d))
+        entry['ydl'].add_postprocessor_hook(lambda d: self._dispatch_hooks(entry, 'postprocessor_hooks', d))
+        with self._lock:
+            self._stats['created'] += 1
+        return entry
+
+    def _release(self, profile, entry, discard):
+        entry['uses'] += 1
+        with self._lock:
+            idle = self._idle[profile]
+            if discard or entry['uses'] >= self.max_uses or len(idle) >= self.max_idle:
+                self._stats['discarded'] += 1
+            else:
+                idle.append(entry)
+                return
+        entry['ydl'].close()
+
+    @contextmanager
+    def session(self, profile, work_dir=None, **job):
+        """작업 하나 동안 인스턴스를 독점해서 빌려준다. 작업 중 예외가 나면 상태를 믿을 수 없으므로 버린다.
+
+        다운로드 프로필이면 job(format, download_ranges, progress_hooks, postprocessor_hooks)을 디스패처에 연결하고,
+        작업 디렉터리(work_dir)를 인스턴스 디렉터리로 옮겼다가 끝나면 되돌린다 (이어받을 .part 파일 포함).
+        format 선택 함수는 (ctx, 호출한 YoutubeDL)로 불린다. 세션 안에서 yt-dlp가 돌려주는 경로는
+        인스턴스 디렉터리 기준이므로 YoutubeDLPool.job_path로 작업 디렉터리 경로로 바꾼다.
+        """
+        with self._lock:
+            idle = self._idle[profile]
+            entry = idle.pop() if idle else None
+            if entry is not None:
+                self._stats['reused'] += 1
+        if entry is None:
+            entry = self._create(profile)
+
+        home = entry['home']
+        if home:
+            # 이전 작업이 되돌리지 못하고 남긴 디렉터리는 주인이 없다
+            shutil.rmtree(home, ignore_errors=True)
+            os.makedirs(self.context_folder, exist_ok=True)
+            if os.path.isdir(work_dir):
+                os.rename(work_dir, home)
+            else:
+                os.makedirs(home)
+        entry['job'] = job
+
+        discard = True
+        try:
+            yield entry['ydl']
+            discard = False
+        finally:
+            entry['job'] = {}
+            if home:
+                os.makedirs(os.path.dirname(work_dir), exist_ok=True)
+                os.rename(home, work_dir)
+            self._release(profile, entry, discard)
+
+    @staticmethod
+    def job_path(ydl, path, work_dir):
+        """인스턴스 디렉터리 안의 경로를 세션이 끝난 뒤의 작업 디렉터리 경로로 바꾼다."""
+        return os.path.join(work_dir, os.path.relpath(path, ydl.params['paths']['home']))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'idle': {profile: len(idle) for profile, idle in self._idle.items()},
+            }
+
+
+# info: 목록/메타데이터 추출 (작업별 옵션 없음)
+# download: 다운로드 워커용 (기존처럼 yt-dlp 출력 유지). 포맷별로 따로 받으므로 파일명에 format_id를 넣어 충돌을 피한다.
+ytdl_pool = YoutubeDLPool({
+    'info': {'quiet': True, 'no_warnings': True, 'extract_flat': True},
+    'download': {'outtmpl': '%(title)s.f%(format_id)s.%(ext)s', 'force_keyframes_at_cuts': CLIP_PRECISE_CUTS},
+}, download_profiles=('download',))
+
+
+thumbnail_queue = Queue()
+thumbnail_pending = set()
+YOUTUBE_VIDEO_ID_PATTERNS = (
+    re.compile(r'[?&]v=([A-Za-z0-9_-]{6,})'),
+    re.compile(r'youtu\.be/([A-Za-z0-9_-]{6,})'),
+    re.compile(r'embed/([A-Za-z0-9_-]{6,})'),
+    re.compile(r'shorts/([A-Za-z0-9_-]{6,})'),
+)
+THUMBNAIL_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{6,64}$')
+# YouTube가 아닌 영상은 원본 썸네일 URL의 해시를 키로 쓴다 (원본 URL을 알아야 다시 받을 수 있다)
+THUMBNAIL_SOURCE_KEY_PREFIX = 'url-'
+
+
+def extract_youtube_video_id(url):
+    """YouTube URL에서 비디오 ID를 추출한다 (썸네일 캐시 키로 사용)."""
+    for pattern in YOUTUBE_VIDEO_ID_PATTERNS:
+        match = pattern.search(url or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def get_thumbnail_key(url, source_url=None):
+    """썸네일 캐시 키: YouTube면 비디오 ID, 아니면 원본 썸네일 URL의 해시."""
+    video_id = extract_youtube_video_id(url)
+    if video_id:
+        return video_id
+    if source_url:
+        return THUMBNAIL_SOURCE_KEY_PREFIX + hashlib.sha1(source_url.encode('utf-8')).hexdigest()
+    return None
+
+
+def get_thumbnail_url(thumbnail_key):
+    return f'/thumbnails/{thumbnail_key}.jpg' if thumbnail_key else None
+
+
+def resize_thumbnail(source_path, output_path, width=None):
+    """ffmpeg로 표시 크기에 맞게 썸네일을 줄인다."""
+    width = width or THUMBNAIL_WIDTH
+    command = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', source_path,
+        '-vf', f'scale=min({width}\\,iw):-2',
+        '-q:v', '4',
+        output_path,
+    ]
+    result = subprocess.run(command, check=False, capture_output=True, text=True, timeout=30)
+    if result.returncode != 0:
+        raise Exception((result.stderr or 'thumbnail resize failed').strip()[:300])
+
+
+def fetch_thumbnail(thumbnail_key, source_url=None, folder=None):
+    """썸네일을 한 번만 내려받아 줄인 뒤 캐시 키 이름(<key>.jpg)으로 저장한다."""
+    folder = folder or THUMBNAIL_FOLDER
+    target_path = os.path.join(folder, f'{thumbnail_key}.jpg')
+    if os.path.exists(target_path):
+        return target_path
+
+    source_url = source_url or f'https://i.ytimg.com/vi/{thumbnail_key}/mqdefault.jpg'
+    os.makedirs(folder, exist_ok=True)
+    original_path = os.path.join(folder, f'.{thumbnail_key}.orig')
+    resized_path = os.path.join(folder, f'.{thumbnail_key}.tmp.jpg')
+    try:
+        request_obj = urllib.request.Request(source_url, headers={'User-Agent': 'Mozilla/5.0'})
+        with urllib.request.urlopen(request_obj, timeout=15) as response, open(original_path, 'wb') as output:
+            shutil.copyfileobj(response, output)
+        try:
+            resize_thumbnail(original_path, resized_path)
+        except Exception as e:
+            # ffmpeg가 없거나 실패하면 원본을 그대로 캐시한다. .jpg로 제공하므로 JPEG가 아니면(webp/png 등) 캐시하지 않는다.
+            with open(original_path, 'rb') as original:
+                if original.read(3) != b'\xff\xd8\xff':
+                    raise Exception(f'thumbnail is not JPEG and could not be converted: {e}')
+            print(f"Thumbnail resize skipped for {thumbnail_key}: {e}")
+            os.replace(original_path, resized_path)
+        os.replace(resized_path, target_path)
+        return target_path
+    finally:
+        for leftover in (original_path, resized_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def enqueue_thumbnail_fetch(thumbnail_key, source_url=None):
+    if not thumbnail_key:
+        return
+    with lock:
+        if thumbnail_key in thumbnail_pending:
+            return
+        thumbnail_pending.add(thumbnail_key)
+    thumbnail_queue.put((thumbnail_key, source_url))
+
+
+def thumbnail_worker():
+    while True:
+        thumbnail_key, source_url = thumbnail_queue.get()
+        try:
+            fetch_thumbnail(thumbnail_key, source_url)
+        except Exception as e:
+            print(f"Failed to fetch thumbnail {thumbnail_key}: {e}")
+        finally:
+            with lock:
+                thumbnail_pending.discard(thumbnail_key)
+            thumbnail_queue.task_done()
+
+
+# 다운로드 오류 분류 (yt-dlp 오류 메시지 기준). 앞에서부터 먼저 맞는 분류를 쓴다.
+DOWNLOAD_ERROR_PATTERNS = (
+    ('throttled', re.compile(r'HTTP Error 429|Too Many Requests|rate.?limit|confirm you.re not a bot', re.I)),
+    ('forbidden', re.compile(r'HTTP Error 403|Forbidden', re.I)),
+    # 그 밖의 4xx(404 등)는 다시 받아도 같으므로 재시도하지 않는다. 'Unable to download webpage: HTTP Error 404'처럼
+    # 전송 오류 문구와 함께 오므로 network보다 먼저 검사한다.
+    ('fatal', re.compile(r'HTTP Error 4\d\d', re.I)),
+    ('network', re.compile(
+        r'HTTP Error 5\d\d|timed? ?out|Connection (?:reset|refused|aborted)|Temporary failure|'
+        r'Remote end closed|IncompleteRead|Network is unreachable|getaddrinfo failed',
+        re.I,
+    )),
+)
+# 재시도할 오류 / 혼잡 신호로 보고 동시 다운로드 수를 줄일 오류
+RETRYABLE_DOWNLOAD_ERRORS = ('throttled', 'forbidden', 'network')
+CONGESTION_DOWNLOAD_ERRORS = ('throttled', 'forbidden')
+
+
+def classify_download_error(error):
+    message = str(error)
+    for error_class, pattern in DOWNLOAD_ERROR_PATTERNS:
+        if pattern.search(message):
+            return error_class
+    return 'fatal'
+
+
+def get_download_retry_delay(attempt, base_seconds=None, max_seconds=None):
+    """지수 백오프에 full jitter를 적용한 대기 시간 (초). 동시에 실패한 작업이 한꺼번에 재시도하지 않게 한다."""
+    base_seconds = DOWNLOAD_RETRY_BASE_SECONDS if base_seconds is None else base_seconds
+    max_seconds = DOWNLOAD_RETRY_MAX_SECONDS if max_seconds is None else max_seconds
+    return random.uniform(base_seconds / 2, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+class ConcurrencyController:
+    """AIMD 방식 동시 다운로드 제한. 성공하면 조금씩 늘리고, 스로틀링/오류/저속 신호가 오면 절반으로 줄인다."""
+
+    def __init__(self, max_limit, min_limit=1, cooldown_seconds=None, slow_bytes_per_second=None):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.cooldown_seconds = DOWNLOAD_CONCURRENCY_COOLDOWN_SECONDS if cooldown_seconds is None else cooldown_seconds
+        self.slow_bytes_per_second = (
+            DOWNLOAD_SLOW_BYTES_PER_SECOND if slow_bytes_per_second is None else slow_bytes_per_second
+        )
+        self._target = float(self.max_limit)
+        self._active = 0
+        self._reason = 'initial'
+        self._changed_at = time.time()
+        self._decreased_at = 0.0
+        self._backoff_until = 0.0
+        self._throttle_streak = 0
+        self._error_counts = {}
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return max(self.min_limit, int(self._target))
+
+    def _set_target(self, target, reason):
+        previous = self.limit
+        self._target = min(float(self.max_limit), max(float(self.min_limit), target))
+        if self.limit != previous:
+            self._reason = reason
+            self._changed_at = time.time()
+            print(f"[concurrency] download limit {previous} -> {self.limit} ({reason})", flush=True)
+            self._condition.notify_all()
+
+    def _decrease(self, reason):
+        now = time.time()
+        # 같은 혼잡 구간에서 들어온 신호는 한 번만 반영한다
+        if now - self._decreased_at < self.cooldown_seconds:
+            return
+        self._decreased_at = now
+        self._set_target(self._target / 2, reason)
+
+    def acquire(self):
+        """동시 실행 수가 제한보다 작고 백오프 구간이 끝날 때까지 기다린다."""
+        with self._condition:
+            while True:
+                wait_seconds = self._backoff_until - time.time()
+                if wait_seconds <= 0 and self._active < self.limit:
+                    self._active += 1
+                    return
+                self._condition.wait(timeout=min(1, wait_seconds) if wait_seconds > 0 else 1)
+
+    def release(self):
+        with self._condition:
+            self._active = max(0, self._active - 1)
+            self._condition.notify_all()
+
+    def record_success(self, bytes_per_second=None):
+        with self._condition:
+            self._throttle_streak = 0
+            if (
+                bytes_per_second is not None
+                and self.slow_bytes_per_second > 0
+                and bytes_per_second < self.slow_bytes_per_second
+                and self._active > 1
+            ):
+                self._decrease('slow_throughput')
+                return
+            self._set_target(self._target + 1 / max(1, self.limit), 'recovered')
+
+    def record_error(self, error_class):
+        with self._condition:
+            self._error_counts[error_class] = self._error_counts.get(error_class, 0) + 1
+            if error_class not in CONGESTION_DOWNLOAD_ERRORS:
+                return
+            self._decrease(error_class)
+            if error_class == 'throttled':
+                # 서버가 요청량을 문제 삼았으므로 새 작업 시작도 잠시 멈춘다
+                self._backoff_until = max(
+                    self._backoff_until,
+                    time.time() + get_download_retry_delay(self._throttle_streak),
+                )
+                self._throttle_streak += 1
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'target': round(self._target, 2),
+                'max_limit': self.max_limit,
+                'min_limit': self.min_limit,
+                'active': self._active,
+                'reason': self._reason,
+                'changed_at': datetime.utcfromtimestamp(self._changed_at).isoformat(),
+                'backoff_seconds': round(max(0.0, self._backoff_until - time.time()), 1),
+                'errors': dict(self._error_counts),
+            }
+
+
+download_controller = ConcurrencyController(MAX_CONCURRENT_DOWNLOADS, DOWNLOAD_MIN_CONCURRENCY)
+
+
+def retry_download_job(job):
+    if job_store.is_cancel_requested(job['video_id']):
+        timeline = (job_store.get(job['video_id']) or {}).get('timeline') or []
+        mark_download_failed(job['video_id'], 'Cancelled by user', timeline)
+        return
+    enqueue_download_job(job)
+
+
+def schedule_download_retry(job, error_class, timeline):
+    """재시도 가능한 오류면 jitter 백오프 뒤 다시 큐에 넣는다. 재시도하지 않으면 False."""
+    attempt = job.get('attempt', 0)
+    if error_class not in RETRYABLE_DOWNLOAD_ERRORS or attempt >= DOWNLOAD_RETRY_MAX:
+        return False
+    delay = get_download_retry_delay(attempt)
+    record_job_stage(timeline, 'retry_scheduled')
+    job_store.update(
+        job['video_id'],
+        status='queued',
+        message=f'Retrying in {int(delay)}s ({error_class}, {attempt + 1}/{DOWNLOAD_RETRY_MAX})',
+        progress=0,
+        speed=0,
+        timeline=timeline,
+        error_class=error_class,
+    )
+    retry_job = {**job, 'attempt': attempt + 1}
+    if job_queue is not None:
+        # 독립 워커는 이 작업의 임대를 곧 완료하므로, 재시작해도 잃지 않게 공유 큐에 대기 시각과 함께 넣는다
+        job_queue.enqueue('download', retry_job, not_before=time.time() + delay)
+        return True
+    timer = threading.Timer(delay, retry_download_job, args=(retry_job,))
+    timer.daemon = True
+    timer.start()
+    return True
+
+
 def download_worker():
     global active_downloads
     
@@ -373,26 +2324,160 @@ def download_worker():
         quality = video_data.get('quality', 'best')
         format_type = video_data.get('format_type', 'video')
         
+        # 적응형 제한에 걸리면 여기서 기다린다 (스레드 수는 MAX_CONCURRENT_DOWNLOADS 그대로)
+        download_controller.acquire()
         with lock:
             active_downloads += 1
         
-        download_video(video_id, url, quality, format_type)
-        
-        with lock:
-            active_downloads -= 1
+        try:
+            download_video(video_id, url, quality, format_type, video_data.get('attempt', 0))
+        finally:
+            with lock:
+                active_downloads -= 1
+            download_controller.release()
         
         download_queue.task_done()
 
-def download_video(video_id, url, quality='best', format_type='video'):
+
+def enqueue_download_job(job):
+    if job_queue is not None:
+        job_queue.enqueue('download', job)
+    else:
+        download_queue.put(job)
+
+
+def enqueue_postprocess_job(job):
+    # 독립 워커에서는 후처리도 임대 작업으로 넣는다. 워커가 도중에 멈추면 임대가 만료되어 다른 워커가 이어서 처리한다.
+    if job_queue is not None:
+        job_queue.enqueue('postprocess', job)
+    else:
+        postprocess_queue.put(job)
+
+
+def get_download_queue_position():
+    """(현재 대기+진행 작업 수, 동시 처리 가능 수)"""
+    if job_queue is not None:
+        capacity = sum(node['download_slots'] for node in job_queue.live_nodes()) or MAX_CONCURRENT_DOWNLOADS
+        return job_queue.count('download'), capacity
+    with lock:
+        return active_downloads + download_queue.qsize(), download_controller.limit
+
+def parse_clip_timestamp(value):
+    """'90', '1:30', '1:02:03.5' 또는 숫자를 초로 바꾼다."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = float(value)
+    else:
+        parts = str(value).strip().split(':')
+        try:
+            if not 1 <= len(parts) <= 3:
+                raise ValueError
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError(f'구간 시각 형식이 올바르지 않습니다: {value}') from None
+    if not math.isfinite(seconds) or seconds < 0:
+        raise ValueError(f'구간 시각 형식이 올바르지 않습니다: {value}')
+    return seconds
+
+
+def format_clip_timestamp(seconds, separator=':'):
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f'{hours}{separator}{minutes:02d}{separator}{secs:02d}'
+    return f'{minutes}{separator}{secs:02d}'
+
+
+def parse_clip_sections(ranges, chapters, info):
+    """요청의 ranges(시각 구간)와 chapters(챕터 제목)를 [{'start', 'end', 'title'}] 목록으로 바꾼다."""
+    duration = info.get('duration') or None
+    if isinstance(ranges, str):
+        ranges = [part for part in ranges.split(',') if part.strip()]
+    if isinstance(chapters, str):
+        chapters = [chapters]
+
+    sections = []
+    for item in ranges or []:
+        if isinstance(item, dict):
+            start, end = item.get('start'), item.get('end')
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            start, end = item
+        elif isinstance(item, str) and '-' in item:
+            start, end = item.split('-', 1)
+        else:
+            raise ValueError(f'구간 형식이 올바르지 않습니다: {item}')
+        start = parse_clip_timestamp(start) if start not in (None, '') else 0.0
+        end = parse_clip_timestamp(end) if end not in (None, '') else duration
+        if end is None:
+            raise ValueError('영상 길이를 알 수 없어 구간의 끝 시각을 생략할 수 없습니다.')
+        sections.append({'start': start, 'end': end, 'title': None})
+
+    available = info.get('chapters') or []
+    for name in chapters or []:
+        wanted = str(name).strip().lower()
+        chapter = next((item for item in available if (item.get('title') or '').strip().lower() == wanted), None)
+        if chapter is None:
+            names = ', '.join(item.get('title') or '' for item in available) or '없음'
+            raise ValueError(f'챕터를 찾을 수 없습니다: {name} (사용 가능한 챕터: {names})')
+        sections.append({
+            'start': float(chapter.get('start_time') or 0),
+            'end': float(chapter.get('end_time') or duration or 0),
+            'title': chapter.get('title'),
+        })
+
+    if len(sections) > CLIP_MAX_SECTIONS:
+        raise ValueError(f'구간은 한 번에 최대 {CLIP_MAX_SECTIONS}개까지 받을 수 있습니다.')
+    for section in sections:
+        if duration:
+            if section['start'] >= duration:
+                raise ValueError(f"구간 시작 시각이 영상 길이를 넘습니다: {format_clip_timestamp(section['start'])}")
+            section['end'] = min(section['end'], duration)
+        if section['end'] <= section['start']:
+            raise ValueError(
+                f"구간의 끝 시각은 시작 시각보다 커야 합니다: "
+                f"{format_clip_timestamp(section['start'])}-{format_clip_timestamp(section['end'])}"
+            )
+    return sections
+
+
+def get_clip_label(section, separator=':'):
+    if section.get('title'):
+        return section['title']
+    return f"{format_clip_timestamp(section['start'], separator)}-{format_clip_timestamp(section['end'], separator)}"
+
+
+def build_clip_download_ranges(section):
+    """yt-dlp download_ranges 콜백. 이 구간만 받는다."""
+    def download_ranges(info_dict, ydl):
+        return [{'start_time': section['start'], 'end_time': section['end'], 'title': section.get('title')}]
+    return download_ranges
+
+
+def download_video(video_id, url, quality='best', format_type='video', attempt=0):
+    job_data = job_store.get(video_id) or {}
+    timeline = job_data.get('timeline') or []
+    clip_section = job_data.get('clip_section')
     try:
-        download_status[video_id]['status'] = 'downloading'
-        download_status[video_id]['message'] = 'Downloading...'
+        record_job_stage(timeline, 'started')
+        job_store.update(video_id, status='downloading', message='Downloading...', timeline=timeline)
+        last_progress = {'percent': None, 'reported_at': 0.0}
+        # 포맷별 전송량/시간 합계 (동시성 제어기의 처리량 신호)
+        transfer = {'bytes': 0, 'seconds': 0.0}
         
         def progress_hook(d):
-            if cancel_events[video_id].is_set():
+            if job_store.is_cancel_requested(video_id):
                 raise Exception('Cancelled by user')
             
-            if d['status'] == 'downloading':
+            if d['status'] == 'finished':
+                transfer['bytes'] += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                transfer['seconds'] += d.get('elapsed') or 0
+                record_job_stage(timeline, 'transfer_end')
+                job_store.update(video_id, timeline=timeline)
+            elif d['status'] == 'downloading':
+                if not any(stage == 'transfer_start' for stage, _ in timeline):
+                    record_job_stage(timeline, 'transfer_start')
+                    job_store.update(video_id, timeline=timeline)
                 try:
                     total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
                     downloaded = d.get('downloaded_bytes', 0)
@@ -400,75 +2485,239 @@ def download_video(video_id, url, quality='best', format_type='video'):
                     
                     if total > 0:
                         percent = int((downloaded / total) * 100)
-                        download_status[video_id]['progress'] = percent
                     else:
-                        download_status[video_id]['progress'] = 0
-                        
-                    # 속도 저장
-                    download_status[video_id]['speed'] = speed if speed else 0
+                        percent = 0
+
+                    # 공유 저장소 쓰기를 줄이기 위해 퍼센트가 바뀌었거나 1초가 지났을 때만 갱신
+                    now = time.time()
+                    if percent != last_progress['percent'] or now - last_progress['reported_at'] >= 1:
+                        last_progress.update(percent=percent, reported_at=now)
+                        job_store.update(video_id, progress=percent, speed=speed if speed else 0)
                 except:
                     pass
+
+        def postprocessor_hook(d):
+            if d['status'] == 'started':
+                record_job_stage(timeline, 'postprocess_start', keep_first=True)
+            elif d['status'] == 'finished':
+                record_job_stage(timeline, 'postprocess_end')
+            job_store.update(video_id, timeline=timeline)
         
-        format_string = get_format_string(quality, format_type)
+        format_plan = {}
         
-        ydl_opts = {
-            'format': format_string,
-            'outtmpl': os.path.join(DOWNLOAD_FOLDER, '%(title)s.%(ext)s'),
+        work_dir = get_job_work_dir(video_id)
+        os.makedirs(work_dir, exist_ok=True)
+
+        job_options = {
+            'format': build_planned_format_selector(quality, format_type, format_plan),
             'progress_hooks': [progress_hook],
+            'postprocessor_hooks': [postprocessor_hook],
         }
+        output_template = '%(title)s.%(ext)s'
+        if clip_section:
+            # 구간만 받는다 (ffmpeg로 해당 범위만 요청). 같은 영상의 다른 구간과 파일명이 겹치지 않게 구간 표시를 붙인다.
+            job_options['download_ranges'] = build_clip_download_ranges(clip_section)
+            label = re.sub(r'[\\/:*?"<>|%]', '_', get_clip_label(clip_section, separator='.'))
+            output_template = f'%(title)s [{label}].%(ext)s'
         
-        # 오디오 전용일 때 postprocessor 추가
-        if format_type == 'audio_mp3':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ytdl_pool.session('download', work_dir=work_dir, **job_options) as ydl:
             info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # mp3 변환 시 확장자 변경
-            if format_type == 'audio_mp3':
-                filename = os.path.splitext(filename)[0] + '.mp3'
-        
-        download_status[video_id].update({
-            'status': 'completed',
-            'message': 'Download completed',
-            'filename': os.path.basename(filename),
-            'progress': 100,
-            'speed': 0
-        })
+            downloaded_paths = [
+                YoutubeDLPool.job_path(ydl, path, work_dir)
+                for path in [item['filepath'] for item in info.get('requested_downloads') or [] if item.get('filepath')]
+                or [ydl.prepare_filename(info)]
+            ]
+            output_path = ydl.prepare_filename(info, outtmpl=os.path.join(work_dir, output_template))
+
+        # 작은 파일은 연결 비용이 커서 처리량 신호로 쓰지 않는다
+        if transfer['bytes'] >= 1024 ** 2 and transfer['seconds'] > 0:
+            download_controller.record_success(transfer['bytes'] / transfer['seconds'])
+        else:
+            download_controller.record_success()
 
-        # 다운로드 이력 저장
-        save_download_history(video_id, 'completed')
+        postprocess_kind = get_postprocess_kind(format_type, downloaded_paths)
+        if postprocess_kind is None:
+            if downloaded_paths[0] != output_path:
+                os.replace(downloaded_paths[0], output_path)
+            finish_download(video_id, output_path, timeline, format_plan)
+            return
+
+        # 전송이 끝났으므로 네트워크 슬롯을 반납하고 후처리 워커에 넘긴다
+        extension = '.mp3' if postprocess_kind == 'mp3' else f".{format_plan.get('ext') or 'mkv'}"
+        record_job_stage(timeline, 'postprocess_queued')
+        job_store.update(
+            video_id,
+            status='postprocessing',
+            message='Waiting for post-processing...',
+            progress=100,
+            speed=0,
+            timeline=timeline,
+            format_plan=format_plan or None
+        )
+        enqueue_postprocess_job({
+            'video_id': video_id,
+            'kind': postprocess_kind,
+            'inputs': downloaded_paths,
+            'output': os.path.splitext(output_path)[0] + extension,
+        })
         
     except Exception as e:
-        video_title = download_status[video_id].get('video_title', '')
-
-        if cancel_events[video_id].is_set():
-            download_status[video_id].update({
-                'status': 'cancelled',
-                'message': 'Cancelled',
-                'progress': 0,
-                'speed': 0
-            })
-            # 취소 시 부분 파일 삭제
-            cleanup_partial_files(video_title)
-        else:
-            download_status[video_id].update({
-                'status': 'error',
-                'message': str(e),
-                'progress': 0
-            })
-            # 실패 시 부분 파일 삭제
-            cleanup_partial_files(video_title)
+        if isinstance(e, JobLeaseLost) or not holds_job_lease():
+            print(f"Download {video_id} abandoned: lease was taken over by another worker", flush=True)
+            return
+        if job_store.is_cancel_requested(video_id):
+            mark_download_failed(video_id, e, timeline)
+            return
+        error_class = classify_download_error(e)
+        download_controller.record_error(error_class)
+        print(f"Download {video_id} failed ({error_class}, attempt {attempt + 1}): {e}", flush=True)
+        job = {'video_id': video_id, 'url': url, 'quality': quality, 'format_type': format_type, 'attempt': attempt}
+        if not schedule_download_retry(job, error_class, timeline):
+            mark_download_failed(video_id, e, timeline, error_class)
+
+
+def finish_download(video_id, work_path, timeline, format_plan=None):
+    """작업 디렉터리의 결과 파일을 다운로드 폴더로 옮기고 완료 처리한다."""
+    # 임대를 잃었으면 다른 워커가 같은 작업을 처리하고 있으므로 결과를 쓰지 않는다
+    ensure_job_lease()
+    filename = move_job_output_into_place(work_path)
+    cleanup_job_work_dir(video_id)
+
+    # 이력이 커밋될 때까지는 목록이 이 작업을 메모리에서 보여 준다 (history_pending)
+    job_store.update(
+        video_id,
+        status='completed',
+        message='Download completed',
+        filename=filename,
+        progress=100,
+        speed=0,
+        timeline=timeline,
+        format_plan=format_plan or None,
+        history_pending=True
+    )
 
+    # 다운로드 이력 저장
+    save_download_history(video_id, 'completed')
 
-def convert_media_to_stt_wav(source_path, wav_path):
-    """Riva ASR용 16kHz mono PCM WAV를 생성한다."""
-    command = [
+
+def mark_download_failed(video_id, error, timeline, error_class=None):
+    record_job_stage(timeline, 'failed')
+
+    if job_store.is_cancel_requested(video_id):
+        job_store.update(
+            video_id,
+            status='cancelled',
+            message='Cancelled',
+            progress=0,
+            speed=0,
+            timeline=timeline
+        )
+        # 취소 시 작업 디렉터리 삭제
+        cleanup_job_work_dir(video_id)
+    else:
+        job_store.update(
+            video_id,
+            status='error',
+            message=str(error),
+            progress=0,
+            timeline=timeline,
+            error_class=error_class
+        )
+        # 실패 시 작업 디렉터리 삭제
+        cleanup_job_work_dir(video_id)
+
+
+def get_postprocess_kind(format_type, downloaded_paths):
+    if format_type == 'audio_mp3':
+        return 'mp3'
+    if len(downloaded_paths) > 1:
+        return 'merge'
+    return None
+
+
+def build_postprocess_command(kind, inputs, output_path):
+    command = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error']
+    if kind == 'merge':
+        video_path, audio_path = inputs
+        return command + [
+            '-i', video_path, '-i', audio_path,
+            '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy',
+            output_path,
+        ]
+    if kind == 'mp3':
+        return command + ['-i', inputs[0], '-vn', '-c:a', 'libmp3lame', '-b:a', MP3_BITRATE, output_path]
+    raise ValueError(f'알 수 없는 후처리 종류입니다: {kind}')
+
+
+class DownloadJobControl:
+    """후처리 ffmpeg가 다운로드 취소 요청을 확인할 때 사용한다."""
+
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+    def check(self):
+        if job_store.is_cancel_requested(self.video_id):
+            raise Exception('Cancelled by user')
+
+
+def run_postprocess_job(job):
+    video_id = job['video_id']
+    data = job_store.get(video_id) or {}
+    timeline = data.get('timeline') or []
+    try:
+        DownloadJobControl(video_id).check()
+        record_job_stage(timeline, 'postprocess_start', keep_first=True)
+        job_store.update(video_id, message='Post-processing...', timeline=timeline)
+
+        command = build_postprocess_command(job['kind'], job['inputs'], job['output'])
+        try:
+            result = run_cancellable_process(command, DownloadJobControl(video_id), timeout=POSTPROCESS_TIMEOUT_SECONDS)
+        except FileNotFoundError as exc:
+            raise Exception('ffmpeg를 찾을 수 없습니다. ffmpeg 설치 또는 PATH 설정을 확인하세요.') from exc
+        except subprocess.TimeoutExpired as exc:
+            raise Exception('후처리 시간이 초과되었습니다.') from exc
+        if result.returncode != 0:
+            raise Exception(f"후처리 실패: {(result.stderr or result.stdout or '').strip()[:500]}")
+
+        for input_path in job['inputs']:
+            if input_path != job['output'] and os.path.exists(input_path):
+                os.remove(input_path)
+        record_job_stage(timeline, 'postprocess_end')
+        finish_download(video_id, job['output'], timeline, data.get('format_plan'))
+    except Exception as e:
+        if isinstance(e, JobLeaseLost) or not holds_job_lease():
+            print(f"Post-processing {video_id} abandoned: lease was taken over by another worker", flush=True)
+            return
+        mark_download_failed(video_id, e, timeline)
+
+
+def postprocess_worker():
+    while True:
+        job = postprocess_queue.get()
+        try:
+            run_postprocess_job(job)
+        finally:
+            postprocess_queue.task_done()
+
+
+# 인코딩별 (파일 확장자, ffmpeg 코덱 인자, Riva AudioEncoding 이름)
+STT_AUDIO_FORMATS = {
+    'linear_pcm': ('.wav', ['-c:a', 'pcm_s16le'], 'LINEAR_PCM'),
+    'flac': ('.flac', ['-c:a', 'flac', '-sample_fmt', 's16'], 'FLAC'),
+    'ogg_opus': ('.ogg', ['-c:a', 'libopus', '-b:a', STT_OPUS_BITRATE, '-application', 'voip'], 'OGGOPUS'),
+}
+
+
+def get_stt_audio_format(encoding=None):
+    encoding = encoding or STT_AUDIO_ENCODING
+    if encoding not in STT_AUDIO_FORMATS:
+        raise ValueError(f'지원하지 않는 STT_AUDIO_ENCODING입니다: {encoding} (linear_pcm, flac, ogg_opus)')
+    return STT_AUDIO_FORMATS[encoding]
+
+
+def build_stt_audio_command(source_path, output_path, encoding='linear_pcm'):
+    _, codec_args, _ = get_stt_audio_format(encoding)
+    return [
         'ffmpeg',
         '-y',
         '-hide_banner',
@@ -476,30 +2725,36 @@ def convert_media_to_stt_wav(source_path, wav_path):
         'error',
         '-i',
         source_path,
+        '-vn',
         '-ac',
         '1',
         '-ar',
         str(STT_WAV_SAMPLE_RATE),
-        '-c:a',
-        'pcm_s16le',
-        wav_path,
+        *codec_args,
+        output_path,
     ]
+
+
+def convert_media_to_stt_audio(source_path, output_path, encoding='linear_pcm', control=None):
+    """Riva ASR용 16kHz mono 오디오를 지정한 인코딩으로 생성한다."""
+    label = 'WAV' if encoding == 'linear_pcm' else encoding.upper()
+    command = build_stt_audio_command(source_path, output_path, encoding)
+    timeout = control.remaining() if control is not None else STT_TIMEOUT_SECONDS
     try:
-        result = subprocess.run(
-            command,
-            check=False,
-            capture_output=True,
-            text=True,
-            timeout=STT_TIMEOUT_SECONDS,
-        )
+        result = run_cancellable_process(command, control, timeout=timeout)
     except FileNotFoundError as exc:
         raise Exception('ffmpeg를 찾을 수 없습니다. ffmpeg 설치 또는 PATH 설정을 확인하세요.') from exc
     except subprocess.TimeoutExpired as exc:
-        raise Exception('STT용 WAV 변환 시간이 초과되었습니다.') from exc
+        raise Exception(f'STT용 {label} 변환 시간이 초과되었습니다.') from exc
 
     if result.returncode != 0:
         error_message = (result.stderr or result.stdout or '').strip()
-        raise Exception(f'STT용 WAV 변환 실패: {error_message[:500]}')
+        raise Exception(f'STT용 {label} 변환 실패: {error_message[:500]}')
+
+
+def convert_media_to_stt_wav(source_path, wav_path, control=None):
+    """Riva ASR용 16kHz mono PCM WAV를 생성한다."""
+    convert_media_to_stt_audio(source_path, wav_path, 'linear_pcm', control)
 
 
 def read_wav_frames(wav_path):
@@ -515,8 +2770,389 @@ def read_wav_frames(wav_path):
     return audio_bytes
 
 
-def request_subtitle_from_stt(source_path):
-    """Riva gRPC ASR에 미디어를 전송하고 word timestamp 기반 SRT 텍스트를 반환한다."""
+def get_frame_dbfs(frame_bytes):
+    samples = array('h', frame_bytes)
+    if not samples:
+        return -math.inf
+    mean_square = sum(map(operator.mul, samples, samples)) / len(samples)
+    if mean_square <= 0:
+        return -math.inf
+    return 10 * math.log10(mean_square / (32768 ** 2))
+
+
+def trim_silence_from_wav(input_path, output_path, frame_ms=None, threshold_dbfs=None,
+                          min_silence_ms=None, padding_ms=None):
+    """16-bit mono WAV에서 긴 무음 구간을 잘라낸 WAV를 만든다.
+
+    프레임 단위로 읽으며 최대 min_silence_ms 분량만 버퍼에 두므로 메모리 사용량은 파일 길이와 무관하다.
+    반환값은 (오프셋 맵, 지표). 오프셋 맵은 잘라낸 오디오의 시각(ms)과 원본 시각(ms)의 쌍 목록으로,
+    연속 구간이 시작될 때마다 하나씩 추가된다. 음성 구간이 하나도 없으면 오프셋 맵은 None이다.
+    """
+    frame_ms = frame_ms or STT_VAD_FRAME_MS
+    threshold_dbfs = STT_VAD_THRESHOLD_DBFS if threshold_dbfs is None else threshold_dbfs
+    min_silence_frames = max(1, (STT_VAD_MIN_SILENCE_MS if min_silence_ms is None else min_silence_ms) // frame_ms)
+    padding_frames = min(min_silence_frames, (STT_VAD_PADDING_MS if padding_ms is None else padding_ms) // frame_ms)
+
+    offset_map = []
+    written = {'frames': 0, 'last_index': None}
+
+    with wave.open(input_path, 'rb') as source, wave.open(output_path, 'wb') as target:
+        if source.getnchannels() != 1 or source.getsampwidth() != 2:
+            raise Exception('VAD는 16-bit mono WAV만 지원합니다.')
+        sample_rate = source.getframerate()
+        target.setnchannels(1)
+        target.setsampwidth(2)
+        target.setframerate(sample_rate)
+        samples_per_frame = max(1, sample_rate * frame_ms // 1000)
+
+        def write(frame_index, frame_bytes):
+            if written['last_index'] is None or frame_index != written['last_index'] + 1:
+                offset_map.append((written['frames'] * frame_ms, frame_index * frame_ms))
+            target.writeframes(frame_bytes)
+            written['frames'] += 1
+            written['last_index'] = frame_index
+
+        in_speech = False
+        pending = deque()  # 음성 뒤에 이어진 무음 (짧으면 그대로 유지)
+        lead_in = deque(maxlen=padding_frames or 1)  # 무음 상태에서 다음 음성 앞에 붙일 여유분
+        total_frames = 0
+
+        while True:
+            frame_bytes = source.readframes(samples_per_frame)
+            if not frame_bytes:
+                break
+            frame_index = total_frames
+            total_frames += 1
+            voiced = get_frame_dbfs(frame_bytes) >= threshold_dbfs
+
+            if in_speech:
+                if voiced:
+                    while pending:
+                        write(*pending.popleft())
+                    write(frame_index, frame_bytes)
+                    continue
+                pending.append((frame_index, frame_bytes))
+                if len(pending) >= min_silence_frames:
+                    for _ in range(padding_frames):
+                        write(*pending.popleft())
+                    lead_in.clear()
+                    lead_in.extend(pending)
+                    pending.clear()
+                    in_speech = False
+            elif voiced:
+                if padding_frames:
+                    for item in lead_in:
+                        write(*item)
+                lead_in.clear()
+                write(frame_index, frame_bytes)
+                in_speech = True
+            elif padding_frames:
+                lead_in.append((frame_index, frame_bytes))
+
+        if in_speech:
+            for _ in range(min(padding_frames, len(pending))):
+                write(*pending.popleft())
+
+    audio_seconds = total_frames * frame_ms / 1000
+    sent_seconds = written['frames'] * frame_ms / 1000
+    metrics = {
+        'audio_seconds': round(audio_seconds, 3),
+        'sent_seconds': round(sent_seconds, 3),
+        'skipped_seconds': round(audio_seconds - sent_seconds, 3),
+    }
+    return (offset_map or None), metrics
+
+
+def remap_trimmed_time(offset_map, milliseconds):
+    """잘라낸 오디오 기준 시각을 원본 미디어 시각으로 변환"""
+    if not offset_map:
+        return milliseconds
+    position = bisect.bisect_right(offset_map, (milliseconds, math.inf)) - 1
+    trimmed_start, original_start = offset_map[max(0, position)]
+    return original_start + max(0, milliseconds - trimmed_start)
+
+
+def remap_word_timestamps(words, offset_map):
+    if not offset_map:
+        return words
+    remapped = []
+    for item in words:
+        start_time = get_word_field(item, 'start_time', 0)
+        end_time = get_word_field(item, 'end_time', start_time)
+        remapped.append({
+            'word': get_word_field(item, 'word', ''),
+            'start_time': remap_trimmed_time(offset_map, int(start_time or 0)),
+            'end_time': remap_trimmed_time(offset_map, int(end_time or start_time or 0)),
+        })
+    return remapped
+
+
+class SubtitleJobCancelled(Exception):
+    pass
+
+
+class SubtitleJobControl:
+    """자막 작업의 취소 신호와 마감 시각. 모든 단계가 check()/remaining()으로 확인한다."""
+
+    def __init__(self, history_id, deadline=None, token=None):
+        self.history_id = history_id
+        self.job_id = get_subtitle_job_id(history_id)
+        self.deadline = deadline
+        self.token = token
+
+    def is_cancelled(self):
+        # 취소 후 같은 이력으로 다시 요청한 경우 이전 실행은 새 작업으로 대체된 것으로 본다
+        if job_store.is_cancel_requested(self.job_id):
+            return True
+        return (job_store.get(self.job_id) or {}).get('token') != self.token
+
+    def finish(self):
+        if (job_store.get(self.job_id) or {}).get('token') == self.token:
+            job_store.delete(self.job_id)
+
+    def check(self):
+        if self.is_cancelled():
+            raise SubtitleJobCancelled('자막 생성이 취소되었습니다.')
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise Exception('자막 작업 마감 시간이 지났습니다.')
+
+    def remaining(self, limit=None):
+        """남은 시간(초). 마감이 지났거나 취소되었으면 예외"""
+        self.check()
+        remaining = limit if limit is not None else STT_TIMEOUT_SECONDS
+        if self.deadline is not None:
+            remaining = min(remaining, self.deadline - time.time())
+        return max(0.0, remaining)
+
+
+def get_subtitle_job_id(history_id):
+    return f'subtitle-{history_id}'
+
+
+def run_cancellable_process(command, control=None, timeout=None, poll_seconds=0.5):
+    """subprocess.run과 같지만 취소/마감 시 프로세스를 바로 종료한다."""
+    timeout = STT_TIMEOUT_SECONDS if timeout is None else timeout
+    started_at = time.time()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=poll_seconds)
+                return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                if control is not None:
+                    control.check()
+                if time.time() - started_at >= timeout:
+                    raise subprocess.TimeoutExpired(command, timeout)
+    except BaseException:
+        process.kill()
+        process.communicate()
+        raise
+
+
+def wait_for_stt_future(response_future, control=None, timeout=None, poll_seconds=0.5):
+    """gRPC future를 기다리며 취소/마감이면 future.cancel()로 서버 요청도 중단한다."""
+    timeout = STT_TIMEOUT_SECONDS if timeout is None else timeout
+    started_at = time.time()
+    try:
+        while not response_future.done():
+            if control is not None:
+                control.check()
+            if time.time() - started_at >= timeout:
+                raise Exception('Deadline Exceeded: STT 응답 대기 시간이 초과되었습니다.')
+            time.sleep(poll_seconds)
+    except BaseException:
+        response_future.cancel()
+        raise
+    return response_future.result()
+
+
+def probe_media_duration(source_path):
+    """ffprobe로 미디어 길이(초)를 조회한다. 알 수 없으면 None"""
+    command = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', source_path,
+    ]
+    try:
+        result = subprocess.run(command, check=False, capture_output=True, text=True, timeout=60)
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+
+
+def estimate_stt_memory_bytes(duration_seconds):
+    """PCM 오디오 크기에 요청 사본 등을 감안한 배수를 곱해 자막 작업의 최대 메모리를 추정한다."""
+    pcm_bytes = duration_seconds * STT_WAV_SAMPLE_RATE * 2
+    return int(pcm_bytes * STT_MEMORY_OVERHEAD_FACTOR) + STT_MEMORY_BASE_BYTES
+
+
+def plan_stt_memory(duration_seconds, budget_bytes=None, chunk_seconds=None):
+    """(청크 길이 또는 None, 예약할 바이트). 전체를 한 번에 처리하면 예산을 넘는 작업은 청크 모드로 보낸다."""
+    budget_bytes = STT_MEMORY_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    chunk_seconds = chunk_seconds or STT_CHUNK_SECONDS
+    if budget_bytes <= 0:
+        return None, 0
+    if duration_seconds:
+        estimate = estimate_stt_memory_bytes(duration_seconds)
+        if estimate <= budget_bytes:
+            return None, estimate
+    # 길이를 모르거나 예산보다 크면 청크 단위로 처리한다
+    return chunk_seconds, min(budget_bytes, estimate_stt_memory_bytes(chunk_seconds))
+
+
+class MemoryBudget:
+    """프로세스 단위 메모리 예약. 예산이 남을 때까지 작업 시작을 미룬다."""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._reservations = {}
+        self._waiting = 0
+        self._condition = threading.Condition()
+
+    def reserved_bytes(self):
+        return sum(item['bytes'] for item in self._reservations.values())
+
+    def reserve(self, job_id, amount, mode='whole', control=None):
+        """예산이 남을 때까지 기다린 뒤 예약한다. 다른 예약이 없으면 예산보다 커도 바로 예약한다."""
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._reservations and self.reserved_bytes() + amount > self.budget_bytes:
+                    if control is not None:
+                        control.check()
+                    self._condition.wait(timeout=1)
+                self._reservations[job_id] = {'bytes': amount, 'mode': mode, 'since': time.time()}
+            finally:
+                self._waiting -= 1
+
+    def release(self, job_id):
+        with self._condition:
+            self._reservations.pop(job_id, None)
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            reserved = self.reserved_bytes()
+            return {
+                'budget_bytes': self.budget_bytes,
+                'reserved_bytes': reserved,
+                'available_bytes': max(0, self.budget_bytes - reserved),
+                'waiting_jobs': self._waiting,
+                'jobs': [
+                    {'job_id': job_id, 'bytes': item['bytes'], 'mode': item['mode']}
+                    for job_id, item in self._reservations.items()
+                ],
+            }
+
+
+stt_memory_budget = MemoryBudget(STT_MEMORY_BUDGET_BYTES)
+
+
+def find_silence_cut(frame_bytes, sample_rate, window_samples, frame_ms=None, threshold_dbfs=None):
+    """16-bit mono PCM 끝쪽 window_samples 안에서 가장 긴 무음 구간의 가운데를 바이트 위치로 돌려준다.
+
+    무음 판정은 VAD와 같은 프레임 길이와 임계값을 쓴다. 무음이 없으면 None.
+    """
+    frame_ms = frame_ms or STT_VAD_FRAME_MS
+    threshold_dbfs = STT_VAD_THRESHOLD_DBFS if threshold_dbfs is None else threshold_dbfs
+    samples_per_frame = max(1, sample_rate * frame_ms // 1000)
+    total_samples = len(frame_bytes) // 2
+    best = None
+    run_start = None
+    for offset in range(max(0, total_samples - window_samples), total_samples - samples_per_frame + 1, samples_per_frame):
+        if get_frame_dbfs(frame_bytes[offset * 2:(offset + samples_per_frame) * 2]) >= threshold_dbfs:
+            run_start = None
+            continue
+        if run_start is None:
+            run_start = offset
+        run_end = offset + samples_per_frame
+        # 길이가 같으면 원래 경계에 가까운 뒤쪽 무음을 쓴다
+        if best is None or run_end - run_start >= best[1] - best[0]:
+            best = (run_start, run_end)
+    if best is None:
+        return None
+    return (best[0] + best[1]) // 2 * 2
+
+
+def iter_wav_chunks(wav_path, chunk_seconds, temp_dir, snap_seconds=None):
+    """WAV를 chunk_seconds 단위 파일로 잘라 (시작 ms, 경로)를 차례로 돌려준다. 한 번에 한 청크만 메모리에 올린다.
+
+    snap_seconds > 0이면 각 경계를 청크 끝 snap_seconds 안의 무음으로 옮겨 단어가 두 청크로 나뉘지 않게 한다.
+    무음 뒤쪽은 다음 청크 앞에 붙는다.
+    """
+    snap_seconds = STT_CHUNK_SNAP_SECONDS if snap_seconds is None else snap_seconds
+    with wave.open(wav_path, 'rb') as source:
+        sample_rate = source.getframerate()
+        frame_width = source.getsampwidth() * source.getnchannels()
+        frames_per_chunk = max(1, int(chunk_seconds * sample_rate))
+        # 무음 판정(get_frame_dbfs)은 16-bit mono만 지원한다
+        snap_samples = 0
+        if snap_seconds > 0 and source.getsampwidth() == 2 and source.getnchannels() == 1:
+            snap_samples = int(min(snap_seconds, chunk_seconds / 2) * sample_rate)
+        carry = b''
+        start_frame = 0
+        chunk_index = 0
+        while True:
+            frame_bytes = carry + source.readframes(frames_per_chunk - len(carry) // frame_width)
+            if not frame_bytes:
+                break
+            carry = b''
+            if snap_samples and len(frame_bytes) // frame_width >= frames_per_chunk:
+                cut = find_silence_cut(frame_bytes, sample_rate, snap_samples)
+                if cut:
+                    frame_bytes, carry = frame_bytes[:cut], frame_bytes[cut:]
+            chunk_path = os.path.join(temp_dir, f'chunk_{chunk_index}.wav')
+            with wave.open(chunk_path, 'wb') as target:
+                target.setnchannels(source.getnchannels())
+                target.setsampwidth(source.getsampwidth())
+                target.setframerate(sample_rate)
+                target.writeframes(frame_bytes)
+            chunk_frames = len(frame_bytes) // frame_width
+            del frame_bytes
+            yield start_frame * 1000 // sample_rate, chunk_path
+            start_frame += chunk_frames
+            chunk_index += 1
+
+
+def shift_word_timestamps(words, offset_ms):
+    if not offset_ms:
+        return list(words)
+    shifted = []
+    for item in words:
+        start_time = int(get_word_field(item, 'start_time', 0) or 0)
+        end_time = int(get_word_field(item, 'end_time', start_time) or start_time)
+        shifted.append({
+            'word': get_word_field(item, 'word', ''),
+            'start_time': start_time + offset_ms,
+            'end_time': end_time + offset_ms,
+        })
+    return shifted
+
+
+def read_stt_payload(audio_path, temp_dir, extension, control=None):
+    """전송할 오디오 바이트. linear_pcm은 WAV 프레임, 그 외에는 ffmpeg로 인코딩한 파일 내용"""
+    if STT_AUDIO_ENCODING == 'linear_pcm':
+        return read_wav_frames(audio_path)
+    encoded_path = os.path.join(temp_dir, f'{os.path.splitext(os.path.basename(audio_path))[0]}{extension}')
+    convert_media_to_stt_audio(audio_path, encoded_path, STT_AUDIO_ENCODING, control)
+    try:
+        with open(encoded_path, 'rb') as encoded_file:
+            return encoded_file.read()
+    finally:
+        os.remove(encoded_path)
+
+
+def request_subtitle_from_stt(source_path, timeline=None, metrics=None, chunk_seconds=None, control=None,
+                              on_progress=None):
+    """Riva gRPC ASR에 미디어를 전송하고 word timestamp 기반 SRT 텍스트를 반환한다.
+
+    chunk_seconds를 주면 오디오를 그 길이로 나눠 순서대로 전송해 최대 메모리를 청크 크기로 제한한다.
+    control(SubtitleJobControl)을 주면 각 단계가 취소와 마감 시각을 확인한다.
+    on_progress(words, percent)는 청크마다 원본 시각으로 복원한 단어와 처리한 오디오 비율로 호출된다.
+    """
+    timeline = [] if timeline is None else timeline
+    metrics = {} if metrics is None else metrics
+    extension, _, riva_encoding_name = get_stt_audio_format()
     try:
         import riva.client as riva
     except ImportError as exc:
@@ -528,30 +3164,93 @@ def request_subtitle_from_stt(source_path):
 
     os.makedirs('tmp', exist_ok=True)
     with tempfile.TemporaryDirectory(prefix='subtitle_', dir='tmp') as temp_dir:
+        started_at = time.time()
         wav_path = os.path.join(temp_dir, 'input.wav')
-        convert_media_to_stt_wav(source_path, wav_path)
-        audio_bytes = read_wav_frames(wav_path)
+        record_job_stage(timeline, 'convert_start')
+        # VAD와 청크 분할은 PCM이 필요하다. 둘 다 쓰지 않으면 ffmpeg가 원본에서 전송 인코딩을 바로 만든다.
+        audio_source = source_path
+        if STT_VAD_ENABLED or chunk_seconds or STT_AUDIO_ENCODING == 'linear_pcm':
+            convert_media_to_stt_wav(source_path, wav_path, control)
+            audio_source = wav_path
+
+        offset_map = None
+        if STT_VAD_ENABLED:
+            if control is not None:
+                control.check()
+            record_job_stage(timeline, 'vad_start')
+            trimmed_path = os.path.join(temp_dir, 'trimmed.wav')
+            offset_map, vad_metrics = trim_silence_from_wav(wav_path, trimmed_path)
+            record_job_stage(timeline, 'vad_end')
+            if offset_map:
+                audio_source = trimmed_path
+                metrics.update(vad_metrics)
+                print(f"[stt] vad skipped {vad_metrics['skipped_seconds']}s of {vad_metrics['audio_seconds']}s", flush=True)
+        record_job_stage(timeline, 'convert_end')
 
         auth = riva.Auth(uri=STT_GRPC_SERVER, use_ssl=False)
         service = riva.ASRService(auth)
         config = riva.RecognitionConfig(
-            encoding=riva.AudioEncoding.LINEAR_PCM,
+            encoding=getattr(riva.AudioEncoding, riva_encoding_name),
             sample_rate_hertz=STT_WAV_SAMPLE_RATE,
             language_code=STT_LANGUAGE_CODE,
             max_alternatives=1,
             enable_word_time_offsets=True,
             enable_automatic_punctuation=STT_ENABLE_AUTOMATIC_PUNCTUATION,
         )
-        try:
-            response_future = service.offline_recognize(audio_bytes, config, future=True)
-            response = response_future.result(timeout=STT_TIMEOUT_SECONDS)
-        except Exception as exc:
-            raise Exception(format_stt_exception(exc)) from exc
 
-    if not response.results:
-        raise Exception('STT 결과가 비어 있습니다.')
+        if chunk_seconds:
+            chunks = iter_wav_chunks(audio_source, chunk_seconds, temp_dir)
+            with wave.open(audio_source, 'rb') as audio_wav:
+                audio_ms = audio_wav.getnframes() * 1000 // max(1, audio_wav.getframerate())
+        else:
+            chunks = iter([(0, audio_source)])
+            audio_ms = 0
+
+        metrics['audio_encoding'] = STT_AUDIO_ENCODING
+        metrics['bytes_sent'] = 0
+        metrics['chunks'] = 0
+        words = []
+        asr_seconds = 0.0
+        record_job_stage(timeline, 'asr_start')
+        for chunk_start_ms, chunk_path in chunks:
+            # 무음에 맞춰 자르므로 청크 길이가 조금씩 다르다. 진행률은 실제로 보낸 청크 끝 기준이다.
+            chunk_end_ms = audio_ms
+            if chunk_path != audio_source:
+                with wave.open(chunk_path, 'rb') as chunk_wav:
+                    chunk_end_ms = chunk_start_ms + chunk_wav.getnframes() * 1000 // max(1, chunk_wav.getframerate())
+            audio_bytes = read_stt_payload(chunk_path, temp_dir, extension, control)
+            if chunk_path != audio_source:
+                os.remove(chunk_path)
+            metrics['bytes_sent'] += len(audio_bytes)
+            metrics['chunks'] += 1
+            try:
+                timeout = control.remaining() if control is not None else STT_TIMEOUT_SECONDS
+                asr_started_at = time.time()
+                response_future = service.offline_recognize(audio_bytes, config, future=True)
+                response = wait_for_stt_future(response_future, control, timeout=timeout)
+                asr_seconds += time.time() - asr_started_at
+            except SubtitleJobCancelled:
+                raise
+            except Exception as exc:
+                raise Exception(format_stt_exception(exc)) from exc
+            del audio_bytes
+            chunk_words = remap_word_timestamps(
+                shift_word_timestamps(collect_word_timestamps_from_results(response.results), chunk_start_ms),
+                offset_map,
+            )
+            words.extend(chunk_words)
+            if on_progress is not None:
+                on_progress(chunk_words, min(100, chunk_end_ms * 100 // audio_ms) if audio_ms else 100)
+        record_job_stage(timeline, 'asr_end')
+
+        metrics['asr_seconds'] = round(asr_seconds, 3)
+        metrics['total_seconds'] = round(time.time() - started_at, 3)
+        print(
+            f"[stt] sent {metrics['bytes_sent']} bytes ({STT_AUDIO_ENCODING}, chunks={metrics['chunks']}) "
+            f"asr={metrics['asr_seconds']}s total={metrics['total_seconds']}s",
+            flush=True,
+        )
 
-    words = collect_word_timestamps_from_results(response.results)
     if not words:
         raise Exception('STT 결과에 word timestamp가 없습니다.')
 
@@ -562,77 +3261,539 @@ def request_subtitle_from_stt(source_path):
     return subtitle_text
 
 
-def mark_subtitle_error(history_id, message):
-    with app.app_context():
-        history = db.session.get(DownloadHistory, history_id)
-        if not history:
-            return
-        history.subtitle_status = 'error'
-        history.subtitle_error = message[:1000]
-        db.session.commit()
-
+def mark_subtitle_error(history_id, message, timeline=None):
+    fields = {'subtitle_status': 'error', 'subtitle_error': message[:1000]}
+    if timeline is not None:
+        record_job_stage(timeline, 'failed')
+        fields['subtitle_timeline'] = encode_stage_timeline(timeline)
+    queue_history_write('update', fields, history_id=history_id)
 
-def generate_subtitle_for_history(history_id):
-    try:
-        with app.app_context():
-            history = db.session.get(DownloadHistory, history_id)
-            if not history:
-                return
 
-            if not history.filename:
-                raise Exception('다운로드 파일 정보가 없습니다.')
+def get_subtitle_status_after_cancel(subtitle_filename):
+    """취소하면 이전에 만든 자막이 남아 있을 때 completed, 없으면 none으로 되돌린다"""
+    filepath = get_safe_folder_path(SUBTITLE_FOLDER, subtitle_filename)
+    return 'completed' if filepath and os.path.exists(filepath) else 'none'
 
-            source_path = os.path.join(DOWNLOAD_FOLDER, history.filename)
-            if not os.path.exists(source_path):
-                raise Exception('원본 다운로드 파일을 찾을 수 없습니다.')
 
-            subtitle_filename = build_subtitle_filename(history.id, history.filename)
-            subtitle_path = os.path.join(SUBTITLE_FOLDER, subtitle_filename)
-            previous_subtitle_filename = history.subtitle_filename
+def generate_subtitle_for_history(history_id, token=None):
+    timeline = []
+    partial_path = None
+    job_data = job_store.get(get_subtitle_job_id(history_id)) or {}
+    if token is not None and job_data.get('token') != token:
+        # 취소 후 다시 요청되어 대체된 큐 항목은 아무것도 쓰지 않고 건너뛴다
+        return
+    # 일괄 작업은 대기 시간이 길어서 마감 시각을 시작할 때부터 잰다
+    deadline = job_data.get('deadline') or time.time() + STT_JOB_DEADLINE_SECONDS
+    control = SubtitleJobControl(history_id, deadline, job_data.get('token'))
+    try:
+        history = get_history_snapshot(history_id)
+        if not history:
+            return
 
-            history.subtitle_status = 'processing'
-            history.subtitle_error = None
-            db.session.commit()
+        timeline = load_stage_timeline(history['subtitle_timeline'])
+        control.check()
+        record_job_stage(timeline, 'started')
+
+        if not history['filename']:
+            raise Exception('다운로드 파일 정보가 없습니다.')
+
+        source_path = os.path.join(DOWNLOAD_FOLDER, history['filename'])
+        if not os.path.exists(source_path):
+            raise Exception('원본 다운로드 파일을 찾을 수 없습니다.')
+
+        subtitle_filename = build_subtitle_filename(history['id'], history['filename'])
+        subtitle_path = os.path.join(SUBTITLE_FOLDER, subtitle_filename)
+        partial_path = os.path.join(SUBTITLE_FOLDER, get_partial_subtitle_filename(history['id'], history['filename']))
+        previous_subtitle_filename = history['subtitle_filename']
+        duration = history['duration']
+
+        # 메모리 예산 안에 들어올 때까지 시작을 미루고, 예산보다 큰 작업은 청크 모드로 처리한다
+        if STT_MEMORY_BUDGET_BYTES > 0 and not duration:
+            duration = probe_media_duration(source_path)
+        chunk_seconds, reserve_bytes = plan_stt_memory(duration)
+        if STT_PROGRESSIVE_CHUNK_SECONDS > 0:
+            # 부분 결과를 빨리 보여 주기 위해 짧은 청크로 나눈다. 한 번에 올리는 오디오도 그만큼 줄어든다.
+            chunk_seconds = min(chunk_seconds or STT_PROGRESSIVE_CHUNK_SECONDS, STT_PROGRESSIVE_CHUNK_SECONDS)
+            if reserve_bytes:
+                reserve_bytes = min(reserve_bytes, estimate_stt_memory_bytes(chunk_seconds))
+        subtitle_metrics = {'mode': 'chunked' if chunk_seconds else 'whole', 'memory_reserved_bytes': reserve_bytes}
+        if reserve_bytes:
+            record_job_stage(timeline, 'admission_wait')
+            stt_memory_budget.reserve(history_id, reserve_bytes, subtitle_metrics['mode'], control)
+            record_job_stage(timeline, 'admitted')
 
-        subtitle_text = request_subtitle_from_stt(source_path)
+        try:
+            queue_history_write('update', {
+                'subtitle_status': 'processing',
+                'subtitle_error': None,
+                'subtitle_progress': 0,
+                'subtitle_timeline': encode_stage_timeline(timeline),
+            }, history_id=history_id)
+
+            os.makedirs(SUBTITLE_FOLDER, exist_ok=True)
+            partial_writer = ProgressiveSubtitleWriter(partial_path)
+            started_at = time.time()
+
+            def on_progress(words, percent):
+                control.check()
+                if partial_writer.add_words(words) and 'first_cue_seconds' not in subtitle_metrics:
+                    subtitle_metrics['first_cue_seconds'] = round(time.time() - started_at, 3)
+                    record_job_stage(timeline, 'first_cue')
+                queue_history_write('update', {'subtitle_progress': percent}, history_id=history_id)
+
+            subtitle_text = request_subtitle_from_stt(
+                source_path, timeline, subtitle_metrics, chunk_seconds, control, on_progress
+            )
+        finally:
+            if reserve_bytes:
+                stt_memory_budget.release(history_id)
+        control.check()
+        ensure_job_lease()
 
-        os.makedirs(SUBTITLE_FOLDER, exist_ok=True)
-        with open(subtitle_path, 'w', encoding='utf-8') as subtitle_file:
-            subtitle_file.write(subtitle_text)
+        # 부분 자막에 남은 큐까지 쓰면 전체 자막과 같아지므로 그대로 바꿔 끼운다
+        partial_writer.finish()
+        os.replace(partial_path, subtitle_path)
+        partial_path = None
 
         if previous_subtitle_filename and previous_subtitle_filename != subtitle_filename:
             delete_file_in_folder(SUBTITLE_FOLDER, previous_subtitle_filename)
 
-        with app.app_context():
-            history = db.session.get(DownloadHistory, history_id)
-            if not history:
-                return
-            history.subtitle_status = 'completed'
-            history.subtitle_filename = subtitle_filename
-            history.subtitle_error = None
-            history.subtitle_created_at = datetime.utcnow()
-            db.session.commit()
+        queue_history_write('update', {
+            'subtitle_status': 'completed',
+            'subtitle_filename': subtitle_filename,
+            'subtitle_error': None,
+            'subtitle_progress': 100,
+            'subtitle_created_at': datetime.utcnow(),
+            'subtitle_metrics': json.dumps(subtitle_metrics),
+        }, history_id=history_id, timeline=timeline, timeline_field='subtitle_timeline',
+            subtitle_cues=parse_srt_cues(subtitle_text))
+    except JobLeaseLost:
+        # 다른 워커가 같은 작업을 이어받았으므로 이력, 부분 자막, 작업 상태를 건드리지 않는다
+        partial_path = None
+        control = None
+        print(f"[stt] subtitle job {history_id} abandoned: lease was taken over by another worker", flush=True)
+    except SubtitleJobCancelled:
+        record_job_stage(timeline, 'cancelled')
+        history = get_history_snapshot(history_id)
+        subtitle_status = get_subtitle_status_after_cancel(history['subtitle_filename']) if history else 'none'
+        queue_history_write('update', {
+            'subtitle_status': subtitle_status,
+            'subtitle_error': None,
+            'subtitle_timeline': encode_stage_timeline(timeline),
+        }, history_id=history_id)
+        print(f"[stt] subtitle job {history_id} cancelled", flush=True)
     except Exception as e:
-        mark_subtitle_error(history_id, format_stt_exception(e))
+        mark_subtitle_error(history_id, format_stt_exception(e), timeline)
+    finally:
+        if partial_path:
+            # 취소/실패한 작업의 부분 자막은 남기지 않는다 (완료 시에는 이미 지웠다)
+            delete_file_in_folder(SUBTITLE_FOLDER, os.path.basename(partial_path))
+        if control is not None:
+            control.finish()
 
 
 def subtitle_worker():
     while True:
-        history_id = subtitle_queue.get()
-        if history_id is None:
-            break
+        _, _, history_id, token = subtitle_queue.get()
         try:
-            generate_subtitle_for_history(history_id)
+            generate_subtitle_for_history(history_id, token)
         finally:
             subtitle_queue.task_done()
 
 
-for _ in range(MAX_CONCURRENT_DOWNLOADS):
-    worker = threading.Thread(target=download_worker, daemon=True)
-    worker.start()
+def get_subtitle_schedule_key(priority, duration, enqueued_at, aging_rate=None):
+    """작을수록 먼저 처리할 정렬 키.
+
+    우선순위 단계 안에서 점수 = 미디어 길이 - aging_rate * 대기 시간 인데, 현재 시각 항은 모든 작업에 같으므로
+    길이 + aging_rate * 넣은 시각 으로 고정된다. 그래서 일반 우선순위 큐로 SJF + 에이징을 할 수 있다.
+    """
+    aging_rate = STT_SCHEDULE_AGING_RATE if aging_rate is None else aging_rate
+    priority_value = SUBTITLE_PRIORITIES.get(priority, SUBTITLE_PRIORITIES['bulk'])
+    duration = duration or STT_UNKNOWN_DURATION_SECONDS
+    return priority_value * SUBTITLE_PRIORITY_SPAN + duration + aging_rate * enqueued_at
+
+
+def enqueue_subtitle_job(history_id, priority='interactive', duration=None):
+    """자막 작업을 우선순위 큐에 넣는다. 취소 신호와 마감 시각은 작업 상태 저장소에 둔다."""
+    now = time.time()
+    schedule_key = get_subtitle_schedule_key(priority, duration, now)
+    token = os.urandom(8).hex()
+    job_store.create(get_subtitle_job_id(history_id), {
+        'history_id': history_id,
+        'priority': priority,
+        'duration': duration,
+        'enqueued_at': now,
+        # 일괄 작업은 시작할 때 마감 시각을 정한다
+        'deadline': now + STT_JOB_DEADLINE_SECONDS if priority == 'interactive' else None,
+        'token': token,
+    }, kind='subtitle')
+    if job_queue is not None:
+        job_queue.enqueue('subtitle', {'history_id': history_id, 'token': token}, priority=schedule_key)
+    else:
+        subtitle_queue.put((schedule_key, next(subtitle_queue_sequence), history_id, token))
+
+
+def get_stt_realtime_factor(limit=50):
+    """최근 완료된 자막 작업의 (처리 시간 / 미디어 길이) 중앙값. 기록이 없으면 기본값"""
+    rows = (
+        DownloadHistory.query
+        .filter(DownloadHistory.subtitle_status == 'completed', DownloadHistory.duration > 0,
+                DownloadHistory.subtitle_metrics.isnot(None))
+        .order_by(DownloadHistory.subtitle_created_at.desc())
+        .with_entities(DownloadHistory.duration, DownloadHistory.subtitle_metrics)
+        .limit(limit)
+        .all()
+    )
+    factors = []
+    for duration, metrics in rows:
+        try:
+            total_seconds = json.loads(metrics).get('total_seconds')
+        except (TypeError, ValueError):
+            continue
+        if total_seconds:
+            factors.append(total_seconds / duration)
+    if not factors:
+        return STT_DEFAULT_REALTIME_FACTOR
+    factors.sort()
+    return factors[len(factors) // 2]
+
+
+def get_subtitle_backlog():
+    """대기/진행 중인 자막 작업의 남은 미디어 길이와 예상 완료 시간"""
+    rows = (
+        DownloadHistory.query
+        .filter(DownloadHistory.subtitle_status.in_(['queued', 'processing']))
+        .with_entities(DownloadHistory.subtitle_status, DownloadHistory.duration, DownloadHistory.subtitle_progress)
+        .all()
+    )
+    counts = {'queued': 0, 'processing': 0}
+    remaining_seconds = 0.0
+    for status, duration, progress in rows:
+        counts[status] += 1
+        duration = duration or STT_UNKNOWN_DURATION_SECONDS
+        if status == 'processing':
+            duration *= 1 - (progress or 0) / 100
+        remaining_seconds += duration
+
+    if job_queue is not None:
+        slots = sum(node['stt_slots'] for node in job_queue.live_nodes())
+    else:
+        slots = WORKER_STT_SLOTS
+    realtime_factor = get_stt_realtime_factor()
+    return {
+        **counts,
+        'remaining_media_seconds': round(remaining_seconds, 1),
+        'realtime_factor': round(realtime_factor, 4),
+        'stt_slots': slots,
+        'eta_seconds': round(remaining_seconds * realtime_factor / slots, 1) if slots else None,
+    }
+
+
+def cancel_subtitle_job(history_id):
+    """대기 중이면 건너뛰고, 실행 중이면 ffmpeg와 STT 요청을 중단시킨다"""
+    return job_store.request_cancel(get_subtitle_job_id(history_id))
+
+
+class JobLeaseLost(Exception):
+    """임대가 만료되어 다른 워커가 작업을 다시 가져갔다. 이 워커는 결과를 쓰지 않고 멈춘다."""
+
+
+# 현재 스레드가 처리 중인 임대 (queue_id, lease_owner). 내장 워커에서는 None
+job_lease = threading.local()
+lease_sequence = itertools.count(1)
+
+
+def holds_job_lease():
+    lease = getattr(job_lease, 'current', None)
+    if lease is None or job_queue is None:
+        return True
+    return job_queue.holds_lease(*lease)
+
+
+def ensure_job_lease():
+    if not holds_job_lease():
+        raise JobLeaseLost('작업 임대가 다른 워커로 넘어갔습니다.')
+
+
+def fail_exhausted_job(kind, payload):
+    """재시도 한도를 넘긴 임대 작업을 error로 표시한다."""
+    message = f'작업이 최대 재시도 횟수({JOB_MAX_ATTEMPTS}회)를 넘어 중단되었습니다.'
+    if kind in ('download', 'postprocess'):
+        job_store.update(payload['video_id'], status='error', message=message, progress=0, speed=0)
+    elif kind == 'subtitle':
+        job_id = get_subtitle_job_id(payload['history_id'])
+        if (job_store.get(job_id) or {}).get('token') == payload.get('token'):
+            mark_subtitle_error(payload['history_id'], message)
+            job_store.delete(job_id)
+
+
+def run_download_job(job):
+    if job_store.is_cancel_requested(job['video_id']):
+        # 대기 중(재시도 대기 포함)에 취소된 작업
+        timeline = (job_store.get(job['video_id']) or {}).get('timeline') or []
+        mark_download_failed(job['video_id'], 'Cancelled by user', timeline)
+        return
+    download_video(
+        job['video_id'], job['url'], job.get('quality', 'best'), job.get('format_type', 'video'), job.get('attempt', 0)
+    )
+
+
+def run_subtitle_job(job):
+    generate_subtitle_for_history(job['history_id'], job.get('token'))
+
+
+def leased_job_loop(kind, handler, node):
+    """공유 큐에서 작업을 임대받아 처리한다. 처리 중인 작업은 heartbeat 스레드가 임대를 연장한다."""
+    controller = download_controller if kind == 'download' else None
+    while not node['stopping'].is_set():
+        # 노드별 적응형 제한: 슬롯이 없으면 임대하지 않아 다른 노드가 가져갈 수 있게 한다
+        if controller is not None:
+            controller.acquire()
+        # 임대마다 고유한 owner를 써서, 같은 노드가 만료된 작업을 다시 가져가도 이전 실행과 구분한다
+        lease_owner = f"{node['node_id']}/{next(lease_sequence)}"
+        claimed = job_queue.claim(kind, lease_owner)
+        if claimed is None:
+            if controller is not None:
+                controller.release()
+            node['stopping'].wait(WORKER_POLL_SECONDS)
+            continue
+
+        queue_id, job = claimed
+        with node['lock']:
+            node['active'][queue_id] = (kind, lease_owner)
+        job_lease.current = (queue_id, lease_owner)
+        try:
+            handler(job)
+        except Exception as e:
+            print(f"[worker] {kind} job {queue_id} failed: {e}", flush=True)
+        finally:
+            job_lease.current = None
+            if controller is not None:
+                controller.release()
+            if not job_queue.complete(queue_id, lease_owner):
+                print(f"[worker] {kind} job {queue_id} lease was taken over by another worker", flush=True)
+            with node['lock']:
+                node['active'].pop(queue_id, None)
+
+
+def worker_heartbeat_loop(node):
+    while not node['stopping'].is_set():
+        with node['lock']:
+            active = dict(node['active'])
+        for queue_id, (_, lease_owner) in active.items():
+            job_queue.heartbeat([queue_id], lease_owner)
+        job_queue.advertise_node(
+            node['node_id'],
+            download_controller.limit,
+            WORKER_STT_SLOTS,
+            active_downloads=sum(1 for kind, _ in active.values() if kind == 'download'),
+            active_stt=sum(1 for kind, _ in active.values() if kind == 'subtitle'),
+            **node['identity'],
+        )
+        node['stopping'].wait(WORKER_HEARTBEAT_SECONDS)
+
+
+def run_worker_node():
+    """독립 워커 프로세스 진입점 (worker.py). 다운로드/STT 슬롯 수만큼 임대 루프를 실행한다.
+
+    WORKER_API_URL이 있으면 다른 호스트에서 웹 프로세스의 워커 API로, 없으면 같은 호스트에서 공유 SQLite 파일로 큐를 쓴다.
+    """
+    if worker_api is None and (job_queue is None or not isinstance(job_store, SqliteJobStore)):
+        raise SystemExit(
+            '독립 워커는 WORKER_MODE=external, JOB_STATE_BACKEND=sqlite 설정(같은 호스트) '
+            '또는 WORKER_API_URL, WORKER_API_TOKEN 설정(다른 호스트)이 필요합니다.'
+        )
+
+    create_app(start_workers=False)
+    transport = 'api' if worker_api is not None else 'sqlite'
+    if transport == 'sqlite':
+        # 공유 큐는 로컬 SQLite 파일(WAL)이라 네트워크 파일 시스템을 거쳐 직접 열 수 없다. 다른 호스트는 워커 API를 쓴다.
+        other_hosts = {
+            item['hostname'] for item in job_queue.live_nodes() if item['transport'] == 'sqlite'
+        } - {socket.gethostname()}
+        if other_hosts:
+            raise SystemExit(
+                f"다른 호스트의 워커가 같은 SQLite 큐 파일을 직접 쓰고 있습니다: {', '.join(sorted(other_hosts))}. "
+                '다른 호스트의 워커는 WORKER_API_URL로 웹 서버의 워커 API에 연결하세요.'
+            )
+    node = {
+        'node_id': f'{socket.gethostname()}-{os.getpid()}',
+        'identity': {'hostname': socket.gethostname(), 'pid': os.getpid(), 'transport': transport},
+        'active': {},
+        'lock': threading.Lock(),
+        'stopping': threading.Event(),
+    }
+    job_queue.advertise_node(node['node_id'], MAX_CONCURRENT_DOWNLOADS, WORKER_STT_SLOTS, **node['identity'])
+    # manage.sh stop-worker (SIGTERM) 시 노드 등록을 정리하고 종료. 처리 중이던 작업은 임대 만료 후 다른 워커가 가져간다.
+    signal.signal(signal.SIGTERM, lambda signum, frame: node['stopping'].set())
+
+    targets = [(worker_heartbeat_loop, (node,)), (history_writer, ())]
+    targets += [(leased_job_loop, ('download', run_download_job, node))] * MAX_CONCURRENT_DOWNLOADS
+    targets += [(leased_job_loop, ('subtitle', run_subtitle_job, node))] * WORKER_STT_SLOTS
+    targets += [(leased_job_loop, ('postprocess', run_postprocess_job, node))] * POSTPROCESS_WORKERS
+    threads = [threading.Thread(target=target, args=args, daemon=True) for target, args in targets]
+    for thread in threads:
+        thread.start()
+
+    print(
+        f"[worker] node={node['node_id']} download_slots={MAX_CONCURRENT_DOWNLOADS} stt_slots={WORKER_STT_SLOTS}",
+        flush=True,
+    )
+    try:
+        while not node['stopping'].wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node['stopping'].set()
+        job_queue.remove_node(node['node_id'])
+        flush_history_writes()
+
+
+background_threads = []
+startup_lock = threading.Lock()
+
+
+def start_background_workers():
+    """다운로드/자막/저장공간/이력 저장 워커를 시작한다. 여러 번 호출해도 한 번만 시작한다."""
+    with startup_lock:
+        if background_threads:
+            return background_threads
+
+        targets = [storage_worker, history_writer, thumbnail_worker, retention_worker]
+        if WORKER_MODE != 'external':
+            targets += [download_worker] * MAX_CONCURRENT_DOWNLOADS + [subtitle_worker] * WORKER_STT_SLOTS
+            targets += [postprocess_worker] * POSTPROCESS_WORKERS
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            background_threads.append(thread)
+        atexit.register(flush_history_writes)
+        return background_threads
+
+
+def create_app(start_workers=True):
+    """런타임 디렉터리와 DB 스키마를 준비하고 (선택적으로) 워커를 시작한 앱을 반환한다."""
+    for folder in (instance_path, DOWNLOAD_FOLDER, JOB_WORK_FOLDER, SUBTITLE_FOLDER, THUMBNAIL_FOLDER):
+        os.makedirs(folder, exist_ok=True)
+
+    # 원격 워커는 DB를 직접 쓰지 않는다 (이력은 워커 API로 넘긴다)
+    if worker_api is None:
+        with app.app_context():
+            ensure_database_schema()
+    # 재시도 한도를 넘긴 작업은 임대를 처리하는 프로세스(독립 워커 또는 워커 API를 제공하는 웹 프로세스)가 실패 처리한다
+    if isinstance(job_queue, SqliteJobQueue):
+        job_queue.exhausted_handler = fail_exhausted_job
+
+    if start_workers:
+        start_background_workers()
+
+    if startup_metrics['ready_seconds'] is None:
+        startup_metrics['import_seconds'] = round(MODULE_READY_AT - IMPORT_STARTED_AT, 3)
+        startup_metrics['ready_seconds'] = round(time.perf_counter() - IMPORT_STARTED_AT, 3)
+        print(
+            f"[startup] import={startup_metrics['import_seconds']}s "
+            f"ready={startup_metrics['ready_seconds']}s workers={len(background_threads)}",
+            flush=True,
+        )
+    return app
+
+def format_stack_frame(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def sample_thread_stacks(duration_seconds, interval_seconds, exclude_thread_ids=()):
+    """모든 스레드의 스택을 주기적으로 떠서 (접힌 스택 문자열 -> 표본 수)로 센다."""
+    counts = Counter()
+    deadline = time.monotonic() + duration_seconds
+    while time.monotonic() < deadline:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in exclude_thread_ids:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(format_stack_frame(frame))
+                frame = frame.f_back
+            frames.append(thread_names.get(thread_id, f'thread-{thread_id}'))
+            # 접힌 스택 형식은 ';'로 프레임을, 마지막 공백으로 표본 수를 구분한다
+            counts[';'.join(name.replace(';', ',') for name in reversed(frames))] += 1
+        time.sleep(interval_seconds)
+    return counts
+
+
+def format_collapsed_stacks(counts):
+    """flamegraph.pl / speedscope 에서 바로 읽는 collapsed stack 텍스트"""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(counts.items()))
+
+
+profiling_lock = threading.Lock()
+
+
+def check_profiling_access():
+    """프로파일링이 꺼져 있으면 404, 토큰이 맞지 않으면 403 응답을 돌려준다.
+
+    토큰을 설정하지 않았으면 같은 호스트(loopback)에서 온 요청만 허용한다. 앱은 0.0.0.0에 바인딩되므로
+    토큰 없이 외부에 스택 정보를 열지 않는다.
+    """
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Not found'}), 404
+    if not PROFILING_TOKEN:
+        if request.remote_addr not in ('127.0.0.1', '::1'):
+            return jsonify({'error': '프로파일링 토큰이 없으면 서버 로컬에서만 호출할 수 있습니다.'}), 403
+        return None
+    token = request.headers.get('X-Profiling-Token') or request.args.get('token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), PROFILING_TOKEN.encode('utf-8')):
+        return jsonify({'error': '프로파일링 토큰이 올바르지 않습니다.'}), 403
+    return None
+
+
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    g.sql_seconds = 0.0
+    g.sql_count = 0
+
+
+def add_request_timing(response):
+    """Server-Timing 헤더로 요청 처리 시간과 DB 시간을 알려 주고, 느린 요청은 로그로 남긴다."""
+    started_at = getattr(g, 'request_started_at', None)
+    if started_at is None:
+        return response
+    total_ms = (time.perf_counter() - started_at) * 1000
+    sql_ms = g.sql_seconds * 1000
+    response.headers.add(
+        'Server-Timing', f'app;dur={total_ms:.1f}, db;dur={sql_ms:.1f};desc="{g.sql_count} queries"'
+    )
+    if total_ms >= SLOW_REQUEST_MS:
+        print(
+            f'[profile] slow request {request.method} {request.full_path.rstrip("?")} '
+            f'{response.status_code} {total_ms:.0f}ms (db {sql_ms:.0f}ms, {g.sql_count} queries)',
+            flush=True,
+        )
+    return response
+
+
+def before_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def after_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+    if has_request_context() and hasattr(g, 'sql_seconds'):
+        g.sql_seconds += elapsed
+        g.sql_count += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        print(f"[profile] slow query {elapsed * 1000:.0f}ms: {' '.join(statement.split())[:300]}", flush=True)
+
+
+if PROFILING_ENABLED:
+    # 켜져 있을 때만 hook을 등록한다. 꺼져 있으면 요청/쿼리 경로에 추가되는 코드가 없다.
+    app.before_request(start_request_timer)
+    app.after_request(add_request_timing)
+    event.listen(Engine, 'before_cursor_execute', before_query)
+    event.listen(Engine, 'after_cursor_execute', after_query)
 
-subtitle_worker_thread = threading.Thread(target=subtitle_worker, daemon=True)
-subtitle_worker_thread.start()
 
 def normalize_youtube_url(url):
     """YouTube URL 정규화 - 단일 비디오는 list 파라미터 제거"""
@@ -651,14 +3812,9 @@ def extract_playlist_info(url):
     """플레이리스트 정보 추출"""
     # URL 정규화
     url = normalize_youtube_url(url)
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': True,
-    }
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ytdl_pool.session('info') as ydl:
             info = ydl.extract_info(url, download=False)
             
             if 'entries' in info:
@@ -703,11 +3859,36 @@ def extract_playlist_info(url):
                     'title': info.get('title', 'Unknown'),
                     'url': url,
                     'thumbnail': thumbnail,
-                    'duration': info.get('duration', 0)
+                    'duration': info.get('duration', 0),
+                    'chapters': [
+                        {'title': chapter.get('title'), 'start_time': chapter.get('start_time'), 'end_time': chapter.get('end_time')}
+                        for chapter in info.get('chapters') or []
+                    ]
                 }
     except Exception as e:
         raise Exception(f"Failed to extract info: {str(e)}")
 
+
+@app.after_request
+def compress_json_response(response):
+    """gzip을 받는 클라이언트에게 일정 크기 이상의 JSON 응답을 압축해서 보낸다"""
+    if (response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or not client_accepts_gzip()):
+        return response
+
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+
+    response.set_data(gzip_body(body))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
 @app.route('/')
 def index():
     return render_template('index.html', max_downloads=MAX_CONCURRENT_DOWNLOADS)
@@ -725,7 +3906,14 @@ def start_download():
     try:
         # URL 정규화
         url = normalize_youtube_url(url)
+        probe_started_at = time.time()
         info = extract_playlist_info(url)
+        timeline = [['probe_start', probe_started_at], ['probe_end', time.time()]]
+        record_job_stage(timeline, 'queued')
+
+        # 구간은 단일 영상에만 지정할 수 있다 (플레이리스트에서 조용히 무시하지 않는다)
+        if info['is_playlist'] and (data.get('ranges') or data.get('chapters')):
+            return jsonify({'error': '구간(ranges/chapters)은 단일 영상 URL에만 지정할 수 있습니다.'}), 400
 
         # 플레이리스트 URL 차단
         if info['is_playlist']:
@@ -733,29 +3921,24 @@ def start_download():
 
         if False:  # 플레이리스트 기능 비활성화
             playlist_id = f"playlist_{datetime.now().timestamp()}"
-            playlist_groups[playlist_id] = {
+            video_ids = [f"video_{datetime.now().timestamp()}_{idx}" for idx in range(len(info['videos']))]
+            job_store.create(playlist_id, {
                 'title': info['title'],
                 'count': info['count'],
-                'video_ids': [],
+                'video_ids': video_ids,
                 'thumbnail': info.get('thumbnail'),
                 'quality': quality,
                 'format_type': format_type
-            }
-            
-            video_ids = []
+            }, kind='playlist')
             
             for idx, video in enumerate(info['videos']):
-                video_id = f"video_{datetime.now().timestamp()}_{idx}"
-                video_ids.append(video_id)
-                playlist_groups[playlist_id]['video_ids'].append(video_id)
-                
-                cancel_events[video_id] = threading.Event()
+                video_id = video_ids[idx]
                 
                 with lock:
                     queue_position = active_downloads + download_queue.qsize()
                 
                 if queue_position >= MAX_CONCURRENT_DOWNLOADS:
-                    download_status[video_id] = {
+                    job_store.create(video_id, {
                         'status': 'queued',
                         'message': f'Queued (#{queue_position - MAX_CONCURRENT_DOWNLOADS + 1})',
                         'progress': 0,
@@ -769,9 +3952,9 @@ def start_download():
                         'playlist_count': info['count'],
                         'quality': quality,
                         'format_type': format_type
-                    }
+                    })
                 else:
-                    download_status[video_id] = {
+                    job_store.create(video_id, {
                         'status': 'queued',
                         'message': 'Starting soon...',
                         'progress': 0,
@@ -785,7 +3968,7 @@ def start_download():
                         'playlist_count': info['count'],
                         'quality': quality,
                         'format_type': format_type
-                    }
+                    })
                 
                 download_queue.put({
                     'video_id': video_id,
@@ -803,79 +3986,93 @@ def start_download():
                 'thumbnail': info.get('thumbnail')
             })
         else:
-            video_id = f"video_{datetime.now().timestamp()}"
+            # ranges/chapters가 있으면 구간마다 작업을 하나씩 만든다 (구간별로 이력과 자막이 따로 생긴다)
+            clip_sections = []
+            if data.get('ranges') or data.get('chapters'):
+                clip_sections = parse_clip_sections(data.get('ranges'), data.get('chapters'), info)
+            sections = clip_sections or [None]
+
+            estimated_sizes = [estimate_download_size(info, quality, format_type, section) for section in sections]
+            storage_error = check_storage_admission(sum(estimated_sizes))
+            if storage_error:
+                storage_eviction_event.set()
+                return jsonify({'error': storage_error}), 507
+            if STORAGE_EVICTION_ENABLED:
+                storage_eviction_event.set()
+
+            base_video_id = f"video_{datetime.now().timestamp()}"
+            thumbnail_key = get_thumbnail_key(url, info.get('thumbnail'))
+            enqueue_thumbnail_fetch(thumbnail_key, info.get('thumbnail'))
 
-            cancel_events[video_id] = threading.Event()
-
-            with lock:
-                queue_position = active_downloads + download_queue.qsize()
+            video_ids = []
+            for index, (section, estimated_size) in enumerate(zip(sections, estimated_sizes)):
+                video_id = base_video_id if section is None else f'{base_video_id}_{index}'
+                queue_position, capacity = get_download_queue_position()
 
-            if queue_position >= MAX_CONCURRENT_DOWNLOADS:
-                download_status[video_id] = {
+                job_store.create(video_id, {
                     'status': 'queued',
-                    'message': f'Queued (#{queue_position - MAX_CONCURRENT_DOWNLOADS + 1})',
+                    'message': f'Queued (#{queue_position - capacity + 1})' if queue_position >= capacity else 'Starting soon...',
                     'progress': 0,
                     'url': url,
-                    'video_title': info['title'],
-                    'thumbnail': info.get('thumbnail'),
-                    'duration': info.get('duration', 0),
+                    'video_title': info['title'] if section is None else f"{info['title']} [{get_clip_label(section)}]",
+                    'thumbnail': get_thumbnail_url(thumbnail_key),
+                    'thumbnail_key': thumbnail_key,
+                    'duration': info.get('duration', 0) if section is None else section['end'] - section['start'],
                     'quality': quality,
-                    'format_type': format_type
-                }
-            else:
-                download_status[video_id] = {
-                    'status': 'queued',
-                    'message': 'Starting soon...',
-                    'progress': 0,
+                    'format_type': format_type,
+                    'estimated_size': estimated_size,
+                    'clip_section': section,
+                    'timeline': list(timeline)
+                })
+
+                enqueue_download_job({
+                    'video_id': video_id,
                     'url': url,
-                    'video_title': info['title'],
-                    'thumbnail': info.get('thumbnail'),
-                    'duration': info.get('duration', 0),
                     'quality': quality,
                     'format_type': format_type
-                }
-            
-            download_queue.put({
-                'video_id': video_id,
-                'url': url,
-                'quality': quality,
-                'format_type': format_type
-            })
-            
-            return jsonify({
+                })
+                video_ids.append(video_id)
+
+            response = {
                 'message': 'Download started',
                 'is_playlist': False,
-                'video_id': video_id,
-                'thumbnail': info.get('thumbnail')
-            })
+                'video_id': video_ids[0],
+                'thumbnail': get_thumbnail_url(thumbnail_key)
+            }
+            if clip_sections:
+                response.update(message=f'Clip download started ({len(video_ids)} sections)', video_ids=video_ids)
+            return jsonify(response)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/status/<video_id>')
 def get_status(video_id):
-    status = download_status.get(video_id, {'status': 'not_found'})
+    status = get_job_record(video_id) or {'status': 'not_found'}
     return jsonify(status)
 
 @app.route('/playlist-status/<playlist_id>')
 def get_playlist_status(playlist_id):
-    if playlist_id not in playlist_groups:
+    playlist = get_job_record(playlist_id)
+    if playlist is None:
         return jsonify({'error': 'Playlist not found'}), 404
     
-    playlist = playlist_groups[playlist_id]
     video_ids = playlist['video_ids']
+    records = get_job_records(video_ids)
     
     statuses = {
         'completed': 0,
         'downloading': 0,
+        'postprocessing': 0,
         'queued': 0,
         'error': 0,
         'cancelled': 0
     }
     
     for vid in video_ids:
-        if vid in download_status:
-            status = download_status[vid].get('status', 'unknown')
+        data = records.get(vid)
+        if data is not None:
+            status = data.get('status', 'unknown')
             if status in statuses:
                 statuses[status] += 1
     
@@ -890,25 +4087,23 @@ def get_playlist_status(playlist_id):
 
 @app.route('/cancel/<video_id>', methods=['POST'])
 def cancel_download(video_id):
-    if video_id in cancel_events:
-        cancel_events[video_id].set()
+    if job_store.request_cancel(video_id):
         return jsonify({'message': 'Cancellation requested'})
     return jsonify({'error': 'Not found'}), 404
 
 @app.route('/cancel-playlist/<playlist_id>', methods=['POST'])
 def cancel_playlist(playlist_id):
-    if playlist_id not in playlist_groups:
+    playlist = job_store.get(playlist_id)
+    if playlist is None:
         return jsonify({'error': 'Playlist not found'}), 404
     
-    playlist = playlist_groups[playlist_id]
     cancelled_count = 0
     
     for video_id in playlist['video_ids']:
-        if video_id in cancel_events:
-            status = download_status.get(video_id, {}).get('status')
-            if status in ['queued', 'downloading']:
-                cancel_events[video_id].set()
-                cancelled_count += 1
+        status = (job_store.get(video_id) or {}).get('status')
+        if status in ACTIVE_JOB_STATUSES:
+            job_store.request_cancel(video_id)
+            cancelled_count += 1
     
     return jsonify({
         'message': f'Cancelled {cancelled_count} videos',
@@ -917,37 +4112,40 @@ def cancel_playlist(playlist_id):
 
 @app.route('/delete/<video_id>', methods=['DELETE'])
 def delete_download(video_id):
-    if video_id in download_status:
-        status = download_status[video_id].get('status')
-        if status in ['downloading', 'queued']:
+    data = job_store.get(video_id)
+    if data is not None:
+        status = data.get('status')
+        if status in ACTIVE_JOB_STATUSES:
             return jsonify({'error': 'Please cancel the download first'}), 400
         
-        del download_status[video_id]
-        if video_id in cancel_events:
-            del cancel_events[video_id]
+        job_store.delete(video_id)
         
         return jsonify({'message': 'Deleted'})
     
+    if delete_archived_jobs([video_id]):
+        return jsonify({'message': 'Deleted'})
+    
     return jsonify({'error': 'Not found'}), 404
 
 @app.route('/delete-playlist/<playlist_id>', methods=['DELETE'])
 def delete_playlist(playlist_id):
-    if playlist_id not in playlist_groups:
+    playlist = get_job_record(playlist_id)
+    if playlist is None:
         return jsonify({'error': 'Playlist not found'}), 404
     
-    playlist = playlist_groups[playlist_id]
     deleted_count = 0
     
     for video_id in playlist['video_ids']:
-        if video_id in download_status:
-            status = download_status[video_id].get('status')
-            if status not in ['downloading', 'queued']:
-                del download_status[video_id]
-                if video_id in cancel_events:
-                    del cancel_events[video_id]
+        data = job_store.get(video_id)
+        if data is not None:
+            status = data.get('status')
+            if status not in ACTIVE_JOB_STATUSES:
+                job_store.delete(video_id)
                 deleted_count += 1
     
-    del playlist_groups[playlist_id]
+    job_store.delete(playlist_id)
+    deleted_count += delete_archived_jobs(playlist['video_ids'], kind='download')
+    delete_archived_jobs([playlist_id])
     
     return jsonify({
         'message': f'Deleted {deleted_count} videos',
@@ -956,11 +4154,10 @@ def delete_playlist(playlist_id):
 
 @app.route('/download-file/<video_id>')
 def download_file(video_id):
-    if video_id not in download_status:
+    status = get_job_record(video_id)
+    if status is None:
         return jsonify({'error': 'Not found'}), 404
     
-    status = download_status[video_id]
-    
     if status.get('status') != 'completed':
         return jsonify({'error': 'Download not completed'}), 400
     
@@ -976,6 +4173,45 @@ def download_file(video_id):
     return send_file(filepath, as_attachment=True, download_name=filename)
 
 
+def history_has_thumbnail_key(thumbnail_key):
+    if DownloadHistory.query.filter_by(thumbnail_key=thumbnail_key).first() is not None:
+        return True
+    # 썸네일 키를 저장하지 않은 이력(플레이리스트 항목, 이전 버전 이력)은 URL의 YouTube ID가 키다
+    candidates = DownloadHistory.query.filter(
+        DownloadHistory.thumbnail_key.is_(None), DownloadHistory.url.contains(thumbnail_key, autoescape=True)
+    ).limit(20)
+    return any(extract_youtube_video_id(history.url) == thumbnail_key for history in candidates)
+
+
+def is_known_thumbnail_key(thumbnail_key):
+    """진행 중인 작업이나 다운로드 이력이 쓰는 썸네일 키인지 확인한다"""
+    if any(data.get('thumbnail_key') == thumbnail_key for _, data in job_store.items()):
+        return True
+    return history_has_thumbnail_key(thumbnail_key)
+
+
+@app.route('/thumbnails/<thumbnail_key>.jpg')
+def get_thumbnail(thumbnail_key):
+    """로컬에 캐시된 썸네일 제공 (없으면 백그라운드로 가져오고 404)"""
+    if not THUMBNAIL_KEY_PATTERN.match(thumbnail_key):
+        return jsonify({'error': 'Not found'}), 404
+
+    if not os.path.exists(os.path.join(THUMBNAIL_FOLDER, f'{thumbnail_key}.jpg')):
+        # 해시 키는 원본 URL을 모르므로 다운로드 요청 때 넣은 작업만 기다린다.
+        # 클라이언트가 보낸 임의의 키로 외부 요청을 만들지 않도록 목록에 있는 키만 가져온다.
+        if not thumbnail_key.startswith(THUMBNAIL_SOURCE_KEY_PREFIX):
+            if not is_known_thumbnail_key(thumbnail_key):
+                return jsonify({'error': 'Not found'}), 404
+            enqueue_thumbnail_fetch(thumbnail_key)
+        response = jsonify({'error': 'Thumbnail not cached yet'})
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 404
+
+    response = send_from_directory(THUMBNAIL_FOLDER, f'{thumbnail_key}.jpg', max_age=THUMBNAIL_CACHE_SECONDS)
+    response.headers['Cache-Control'] = f'public, max-age={THUMBNAIL_CACHE_SECONDS}, immutable'
+    return response
+
+
 @app.route('/download-file-by-history/<int:history_id>')
 def download_file_by_history(history_id):
     """DB 이력에서 파일 다운로드"""
@@ -986,11 +4222,17 @@ def download_file_by_history(history_id):
     if not history.filename:
         return jsonify({'error': 'File not found'}), 404
 
+    if history.media_evicted_at:
+        return jsonify({'error': '저장 공간 정리로 파일이 삭제되었습니다.'}), 410
+
     filepath = os.path.join(DOWNLOAD_FOLDER, history.filename)
 
     if not os.path.exists(filepath):
         return jsonify({'error': 'File does not exist'}), 404
 
+    history.last_accessed_at = datetime.utcnow()
+    db.session.commit()
+
     return send_file(filepath, as_attachment=True, download_name=history.filename)
 
 
@@ -1017,33 +4259,136 @@ def start_subtitle_generation(history_id):
         db.session.commit()
         return jsonify({'error': history.subtitle_error}), 400
 
+    payload = request.get_json(silent=True) or {}
+    priority = payload.get('priority', 'interactive')
+    if priority not in SUBTITLE_PRIORITIES:
+        return jsonify({'error': f"우선순위는 {', '.join(SUBTITLE_PRIORITIES)} 중 하나여야 합니다."}), 400
+
     history.subtitle_status = 'queued'
     history.subtitle_error = None
+    history.subtitle_timeline = encode_stage_timeline(record_job_stage([], 'queued'))
     db.session.commit()
 
-    subtitle_queue.put(history_id)
+    enqueue_subtitle_job(history_id, priority, history.duration)
 
     return jsonify({
         'message': '자막 생성이 시작되었습니다.',
-        'subtitle_status': 'queued'
+        'subtitle_status': 'queued',
+        'priority': priority
+    })
+
+
+@app.route('/api/downloads/<int:history_id>/subtitle', methods=['DELETE'])
+def cancel_subtitle_generation(history_id):
+    """대기 중이거나 진행 중인 자막 생성 취소"""
+    history = db.session.get(DownloadHistory, history_id)
+    if not history:
+        return jsonify({'error': '항목을 찾을 수 없습니다.'}), 404
+
+    if get_subtitle_status(history) not in ['queued', 'processing']:
+        return jsonify({'error': '진행 중인 자막 생성이 없습니다.'}), 400
+
+    cancel_subtitle_job(history_id)
+    history.subtitle_status = get_subtitle_status_after_cancel(history.subtitle_filename)
+    history.subtitle_error = None
+    db.session.commit()
+
+    return jsonify({
+        'message': '자막 생성이 취소되었습니다.',
+        'subtitle_status': history.subtitle_status
+    })
+
+
+@app.route('/api/subtitles/bulk', methods=['POST'])
+def start_bulk_subtitle_generation():
+    """여러 완료 항목의 자막 생성을 한 번에 예약 (ids, 검색어 q, 또는 all=true)
+
+    기본으로 자막이 없거나 실패한 항목만 고르고, 상태는 UPDATE 한 번으로 queued로 바꾼다.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        ids = parse_history_ids(payload.get('ids'))
+    except (TypeError, ValueError):
+        return jsonify({'error': '잘못된 항목 ID입니다.'}), 400
+    search = (payload.get('q') or '').strip()
+    if not ids and not search and not payload.get('all'):
+        return jsonify({'error': 'ids, q, all 중 하나를 지정하세요.'}), 400
+    priority = payload.get('priority', 'bulk')
+    if priority not in SUBTITLE_PRIORITIES:
+        return jsonify({'error': f"우선순위는 {', '.join(SUBTITLE_PRIORITIES)} 중 하나여야 합니다."}), 400
+
+    query = DownloadHistory.query.filter(
+        DownloadHistory.status == 'completed',
+        DownloadHistory.filename.isnot(None),
+        DownloadHistory.media_evicted_at.is_(None),
+        or_(DownloadHistory.subtitle_status.is_(None),
+            DownloadHistory.subtitle_status.notin_(['queued', 'processing'])),
+    )
+    if payload.get('only_missing', True):
+        query = query.filter(or_(DownloadHistory.subtitle_status.is_(None),
+                                 DownloadHistory.subtitle_status.in_(['none', 'error'])))
+    if ids:
+        query = query.filter(DownloadHistory.id.in_(ids))
+    if search:
+        query = query.filter(DownloadHistory.video_title.ilike(f'%{search}%'))
+    rows = query.with_entities(DownloadHistory.id, DownloadHistory.filename, DownloadHistory.duration).all()
+
+    targets = []
+    missing_source = 0
+    for history_id, filename, duration in rows:
+        source_path = get_safe_folder_path(DOWNLOAD_FOLDER, filename)
+        if not source_path or not os.path.exists(source_path):
+            missing_source += 1
+            continue
+        targets.append((history_id, duration))
+
+    if targets:
+        target_ids = [history_id for history_id, _ in targets]
+        DownloadHistory.query.filter(
+            DownloadHistory.id.in_(target_ids),
+            or_(DownloadHistory.subtitle_status.is_(None),
+                DownloadHistory.subtitle_status.notin_(['queued', 'processing'])),
+        ).update({
+            'subtitle_status': 'queued',
+            'subtitle_error': None,
+            'subtitle_progress': None,
+            'subtitle_timeline': encode_stage_timeline(record_job_stage([], 'queued')),
+        }, synchronize_session=False)
+        db.session.commit()
+        for history_id, duration in targets:
+            enqueue_subtitle_job(history_id, priority, duration)
+
+    return jsonify({
+        'message': f'{len(targets)}개 항목의 자막 생성을 예약했습니다.',
+        'queued': len(targets),
+        'missing_source': missing_source,
+        'priority': priority,
+        'backlog': get_subtitle_backlog(),
     })
 
 
+@app.route('/api/subtitles/backlog')
+def get_subtitle_backlog_status():
+    """자막 작업 대기열 현황과 예상 완료 시간"""
+    return jsonify(get_subtitle_backlog())
+
+
 @app.route('/subtitle-file-by-history/<int:history_id>')
 def download_subtitle_file_by_history(history_id):
-    """DB 이력에서 생성된 자막 파일 다운로드"""
+    """DB 이력에서 생성된 자막 파일 다운로드 (생성 중이면 지금까지 확정된 부분 자막)"""
     history = db.session.get(DownloadHistory, history_id)
     if not history:
         return jsonify({'error': '항목을 찾을 수 없습니다.'}), 404
 
-    if get_subtitle_status(history) != 'completed' or not history.subtitle_filename:
+    if get_subtitle_status(history) not in ('completed', 'processing'):
         return jsonify({'error': '자막 파일이 없습니다.'}), 404
 
-    filepath = os.path.join(SUBTITLE_FOLDER, history.subtitle_filename)
-    if not os.path.exists(filepath):
+    filepath, _ = resolve_subtitle_file(history)
+    if not filepath:
         return jsonify({'error': '자막 파일이 존재하지 않습니다.'}), 404
 
-    return send_file(filepath, as_attachment=True, download_name=history.subtitle_filename)
+    # 부분 자막은 내용이 계속 늘어나므로 캐시하지 않는다
+    return send_file(filepath, as_attachment=True, download_name=os.path.basename(filepath), max_age=0)
 
 
 @app.route('/api/downloads/<int:history_id>/subtitle-text')
@@ -1053,21 +4398,95 @@ def get_subtitle_text_by_history(history_id):
     if not history:
         return jsonify({'error': '항목을 찾을 수 없습니다.'}), 404
 
-    if get_subtitle_status(history) != 'completed' or not history.subtitle_filename:
+    if get_subtitle_status(history) not in ('completed', 'processing'):
         return jsonify({'error': '자막 파일이 없습니다.'}), 404
 
-    try:
-        subtitle_text = read_subtitle_text_for_history(history)
-    except FileNotFoundError:
+    filepath, partial = resolve_subtitle_file(history)
+    if not filepath:
         return jsonify({'error': '자막 파일이 존재하지 않습니다.'}), 404
+    with open(filepath, 'r', encoding='utf-8') as subtitle_file:
+        subtitle_text = subtitle_file.read()
 
     return jsonify({
         'subtitle_text': subtitle_text,
-        'subtitle_filename': history.subtitle_filename,
+        'subtitle_filename': os.path.basename(filepath),
+        'video_title': history.video_title,
+        'partial': partial,
+        'subtitle_progress': history.subtitle_progress,
+    })
+
+
+@app.route('/api/downloads/<int:history_id>/subtitle-cues')
+def get_subtitle_cues_by_history(history_id):
+    """자막 큐를 색인 범위(offset/limit) 또는 시간 구간(from_ms/to_ms)으로 조회"""
+    history = db.session.get(DownloadHistory, history_id)
+    if not history:
+        return jsonify({'error': '항목을 찾을 수 없습니다.'}), 404
+
+    if get_subtitle_status(history) not in ('completed', 'processing'):
+        return jsonify({'error': '자막 파일이 없습니다.'}), 404
+
+    filepath, partial = resolve_subtitle_file(history)
+    if not filepath:
+        return jsonify({'error': '자막 파일이 존재하지 않습니다.'}), 404
+
+    limit = request.args.get('limit', SUBTITLE_CUE_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SUBTITLE_CUE_PAGE_MAX))
+    from_ms = request.args.get('from_ms', type=int)
+    to_ms = request.args.get('to_ms', type=int)
+
+    index = get_subtitle_cue_index(filepath)
+    total = len(index['offsets'])
+    if from_ms is not None or to_ms is not None:
+        first, last = find_cue_range_for_window(index, from_ms or 0, to_ms)
+        last = min(last, first + limit)
+    else:
+        first = max(0, request.args.get('offset', 0, type=int))
+        last = min(total, first + limit)
+
+    cues = read_subtitle_cues(filepath, index, first, last)
+    return jsonify({
+        'cues': cues,
+        'offset': first,
+        'next_offset': last if last < total else None,
+        'total': total,
+        'duration_ms': index['ends'][-1] if total else 0,
+        'subtitle_filename': os.path.basename(filepath),
         'video_title': history.video_title,
+        'partial': partial,
+        'subtitle_progress': history.subtitle_progress,
     })
 
 
+@app.route('/api/subtitles/search')
+def search_subtitles():
+    """생성된 자막 전체에서 문구를 검색해 (이력, 큐 시작 시각, 발췌) 목록을 관련도순으로 반환"""
+    search = request.args.get('q', '').strip()
+    if not build_subtitle_search_query(search):
+        return jsonify({'error': '검색어를 입력하세요.'}), 400
+
+    limit = request.args.get('limit', SUBTITLE_SEARCH_LIMIT, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    try:
+        results = search_subtitle_cues(search, limit=limit, offset=offset)
+    except Exception as e:
+        return jsonify({'error': f'검색에 실패했습니다: {e}'}), 400
+
+    history_ids = {result['history_id'] for result in results}
+    titles = {}
+    if history_ids:
+        titles = dict(
+            db.session.query(DownloadHistory.id, DownloadHistory.video_title)
+            .filter(DownloadHistory.id.in_(history_ids))
+            .all()
+        )
+    for result in results:
+        result['video_title'] = titles.get(result['history_id'])
+        result['timestamp'] = format_srt_timestamp(result['start_ms'])
+
+    return jsonify({'query': search, 'results': results, 'offset': offset})
+
+
 @app.route('/clear-inactive', methods=['POST'])
 def clear_inactive():
     inactive_statuses = ['completed', 'cancelled', 'error']
@@ -1075,26 +4494,27 @@ def clear_inactive():
     deleted_playlists = []
     
     # 비활성 비디오 삭제
-    for video_id in list(download_status.keys()):
-        if download_status[video_id].get('status') in inactive_statuses:
+    for video_id, data in job_store.items():
+        if data.get('status') in inactive_statuses:
             deleted_videos.append(video_id)
-            del download_status[video_id]
-            if video_id in cancel_events:
-                del cancel_events[video_id]
+            job_store.delete(video_id)
     
     # 모든 비디오가 삭제된 플레이리스트 삭제
-    for playlist_id in list(playlist_groups.keys()):
-        playlist = playlist_groups[playlist_id]
-        remaining_videos = [vid for vid in playlist['video_ids'] if vid in download_status]
+    for playlist_id, playlist in job_store.items(kind='playlist'):
+        remaining_videos = [vid for vid in playlist['video_ids'] if job_store.get(vid) is not None]
         
         if not remaining_videos:
             deleted_playlists.append(playlist_id)
-            del playlist_groups[playlist_id]
+            job_store.delete(playlist_id)
+    
+    # 보관된 작업은 모두 끝난 작업이다
+    archived_videos = delete_archived_jobs(kind='download')
+    archived_playlists = delete_archived_jobs(kind='playlist')
     
     return jsonify({
         'message': 'Inactive items cleared',
-        'deleted_videos': len(deleted_videos),
-        'deleted_playlists': len(deleted_playlists)
+        'deleted_videos': len(deleted_videos) + archived_videos,
+        'deleted_playlists': len(deleted_playlists) + archived_playlists
     })
     
 @app.route('/clean-storage', methods=['POST'])
@@ -1102,122 +4522,244 @@ def clean_storage():
     try:
         # 진행 중인 다운로드의 파일명 수집
         active_files = set()
-        for video_id, status in download_status.items():
-            if status.get('status') in ['downloading', 'queued']:
+        for video_id, status in job_store.items():
+            if status.get('status') in ACTIVE_JOB_STATUSES:
                 filename = status.get('filename')
                 if filename:
                     active_files.add(filename)
         
         # 파일 삭제
-        deleted_count = 0
+        deleted_files = []
         if os.path.exists(DOWNLOAD_FOLDER):
             for filename in os.listdir(DOWNLOAD_FOLDER):
-                if filename not in active_files:
-                    filepath = os.path.join(DOWNLOAD_FOLDER, filename)
+                filepath = os.path.join(DOWNLOAD_FOLDER, filename)
+                # 작업 디렉터리(.jobs, .ytdl)는 진행 중인 다운로드가 사용하므로 건드리지 않음
+                if filename not in active_files and os.path.isfile(filepath):
                     try:
                         os.remove(filepath)
-                        deleted_count += 1
+                        deleted_files.append(filename)
                     except Exception as e:
                         print(f"Failed to delete {filename}: {e}")
+        deleted_count = len(deleted_files)
+
+        # 파일이 지워진 이력은 용량 정리와 같이 미디어 삭제로 표시한다 (이력과 자막은 유지)
+        if deleted_files:
+            DownloadHistory.query.filter(
+                DownloadHistory.filename.in_(deleted_files),
+                DownloadHistory.media_evicted_at.is_(None),
+            ).update({DownloadHistory.media_evicted_at: datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
         
         return jsonify({
             'message': 'Storage cleaned',
             'deleted_count': deleted_count
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/storage')
+def get_storage_status():
+    """저장 공간 사용량 및 할당량 조회"""
+    disk = shutil.disk_usage(DOWNLOAD_FOLDER)
+    evicted_count = DownloadHistory.query.filter(DownloadHistory.media_evicted_at.isnot(None)).count()
+    return jsonify({
+        'quota_bytes': STORAGE_QUOTA_BYTES,
+        'used_bytes': get_stored_media_bytes(),
+        'reserved_bytes': get_reserved_download_bytes(),
+        'free_bytes': disk.free,
+        'min_free_bytes': STORAGE_MIN_FREE_BYTES,
+        'evicted_count': evicted_count,
+    })
+
+
 # --- 통합 다운로드 API ---
 @app.route('/api/downloads')
 def get_downloads():
-    """통합 다운로드 목록 조회 (진행중 + 완료)"""
+    """통합 다운로드 목록 조회 (진행중 + 완료). 변경 버전 기반 캐시와 ETag/304를 사용한다."""
     status_filter = request.args.get('status', 'all')  # all, active, completed
     search = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
 
     try:
-        items = []
-
-        # 진행 중인 다운로드 (메모리에서)
-        if status_filter in ['all', 'active']:
-            for video_id, data in download_status.items():
-                if data.get('status') in ['queued', 'downloading', 'error', 'cancelled']:
-                    # 검색어 필터
-                    if search and search.lower() not in (data.get('video_title', '') or '').lower():
-                        continue
-                    items.append({
-                        'id': video_id,
-                        'type': 'active',
-                        'url': data.get('url', ''),
-                        'video_title': data.get('video_title', ''),
-                        'thumbnail': data.get('thumbnail'),
-                        'quality': data.get('quality'),
-                        'format_type': data.get('format_type'),
-                        'status': data.get('status'),
-                        'progress': data.get('progress', 0),
-                        'speed': data.get('speed', 0),
-                        'message': data.get('message', ''),
-                        'filename': data.get('filename'),
-                        'created_at': None
-                    })
+        cache_key = (status_filter, search, page, per_page)
+        version = get_change_version()
+        etag = build_list_etag(version, cache_key)
+        if request.if_none_match.contains(etag):
+            # 304도 200과 같은 캐시 헤더(ETag, Cache-Control, Vary)를 보내야 캐시가 저장된 응답을 올바르게 갱신한다
+            return set_list_cache_headers(app.response_class(status=304), etag)
+
+        entry = get_cached_response(cache_key, version)
+        if entry is None:
+            payload = build_downloads_payload(status_filter, search, page, per_page)
+            entry = store_cached_response(cache_key, version, app.json.dumps(payload).encode('utf-8'))
+
+        body = entry['body']
+        response = app.response_class(mimetype='application/json')
+        if client_accepts_gzip() and len(body) >= GZIP_MIN_BYTES:
+            if entry['gzip'] is None:
+                entry['gzip'] = gzip_body(body)
+            body = entry['gzip']
+            response.headers['Content-Encoding'] = 'gzip'
+        response.set_data(body)
+        return set_list_cache_headers(response, etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # 완료된 다운로드 (DB에서)
-        if status_filter in ['all', 'completed']:
-            query = DownloadHistory.query.filter_by(status='completed')
 
-            if search:
-                query = query.filter(DownloadHistory.video_title.ilike(f'%{search}%'))
-
-            query = query.order_by(DownloadHistory.created_at.desc())
-            histories = query.all()
-
-            for h in histories:
-                items.append({
-                    'id': h.id,
-                    'type': 'completed',
-                    'url': h.url,
-                    'video_title': h.video_title,
-                    'thumbnail': None,
-                    'quality': h.quality,
-                    'format_type': h.format_type,
-                    'status': 'completed',
-                    'progress': 100,
-                    'speed': 0,
-                    'message': 'Download completed',
-                    'filename': h.filename,
-                    'file_size': h.file_size,
-                    'created_at': h.created_at.isoformat() if h.created_at else None,
-                    'completed_at': h.completed_at.isoformat() if h.completed_at else None,
-                    'subtitle_status': get_subtitle_status(h),
-                    'subtitle_filename': h.subtitle_filename,
-                    'subtitle_error': h.subtitle_error,
-                    'subtitle_created_at': h.subtitle_created_at.isoformat() if h.subtitle_created_at else None
-                })
+def set_list_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def build_active_item(video_id, data):
+    return {
+        'id': video_id,
+        'type': 'active',
+        'url': data.get('url', ''),
+        'video_title': data.get('video_title', ''),
+        'thumbnail': data.get('thumbnail'),
+        'quality': data.get('quality'),
+        'format_type': data.get('format_type'),
+        'status': data.get('status'),
+        'progress': data.get('progress', 0),
+        'speed': data.get('speed', 0),
+        'message': data.get('message', ''),
+        'filename': data.get('filename'),
+        'clip_section': data.get('clip_section'),
+        'created_at': None,
+        'stage_timeline': serialize_stage_timeline(data.get('timeline'))
+    }
+
 
-        # 정렬: 진행 중 먼저, 그 다음 완료
-        def sort_key(item):
-            status_order = {'downloading': 0, 'queued': 1, 'error': 2, 'cancelled': 3, 'completed': 4}
-            return status_order.get(item['status'], 5)
+def build_completed_item(h):
+    return {
+        'id': h.id,
+        'type': 'completed',
+        'url': h.url,
+        'video_title': h.video_title,
+        'thumbnail': get_thumbnail_url(h.thumbnail_key or extract_youtube_video_id(h.url)),
+        'quality': h.quality,
+        'format_type': h.format_type,
+        'status': 'completed',
+        'progress': 100,
+        'speed': 0,
+        'message': 'Download completed',
+        'filename': h.filename,
+        'file_size': h.file_size,
+        'media_evicted': h.media_evicted_at is not None,
+        'last_accessed_at': h.last_accessed_at.isoformat() if h.last_accessed_at else None,
+        'created_at': h.created_at.isoformat() if h.created_at else None,
+        'completed_at': h.completed_at.isoformat() if h.completed_at else None,
+        'subtitle_status': get_subtitle_status(h),
+        'subtitle_filename': h.subtitle_filename,
+        'subtitle_error': h.subtitle_error,
+        'subtitle_created_at': h.subtitle_created_at.isoformat() if h.subtitle_created_at else None,
+        'stage_timeline': serialize_stage_timeline(load_stage_timeline(h.stage_timeline)),
+        'subtitle_timeline': serialize_stage_timeline(load_stage_timeline(h.subtitle_timeline)),
+        'subtitle_metrics': json.loads(h.subtitle_metrics) if h.subtitle_metrics else None,
+        'subtitle_progress': h.subtitle_progress,
+        'format_plan': json.loads(h.format_plan) if h.format_plan else None,
+        'clip_section': json.loads(h.clip_section) if h.clip_section else None
+    }
 
-        items.sort(key=sort_key)
 
-        # 페이지네이션
-        total = len(items)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_items = items[start:end]
+def paginate_segments(segments, start, limit):
+    """순서대로 이어 붙인 구간들에서 [start, start + limit) 범위만 읽는다.
 
-        return jsonify({
-            'items': paginated_items,
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total + per_page - 1) // per_page if total > 0 else 1
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    segments: (개수, fetch(offset, limit)) 목록. 페이지에 걸치지 않는 구간은 읽지 않는다.
+    """
+    items = []
+    remaining = limit if start >= 0 else 0
+    for count, fetch in segments:
+        if remaining <= 0:
+            break
+        if start >= count:
+            start -= count
+            continue
+        chunk = fetch(start, min(remaining, count - start))
+        items.extend(chunk)
+        remaining -= len(chunk)
+        start = 0
+    return items
+
+
+def build_downloads_payload(status_filter, search, page, per_page):
+    """목록 응답 본문 계산 (캐시 미스일 때만 호출)
+
+    메모리의 작업은 보관 정책으로 개수가 제한되므로 파이썬에서 정렬하고,
+    job_archive와 완료 이력은 SQL로 개수만 센 뒤 현재 페이지에 걸치는 행만 읽는다.
+    """
+    # 정렬: 진행 중 먼저, 그 다음 실패/취소, 마지막에 완료. 같은 상태에서는 메모리 항목이 보관 항목보다 앞선다.
+    status_order = {'downloading': 0, 'postprocessing': 1, 'queued': 2, 'error': 3, 'cancelled': 4, 'completed': 5}
+    segments = []
+
+    def list_segment(items):
+        return (len(items), lambda offset, limit: items[offset:offset + limit])
+
+    def title_matches(data):
+        return not search or search.lower() in (data.get('video_title', '') or '').lower()
+
+    # 진행 중인 다운로드 (메모리에서)
+    if status_filter in ['all', 'active']:
+        memory_items = []
+        for video_id, data in job_store.items():
+            # 검색어 필터
+            if data.get('status') in ACTIVE_JOB_STATUSES + ('error', 'cancelled') and title_matches(data):
+                memory_items.append(build_active_item(video_id, data))
+        memory_items.sort(key=lambda item: status_order.get(item['status'], 6))
+
+        # 메모리에서 job_archive로 옮겨진 실패/취소 항목
+        previous_order = -1
+        for status in ('error', 'cancelled'):
+            order = status_order[status]
+            segments.append(list_segment([
+                item for item in memory_items if previous_order < status_order.get(item['status'], 6) <= order
+            ]))
+            previous_order = order
+
+            query = JobArchive.query.filter(JobArchive.kind == 'download', JobArchive.status == status)
+            if search:
+                query = query.filter(JobArchive.video_title.ilike(f'%{search}%'))
+            segments.append((query.count(), lambda offset, limit, query=query: [
+                build_active_item(archived.job_id, json.loads(archived.data))
+                for archived in query.order_by(JobArchive.finished_at.desc()).offset(offset).limit(limit)
+            ]))
+        segments.append(list_segment([
+            item for item in memory_items if status_order.get(item['status'], 6) > previous_order
+        ]))
+
+    # 완료된 다운로드 (이력 커밋을 기다리는 메모리 항목, 그 다음 DB)
+    if status_filter in ['all', 'completed']:
+        segments.append(list_segment([
+            build_active_item(video_id, data) for video_id, data in job_store.items()
+            if data.get('status') == 'completed' and data.get('history_pending') and title_matches(data)
+        ]))
+        query = DownloadHistory.query.filter_by(status='completed')
+
+        if search:
+            query = query.filter(DownloadHistory.video_title.ilike(f'%{search}%'))
+
+        segments.append((query.count(), lambda offset, limit, query=query: [
+            build_completed_item(h)
+            for h in query.order_by(DownloadHistory.created_at.desc()).offset(offset).limit(limit)
+        ]))
+
+    # 페이지네이션
+    total = sum(count for count, _ in segments)
+    paginated_items = paginate_segments(segments, (page - 1) * per_page, per_page)
+
+    return {
+        'items': paginated_items,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': (total + per_page - 1) // per_page if total > 0 else 1
+    }
 
 
 # --- 기존 이력 API (하위 호환) ---
@@ -1233,14 +4775,12 @@ def delete_download_item(item_id):
     delete_file = request.args.get('delete_file', 'false').lower() == 'true'
 
     try:
-        # 진행 중인 다운로드 (메모리) 확인
-        if item_id in download_status:
-            data = download_status[item_id]
-
+        # 진행 중인 다운로드 (메모리 또는 job_archive) 확인
+        data = get_job_record(item_id)
+        if data is not None:
             # 다운로드 중이면 취소 먼저
-            if data.get('status') in ['downloading', 'queued']:
-                if item_id in cancel_events:
-                    cancel_events[item_id].set()
+            if data.get('status') in ACTIVE_JOB_STATUSES:
+                job_store.request_cancel(item_id)
 
             # 파일 삭제 옵션
             if delete_file and data.get('filename'):
@@ -1248,10 +4788,9 @@ def delete_download_item(item_id):
                 if os.path.exists(filepath):
                     os.remove(filepath)
 
-            # 메모리에서 삭제
-            del download_status[item_id]
-            if item_id in cancel_events:
-                del cancel_events[item_id]
+            # 작업 상태에서 삭제
+            job_store.delete(item_id)
+            delete_archived_jobs([item_id])
 
             return jsonify({'message': '삭제되었습니다.'})
 
@@ -1261,9 +4800,11 @@ def delete_download_item(item_id):
             history = DownloadHistory.query.filter_by(id=history_id).first()
             if history:
                 # 파일 삭제 옵션
-                if delete_file and history.filename:
+                # 정리된 미디어의 파일명은 이후 다운로드가 다시 쓸 수 있으므로 지우지 않는다
+                if delete_file and history.filename and not history.media_evicted_at:
                     delete_file_in_folder(DOWNLOAD_FOLDER, history.filename)
 
+                cancel_subtitle_job(history.id)
                 delete_subtitle_file_for_history(history)
 
                 db.session.delete(history)
@@ -1279,6 +4820,87 @@ def delete_download_item(item_id):
         return jsonify({'error': str(e)}), 500
 
 
+def parse_history_ids(raw_ids):
+    if raw_ids is None or raw_ids == '':
+        return []
+    if isinstance(raw_ids, str):
+        raw_ids = [part for part in raw_ids.split(',') if part.strip()]
+    return [int(item) for item in raw_ids]
+
+
+def collect_export_entries(histories, include_media=True, include_subtitles=True):
+    """이력 목록에서 ZIP에 넣을 (이름, 경로) 목록을 만든다. 경로는 get_safe_folder_path로만 만든다."""
+    entries = []
+    names = set()
+    for history in histories:
+        candidates = []
+        if include_media and not history.media_evicted_at:
+            candidates.append(get_safe_folder_path(DOWNLOAD_FOLDER, history.filename))
+        if include_subtitles:
+            candidates.append(get_safe_folder_path(SUBTITLE_FOLDER, history.subtitle_filename))
+        for filepath in candidates:
+            if not filepath or not os.path.isfile(filepath):
+                continue
+            name = os.path.basename(filepath)
+            if name in names:
+                continue
+            names.add(name)
+            entries.append((name, filepath))
+    return entries
+
+
+@app.route('/api/downloads/export', methods=['GET', 'POST'])
+def export_downloads():
+    """완료된 항목의 미디어/자막을 무압축 ZIP으로 스트리밍 (ids 또는 검색어 q로 선택)"""
+    params = request.get_json(silent=True) or request.values
+    try:
+        ids = parse_history_ids(params.get('ids'))
+    except (TypeError, ValueError):
+        return jsonify({'error': '잘못된 항목 ID입니다.'}), 400
+    search = (params.get('q') or '').strip()
+    include = params.get('include') or 'media,subtitles'
+    if isinstance(include, str):
+        include = include.split(',')
+    include_media = 'media' in include
+    include_subtitles = 'subtitles' in include
+
+    if not ids and not search:
+        return jsonify({'error': '내보낼 항목 ID 또는 검색어를 지정하세요.'}), 400
+    if not include_media and not include_subtitles:
+        return jsonify({'error': 'include는 media, subtitles 중 하나 이상이어야 합니다.'}), 400
+    if len(ids) > EXPORT_MAX_ITEMS:
+        return jsonify({'error': f'한 번에 최대 {EXPORT_MAX_ITEMS}개까지 내보낼 수 있습니다.'}), 400
+
+    query = DownloadHistory.query.filter_by(status='completed')
+    if ids:
+        query = query.filter(DownloadHistory.id.in_(ids))
+    else:
+        query = query.filter(DownloadHistory.video_title.ilike(f'%{search}%'))
+    histories = query.order_by(DownloadHistory.created_at.desc()).limit(EXPORT_MAX_ITEMS + 1).all()
+    if len(histories) > EXPORT_MAX_ITEMS:
+        return jsonify({'error': f'한 번에 최대 {EXPORT_MAX_ITEMS}개까지 내보낼 수 있습니다.'}), 400
+
+    entries = collect_export_entries(histories, include_media, include_subtitles)
+    if not entries:
+        return jsonify({'error': '내보낼 파일이 없습니다.'}), 404
+
+    if include_media:
+        # 저장 공간 정리(LRU)가 방금 내보낸 파일을 먼저 지우지 않게 접근 시각을 갱신
+        accessed_at = datetime.utcnow()
+        exported = {name for name, _ in entries}
+        for history in histories:
+            if history.filename in exported:
+                history.last_accessed_at = accessed_at
+        db.session.commit()
+
+    filename = f"downloads-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    response = Response(iter_zip_stream(entries), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # 프록시가 전체를 버퍼링하지 않고 바로 흘려보내게 한다
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/downloads/cleanup', methods=['POST'])
 def cleanup_downloads():
     """정리 기능: 실패/취소 항목 삭제 + 고아 파일 정리"""
@@ -1289,41 +4911,24 @@ def cleanup_downloads():
 
         # 1. 메모리에서 실패/취소 항목 삭제
         to_delete = []
-        for video_id, data in download_status.items():
+        for video_id, data in job_store.items():
             if data.get('status') in ['error', 'cancelled']:
                 to_delete.append(video_id)
 
         for video_id in to_delete:
-            del download_status[video_id]
-            if video_id in cancel_events:
-                del cancel_events[video_id]
+            job_store.delete(video_id)
             cleaned_items += 1
+        cleaned_items += delete_archived_jobs(statuses=('error', 'cancelled'), kind='download')
 
-        # 2. 고아 파일 정리 (DB에 없는 파일)
-        if os.path.exists(DOWNLOAD_FOLDER):
-            # DB에 있는 파일명 목록
-            db_filenames = set()
-            histories = DownloadHistory.query.all()
-            for h in histories:
-                if h.filename:
-                    db_filenames.add(h.filename)
-
-            # 진행 중인 파일명도 포함
-            for data in download_status.values():
-                if data.get('filename'):
-                    db_filenames.add(data['filename'])
-
-            # 부분 파일 및 고아 파일 삭제
-            for filename in os.listdir(DOWNLOAD_FOLDER):
-                filepath = os.path.join(DOWNLOAD_FOLDER, filename)
-
-                # 부분 파일 삭제
-                if filename.endswith(('.part', '.ytdl', '.temp')):
-                    try:
-                        os.remove(filepath)
-                        cleaned_files += 1
-                    except:
-                        pass
+        # 2. 진행 중이 아닌 작업 디렉터리 정리 (다운로드 폴더 전체를 스캔하지 않음)
+        if os.path.isdir(JOB_WORK_FOLDER):
+            running_ids = {
+                video_id for video_id, data in job_store.items()
+                if data.get('status') in ACTIVE_JOB_STATUSES
+            }
+            for job_dir_name in os.listdir(JOB_WORK_FOLDER):
+                if job_dir_name not in running_ids:
+                    cleaned_files += cleanup_job_work_dir(job_dir_name)
 
         histories = DownloadHistory.query.all()
         cleaned_subtitles = cleanup_orphan_subtitle_files(histories)
@@ -1350,6 +4955,8 @@ def clear_history():
     """모든 다운로드 이력 삭제"""
     try:
         histories = DownloadHistory.query.all()
+        for history in histories:
+            cancel_subtitle_job(history.id)
         deleted_subtitles = sum(delete_subtitle_file_for_history(history) for history in histories)
         deleted = DownloadHistory.query.delete()
         db.session.commit()
@@ -1395,10 +5002,84 @@ def check_duplicate():
         return jsonify({'duplicate': False, 'error': str(e)})
 
 
+def call_worker_api_method(target, method, args, kwargs):
+    if target == 'history':
+        if method == 'get':
+            return get_history_snapshot(*args)
+        apply_history_writes([decode_history_write(operation) for operation in args[0]])
+        return None
+    backend = job_store if target == 'store' else job_queue
+    return getattr(backend, method)(*args, **kwargs)
+
+
+@app.route('/api/worker/rpc', methods=['POST'])
+def worker_rpc():
+    """다른 호스트의 워커(WORKER_API_URL)가 이 프로세스의 작업 큐/상태 저장소/이력 쓰기를 호출한다"""
+    # 토큰이 없으면 워커 API를 열지 않는다
+    if not isinstance(job_queue, SqliteJobQueue) or not WORKER_API_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    token = request.headers.get('X-Worker-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), WORKER_API_TOKEN.encode('utf-8')):
+        return jsonify({'error': '워커 API 토큰이 올바르지 않습니다.'}), 403
+
+    data = request.get_json(silent=True) or {}
+    target, method = data.get('target'), data.get('method')
+    if not isinstance(target, str) or method not in WORKER_API_METHODS.get(target, ()):
+        return jsonify({'error': f'지원하지 않는 워커 API 호출입니다: {target}.{method}'}), 400
+    try:
+        result = call_worker_api_method(target, method, data.get('args') or [], data.get('kwargs') or {})
+    except Exception as e:
+        print(f"[worker-api] {target}.{method} failed: {e}", flush=True)
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'result': result})
+
+
+@app.route('/api/system')
+def get_system_status():
+    """서버 런타임 상태 조회"""
+    return jsonify({
+        'startup': startup_metrics,
+        'worker_mode': WORKER_MODE,
+        'worker_threads': sum(1 for thread in background_threads if thread.is_alive()),
+        'worker_nodes': job_queue.live_nodes() if job_queue is not None else [],
+        'stt_memory': stt_memory_budget.snapshot(),
+        'download_concurrency': download_controller.snapshot(),
+        'ytdl_pool': ytdl_pool.snapshot(),
+    })
+
+
+@app.route('/api/debug/profile')
+def profile_threads():
+    """모든 스레드(웹 요청, 다운로드/자막 워커)의 스택을 seconds초 동안 샘플링해 collapsed stack 파일로 돌려준다"""
+    denied = check_profiling_access()
+    if denied:
+        return denied
+
+    seconds = request.args.get('seconds', 10, type=float)
+    if not 0 < seconds <= PROFILING_MAX_SECONDS:
+        return jsonify({'error': f'seconds는 0보다 크고 {PROFILING_MAX_SECONDS} 이하여야 합니다.'}), 400
+    interval_ms = max(1, request.args.get('interval_ms', PROFILING_SAMPLE_INTERVAL_MS, type=int))
+
+    if not profiling_lock.acquire(blocking=False):
+        return jsonify({'error': '이미 프로파일링이 진행 중입니다.'}), 409
+    try:
+        counts = sample_thread_stacks(seconds, interval_ms / 1000, exclude_thread_ids={threading.get_ident()})
+    finally:
+        profiling_lock.release()
+
+    response = app.response_class(format_collapsed_stacks(counts), mimetype='text/plain')
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=\"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded\""
+    )
+    return response
+
+
+MODULE_READY_AT = time.perf_counter()
+
+
 if __name__ == '__main__':
-    # 데이터베이스 테이블 생성
-    with app.app_context():
-        ensure_database_schema()
+    # 디렉터리/DB 스키마 준비 및 워커 시작
+    create_app()
 
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', '5002'))
@@ -0,0 +1,98 @@
+"""YoutubeDL 재사용 벤치마크: python benchmark_ytdl.py [URL ...] [--offline]
+
+짧은 동영상 여러 개를 실제로 내려받으면서 작업마다 YoutubeDL을 새로 만드는 경우와
+다운로드 워커처럼 풀(ytdl_pool의 download 프로필)에서 재사용하는 경우의 작업당 시간을 비교한다.
+두 방식 모두 같은 (가장 작은 단일 파일) 포맷을 받으므로 차이는 인스턴스 준비, 추출기/서명 작업, 연결 재사용에서 난다.
+--offline 은 네트워크 없이 인스턴스 준비(생성 + YouTube 추출기 로드) 시간만 잰다.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app import YoutubeDLPool
+
+DEFAULT_URLS = [
+    'https://www.youtube.com/watch?v=jNQXAC9IVRw',
+    'https://www.youtube.com/watch?v=aqz-KE-bpKQ',
+    'https://www.youtube.com/watch?v=C0DPdy98e4c',
+    'https://www.youtube.com/watch?v=BaW_jenozKc',
+    'https://www.youtube.com/watch?v=2Vv-BfVoq4g',
+]
+PROFILE = {'quiet': True, 'no_warnings': True, 'outtmpl': '%(id)s.f%(format_id)s.%(ext)s'}
+FORMAT = 'worst[ext=mp4]/worst'
+
+
+def run_job(ydl, url, offline):
+    if offline:
+        ydl.get_info_extractor('Youtube')
+        return
+    ydl.extract_info(url, download=True)
+
+
+def measure_fresh(urls, cachedir, work_root, offline):
+    import yt_dlp
+
+    timings = []
+    for index, url in enumerate(urls):
+        job_dir = os.path.join(work_root, f'fresh_{index}')
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL({**PROFILE, 'cachedir': cachedir, 'format': FORMAT, 'paths': {'home': job_dir}}) as ydl:
+            run_job(ydl, url, offline)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure_pooled(urls, cachedir, work_root, offline):
+    pool = YoutubeDLPool(
+        {'download': {**PROFILE, 'cachedir': cachedir}},
+        max_idle=1,
+        max_uses=len(urls) + 1,
+        download_profiles=('download',),
+        context_folder=os.path.join(work_root, '.ytdl'),
+    )
+    timings = []
+    for index, url in enumerate(urls):
+        job_dir = os.path.join(work_root, f'pooled_{index}')
+        started = time.perf_counter()
+        with pool.session(
+            'download',
+            work_dir=job_dir,
+            format=lambda ctx, ydl: ydl.build_format_selector(FORMAT)(ctx),
+        ) as ydl:
+            run_job(ydl, url, offline)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(name, timings):
+    print(
+        f'{name:>7}: total {sum(timings):7.3f}s  first {timings[0]:6.3f}s  '
+        f'mean(after first) {statistics.mean(timings[1:] or timings):6.3f}s'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', nargs='*', default=DEFAULT_URLS)
+    parser.add_argument('--offline', action='store_true', help='네트워크 없이 인스턴스 준비 시간만 측정')
+    parser.add_argument('--repeat', type=int, default=1, help='URL 목록 반복 횟수')
+    args = parser.parse_args()
+
+    urls = args.urls * max(1, args.repeat)
+    # 두 방식 모두 빈 디스크 캐시와 빈 작업 디렉터리에서 시작해 같은 조건으로 비교한다
+    with tempfile.TemporaryDirectory() as cachedir, tempfile.TemporaryDirectory() as work_root:
+        fresh = measure_fresh(urls, cachedir, work_root, args.offline)
+    with tempfile.TemporaryDirectory() as cachedir, tempfile.TemporaryDirectory() as work_root:
+        pooled = measure_pooled(urls, cachedir, work_root, args.offline)
+
+    print(f'{len(urls)} jobs ({"offline" if args.offline else "download"})')
+    summarize('fresh', fresh)
+    summarize('pooled', pooled)
+    saved = sum(fresh) - sum(pooled)
+    print(f'  saved: {saved:7.3f}s total, {saved / len(urls) * 1000:.1f}ms per job')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,19 +9,26 @@ import sys
 # app.py와 같은 디렉토리에서 실행된다고 가정
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db
+from sqlalchemy import text
+
+from app import create_app, db, ensure_database_schema
 
 def init_database():
     """데이터베이스 초기화"""
-    # app context에서 실행
+    # 워커 없이 앱 생성 후 app context에서 실행
+    app = create_app(start_workers=False)
     with app.app_context():
         # 기존 테이블 삭제
         print("기존 테이블 삭제 중...")
         db.drop_all()
+        # 자막 검색 색인(FTS5)은 SQL로 만든 테이블이라 drop_all이 지우지 않는다.
+        # 남겨 두면 새 DB에서 다시 쓰이는 이력 ID로 이전 DB의 자막이 검색된다.
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP TABLE IF EXISTS subtitle_cue_fts'))
 
-        # 새 테이블 생성
+        # 새 테이블 생성 (검색 색인과 변경 버전 트리거 포함)
         print("새로운 테이블 생성 중...")
-        db.create_all()
+        ensure_database_schema()
 
         print("✓ 데이터베이스 초기화 완료!")
         print("  위치: instance/app.db")
@@ -8,10 +8,15 @@ APP_FILE="app.py"
 # 프로세스 ID(PID)를 저장할 파일명
 PID_FILE="app.pid"
 
+# 독립 워커 (WORKER_MODE=external) 실행 파일/PID 파일
+WORKER_FILE="worker.py"
+WORKER_PID_FILE="worker.pid"
+
 # 로그 파일을 저장할 디렉터리 및 파일명
 LOG_DIR="logs"
 LOG_FILE="$LOG_DIR/app.log"
 ERROR_LOG="$LOG_DIR/error.log"
+WORKER_LOG="$LOG_DIR/worker.log"
 PYTHON_BIN="${PYTHON_BIN:-python3}"
 
 # 로그 디렉터리 생성
@@ -105,6 +110,46 @@ status() {
     fi
 }
 
+start_worker() {
+    if [ -f "$WORKER_PID_FILE" ]; then
+        PID=$(cat $WORKER_PID_FILE)
+        if ps -p $PID > /dev/null; then
+            echo "✗ Worker is already running (PID: $PID)"
+            exit 1
+        fi
+    fi
+
+    if [ -d ".venv" ]; then
+        source .venv/bin/activate
+    fi
+
+    echo "⚙️  Starting worker..."
+    nohup python $WORKER_FILE > $WORKER_LOG 2>&1 &
+    echo $! > $WORKER_PID_FILE
+
+    echo "✓ Worker started! (PID: $!)"
+    echo "  Log: tail -f $WORKER_LOG"
+}
+
+stop_worker() {
+    if [ ! -f "$WORKER_PID_FILE" ]; then
+        echo "✗ Worker not running."
+        exit 1
+    fi
+
+    PID=$(cat $WORKER_PID_FILE)
+    if ps -p $PID > /dev/null; then
+        echo "Stopping worker (PID: $PID)..."
+        kill $PID
+        rm $WORKER_PID_FILE
+        echo "✓ Worker stopped."
+    else
+        echo "✗ Worker process not found. Cleaning up PID file."
+        rm $WORKER_PID_FILE
+        exit 1
+    fi
+}
+
 restart() {
     echo "Restarting server..."
     stop
@@ -201,8 +246,14 @@ case "$1" in
     health)
         health
         ;;
+    start-worker)
+        start_worker
+        ;;
+    stop-worker)
+        stop_worker
+        ;;
     *)
-        echo "Usage: $0 {start|stop|restart|status|redeploy|logs|health}"
+        echo "Usage: $0 {start|stop|restart|status|redeploy|logs|health|start-worker|stop-worker}"
         exit 1
         ;;
 esac
@@ -0,0 +1,868 @@
+import gzip
+import json
+import threading
+import time
+import io
+import unittest
+import urllib.error
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from queue import Queue
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import yt_dlp
+
+from app import (
+    LocalJobStore,
+    SqliteJobQueue,
+    SqliteJobStore,
+    WorkerApiClient,
+    WorkerApiProxy,
+    YoutubeDLPool,
+    ConcurrencyController,
+    app,
+    apply_history_writes,
+    build_list_etag,
+    build_planned_format_selector,
+    build_postprocess_command,
+    classify_download_error,
+    collect_export_entries,
+    db,
+    cleanup_job_work_dir,
+    compress_json_response,
+    decode_history_write,
+    drain_queue_batch,
+    encode_stage_timeline,
+    encode_worker_api_value,
+    estimate_download_size,
+    extract_youtube_video_id,
+    fetch_thumbnail,
+    format_collapsed_stacks,
+    get_bytes_to_evict,
+    get_download_retry_delay,
+    get_postprocess_kind,
+    get_thumbnail_key,
+    iter_zip_stream,
+    load_stage_timeline,
+    move_job_output_into_place,
+    paginate_segments,
+    parse_clip_sections,
+    parse_clip_timestamp,
+    plan_download_format,
+    record_job_stage,
+    sample_thread_stacks,
+    select_eviction_candidates,
+    select_retention_candidates,
+    serialize_stage_timeline,
+)
+
+
+class History:
+    def __init__(self, filename, file_size, last_accessed_at=None, completed_at=None, media_evicted_at=None):
+        self.filename = filename
+        self.file_size = file_size
+        self.last_accessed_at = last_accessed_at
+        self.completed_at = completed_at
+        self.created_at = completed_at
+        self.media_evicted_at = media_evicted_at
+
+
+class DownloadHelperTests(unittest.TestCase):
+    def test_record_job_stage_updates_existing_stage_unless_keep_first(self):
+        timeline = []
+        record_job_stage(timeline, "transfer_start", timestamp=10.0, keep_first=True)
+        record_job_stage(timeline, "transfer_start", timestamp=12.0, keep_first=True)
+        record_job_stage(timeline, "transfer_end", timestamp=13.0)
+        record_job_stage(timeline, "transfer_end", timestamp=15.0)
+
+        self.assertEqual(timeline, [["transfer_start", 10.0], ["transfer_end", 15.0]])
+
+    def test_encode_stage_timeline_round_trips_with_millisecond_offsets(self):
+        timeline = [["queued", 1000.0], ["started", 1002.5], ["persisted", 1010.125]]
+
+        encoded = encode_stage_timeline(timeline)
+        restored = load_stage_timeline(encoded)
+
+        self.assertEqual(encoded, '{"t0":1000.0,"s":[["queued",0],["started",2500],["persisted",10125]]}')
+        self.assertEqual([stage for stage, _ in restored], ["queued", "started", "persisted"])
+        self.assertAlmostEqual(restored[-1][1], 1010.125)
+
+    def test_persisted_stage_is_recorded_only_after_commit(self):
+        failed_timeline = [["queued", 1000.0]]
+        committed_timeline = [["queued", 1000.0]]
+        failing_session = Mock()
+        failing_session.commit.side_effect = RuntimeError("locked")
+        with patch.object(db, "session", failing_session):
+            apply_history_writes([{"action": "insert", "fields": {"url": "u"}, "timeline": failed_timeline,
+                                   "timeline_field": "stage_timeline"}])
+
+        rows = []
+        session = Mock()
+        session.add.side_effect = rows.append
+        with patch.object(db, "session", session):
+            apply_history_writes([{"action": "insert", "fields": {"url": "u"}, "timeline": committed_timeline,
+                                   "timeline_field": "stage_timeline"}])
+
+        self.assertEqual([stage for stage, _ in failed_timeline], ["queued"])
+        self.assertEqual([stage for stage, _ in committed_timeline], ["queued", "persisted"])
+        # 커밋된 행에는 후속 커밋으로 persisted가 들어간다
+        self.assertEqual(session.commit.call_count, 2)
+        self.assertIn("persisted", rows[0].stage_timeline)
+
+    def test_completed_job_stays_pending_until_history_commit(self):
+        store = LocalJobStore()
+        store.create("video_1", {"status": "completed", "history_pending": True})
+        operation = {"action": "insert", "fields": {"url": "u"}, "job_id": "video_1"}
+        failing_session = Mock()
+        failing_session.commit.side_effect = RuntimeError("locked")
+
+        with patch("app.job_store", store):
+            with patch.object(db, "session", failing_session):
+                apply_history_writes([operation])
+            self.assertTrue(store.get("video_1")["history_pending"])
+
+            with patch.object(db, "session", Mock()):
+                apply_history_writes([operation])
+            self.assertFalse(store.get("video_1")["history_pending"])
+
+    def test_load_stage_timeline_ignores_invalid_values(self):
+        self.assertEqual(load_stage_timeline(None), [])
+        self.assertEqual(load_stage_timeline("not-json"), [])
+
+    def test_serialize_stage_timeline_reports_offsets(self):
+        serialized = serialize_stage_timeline([["queued", 0.0], ["started", 1.5]])
+
+        self.assertEqual(serialized["started_at"], "1970-01-01T00:00:00")
+        self.assertEqual(serialized["stages"][1], {"stage": "started", "offset_ms": 1500})
+
+    def test_estimate_download_size_prefers_reported_filesize(self):
+        self.assertEqual(estimate_download_size({"filesize_approx": 1234, "duration": 60}), 1234)
+
+    def test_estimate_download_size_uses_duration_bitrate(self):
+        self.assertEqual(estimate_download_size({"duration": 10}, "720p", "video"), 3_200_000)
+        self.assertEqual(estimate_download_size({"duration": 10}, "best", "audio_mp3"), 240_000)
+
+    def test_estimate_download_size_scales_to_clip_section(self):
+        info = {"filesize_approx": 36_000, "duration": 3600}
+
+        self.assertEqual(estimate_download_size(info, section={"start": 60, "end": 180}), 1_200)
+        self.assertEqual(estimate_download_size({"duration": 3600}, "720p", "video", {"start": 0, "end": 10}), 3_200_000)
+
+    def test_parse_clip_timestamp(self):
+        self.assertEqual(parse_clip_timestamp("90"), 90)
+        self.assertEqual(parse_clip_timestamp("1:02:03.5"), 3723.5)
+        self.assertEqual(parse_clip_timestamp(12), 12)
+        for invalid in ("1:2:3:4", "abc", "-5", "nan"):
+            with self.assertRaises(ValueError):
+                parse_clip_timestamp(invalid)
+
+    def test_parse_clip_sections_accepts_ranges_and_chapters(self):
+        info = {"duration": 600, "chapters": [{"title": "Intro", "start_time": 0, "end_time": 45}]}
+
+        sections = parse_clip_sections("1:00-2:00, 9:00-", ["intro"], info)
+
+        self.assertEqual(sections, [
+            {"start": 60, "end": 120, "title": None},
+            {"start": 540, "end": 600, "title": None},
+            {"start": 0, "end": 45, "title": "Intro"},
+        ])
+        with self.assertRaises(ValueError):
+            parse_clip_sections([["2:00", "1:00"]], None, info)
+        with self.assertRaises(ValueError):
+            parse_clip_sections(None, ["Outro"], info)
+
+    def test_low_free_space_only_evicts_when_minimum_is_configured(self):
+        nearly_full = SimpleNamespace(total=10 ** 12, used=10 ** 12, free=1024)
+        with patch("app.STORAGE_QUOTA_BYTES", 0), patch("app.shutil.disk_usage", return_value=nearly_full):
+            with patch("app.STORAGE_MIN_FREE_BYTES", 0):
+                self.assertEqual(get_bytes_to_evict(), 0)
+            with patch("app.STORAGE_MIN_FREE_BYTES", 4096):
+                self.assertEqual(get_bytes_to_evict(), 3072)
+
+    def test_select_eviction_candidates_picks_least_recently_used_first(self):
+        old = History("old.mp4", 100, last_accessed_at=datetime(2026, 1, 1))
+        recent = History("recent.mp4", 100, last_accessed_at=datetime(2026, 3, 1))
+        never_accessed = History("never.mp4", 100, completed_at=datetime(2026, 2, 1))
+        evicted = History("gone.mp4", 100, completed_at=datetime(2025, 1, 1), media_evicted_at=datetime(2026, 1, 2))
+
+        candidates = select_eviction_candidates([recent, never_accessed, old, evicted], 150, max_items=5)
+
+        self.assertEqual([h.filename for h in candidates], ["old.mp4", "never.mp4"])
+
+    def test_select_eviction_candidates_respects_batch_size(self):
+        histories = [History(f"{i}.mp4", 10, completed_at=datetime(2026, 1, i + 1)) for i in range(5)]
+
+        candidates = select_eviction_candidates(histories, 1000, max_items=2)
+
+        self.assertEqual([h.filename for h in candidates], ["0.mp4", "1.mp4"])
+
+    def test_cleanup_job_work_dir_only_removes_its_own_job(self):
+        with TemporaryDirectory() as temp_dir:
+            cancelled = Path(temp_dir) / "video_1"
+            running = Path(temp_dir) / "video_2"
+            cancelled.mkdir()
+            running.mkdir()
+            (cancelled / "clip.mp4.part").write_text("partial", encoding="utf-8")
+            (running / "other.mp4.part").write_text("partial", encoding="utf-8")
+
+            removed = cleanup_job_work_dir("video_1", temp_dir)
+
+            self.assertEqual(removed, 1)
+            self.assertFalse(cancelled.exists())
+            self.assertTrue((running / "other.mp4.part").exists())
+
+    def test_move_job_output_into_place_moves_finished_file(self):
+        with TemporaryDirectory() as temp_dir:
+            work_dir = Path(temp_dir) / ".jobs" / "video_1"
+            work_dir.mkdir(parents=True)
+            finished = work_dir / "clip.mp4"
+            finished.write_text("media", encoding="utf-8")
+
+            filename = move_job_output_into_place(str(finished), temp_dir)
+
+            self.assertEqual(filename, "clip.mp4")
+            self.assertEqual((Path(temp_dir) / "clip.mp4").read_text(encoding="utf-8"), "media")
+            self.assertFalse(finished.exists())
+
+    def test_move_job_output_into_place_does_not_overwrite_existing_file(self):
+        with TemporaryDirectory() as temp_dir:
+            (Path(temp_dir) / "clip.mp4").write_text("720p", encoding="utf-8")
+            (Path(temp_dir) / "clip (1).mp4").write_text("mp3", encoding="utf-8")
+            work_dir = Path(temp_dir) / ".jobs" / "video_2"
+            work_dir.mkdir(parents=True)
+            finished = work_dir / "clip.mp4"
+            finished.write_text("1080p", encoding="utf-8")
+
+            filename = move_job_output_into_place(str(finished), temp_dir)
+
+            self.assertEqual(filename, "clip (2).mp4")
+            self.assertEqual((Path(temp_dir) / "clip.mp4").read_text(encoding="utf-8"), "720p")
+            self.assertEqual((Path(temp_dir) / "clip (2).mp4").read_text(encoding="utf-8"), "1080p")
+            self.assertFalse(finished.exists())
+
+    def test_drain_queue_batch_collects_pending_items_up_to_limit(self):
+        queue = Queue()
+        for item in range(5):
+            queue.put(item)
+
+        self.assertEqual(drain_queue_batch(queue, 3, timeout=0.01), [0, 1, 2])
+        self.assertEqual(drain_queue_batch(queue, 3, timeout=0.01), [3, 4])
+        self.assertEqual(drain_queue_batch(queue, 3, timeout=0.01), [])
+
+    def test_extract_youtube_video_id_supports_common_url_forms(self):
+        self.assertEqual(extract_youtube_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=3"), "dQw4w9WgXcQ")
+        self.assertEqual(extract_youtube_video_id("https://youtu.be/dQw4w9WgXcQ"), "dQw4w9WgXcQ")
+        self.assertEqual(extract_youtube_video_id("https://www.youtube.com/shorts/abcDEF12345"), "abcDEF12345")
+        self.assertIsNone(extract_youtube_video_id("https://example.com/video"))
+
+    def test_fetch_thumbnail_reuses_cached_file(self):
+        with TemporaryDirectory() as temp_dir:
+            cached = Path(temp_dir) / "dQw4w9WgXcQ.jpg"
+            cached.write_bytes(b"jpeg")
+
+            path = fetch_thumbnail("dQw4w9WgXcQ", "http://invalid.invalid/thumb.jpg", folder=temp_dir)
+
+            self.assertEqual(Path(path), cached)
+
+    def test_fetch_thumbnail_only_caches_unconverted_original_when_jpeg(self):
+        with TemporaryDirectory() as temp_dir:
+            # 가짜 이미지라 ffmpeg 변환은 (설치 여부와 관계없이) 실패하고 원본 판별로 넘어간다
+            webp = Path(temp_dir) / "source.webp"
+            webp.write_bytes(b"RIFF\x00\x00\x00\x00WEBPVP8 ")
+            jpeg = Path(temp_dir) / "source.jpg"
+            jpeg.write_bytes(b"\xff\xd8\xff\xe0not really a jpeg")
+
+            with self.assertRaises(Exception):
+                fetch_thumbnail("url-webp00", webp.as_uri(), folder=temp_dir)
+            self.assertFalse((Path(temp_dir) / "url-webp00.jpg").exists())
+
+            path = fetch_thumbnail("url-jpeg00", jpeg.as_uri(), folder=temp_dir)
+            self.assertEqual(Path(path).read_bytes(), jpeg.read_bytes())
+
+    def test_thumbnail_key_falls_back_to_source_url_hash(self):
+        self.assertEqual(get_thumbnail_key("https://youtu.be/dQw4w9WgXcQ", "https://i.ytimg.com/x.webp"), "dQw4w9WgXcQ")
+
+        key = get_thumbnail_key("https://example.com/video", "https://example.com/thumb.png")
+        self.assertTrue(key.startswith("url-"))
+        self.assertEqual(key, get_thumbnail_key("https://example.com/other", "https://example.com/thumb.png"))
+        self.assertIsNone(get_thumbnail_key("https://example.com/video"))
+
+    def test_thumbnail_route_only_fetches_known_keys(self):
+        store = LocalJobStore()
+        store.create("video_1", {"status": "queued", "thumbnail_key": "dQw4w9WgXcQ"})
+        with TemporaryDirectory() as temp_dir, patch("app.THUMBNAIL_FOLDER", temp_dir), \
+                patch("app.job_store", store), patch("app.history_has_thumbnail_key", return_value=False), \
+                patch("app.enqueue_thumbnail_fetch") as enqueue:
+            unknown = app.test_client().get("/thumbnails/AAAAAAAAAAA.jpg")
+            known = app.test_client().get("/thumbnails/dQw4w9WgXcQ.jpg")
+
+        self.assertEqual(unknown.status_code, 404)
+        self.assertEqual(known.status_code, 404)
+        self.assertEqual(known.headers["Cache-Control"], "no-store")
+        enqueue.assert_called_once_with("dQw4w9WgXcQ")
+
+    def test_build_list_etag_changes_with_version_and_query(self):
+        etag = build_list_etag("3-7", ("all", "", 1, 20))
+        self.assertEqual(etag, build_list_etag("3-7", ("all", "", 1, 20)))
+        self.assertNotEqual(etag, build_list_etag("4-7", ("all", "", 1, 20)))
+        self.assertNotEqual(etag, build_list_etag("3-7", ("all", "", 2, 20)))
+
+    def test_not_modified_list_response_keeps_cache_headers(self):
+        etag = build_list_etag("3-7", ("all", "", 1, 20))
+        with patch("app.get_change_version", return_value="3-7"):
+            response = app.test_client().get("/api/downloads", headers={"If-None-Match": f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], f'"{etag}"')
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+
+    def test_paginate_segments_only_reads_rows_on_the_page(self):
+        reads = []
+
+        def segment(name, count):
+            def fetch(offset, limit):
+                reads.append((name, offset, limit))
+                return [f"{name}{index}" for index in range(offset, offset + limit)]
+            return (count, fetch)
+
+        items = paginate_segments([segment("a", 2), segment("b", 3), segment("c", 100)], 3, 4)
+
+        self.assertEqual(items, ["b1", "b2", "c0", "c1"])
+        self.assertEqual(reads, [("b", 1, 2), ("c", 0, 2)])
+        self.assertEqual(paginate_segments([segment("a", 2)], -2, 2), [])
+
+    def test_compress_json_response_only_for_large_gzip_requests(self):
+        payload = {"items": [{"video_title": f"video {index}"} for index in range(200)]}
+        with app.test_request_context(headers={"Accept-Encoding": "gzip, deflate"}):
+            response = compress_json_response(app.json.response(payload))
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", response.headers["Vary"])
+            self.assertEqual(json.loads(gzip.decompress(response.get_data())), payload)
+
+            small = compress_json_response(app.json.response({"ok": True}))
+            self.assertNotIn("Content-Encoding", small.headers)
+
+        with app.test_request_context():
+            response = compress_json_response(app.json.response(payload))
+            self.assertNotIn("Content-Encoding", response.headers)
+
+
+def make_format(format_id, ext, vcodec, acodec, height=None, tbr=0):
+    return {"format_id": format_id, "ext": ext, "vcodec": vcodec, "acodec": acodec, "height": height, "tbr": tbr}
+
+
+YOUTUBE_FORMATS = [
+    make_format("18", "mp4", "avc1.42001E", "mp4a.40.2", 360, 500),
+    make_format("140", "m4a", "none", "mp4a.40.2", tbr=128),
+    make_format("251", "webm", "none", "opus", tbr=140),
+    make_format("136", "mp4", "avc1.4d401f", "none", 720, 2000),
+    make_format("248", "webm", "vp9", "none", 1080, 3000),
+    make_format("137", "mp4", "avc1.640028", "none", 1080, 4000),
+]
+
+
+class FormatPlannerTests(unittest.TestCase):
+    def test_progressive_format_is_used_when_it_meets_requested_height(self):
+        plan = plan_download_format(YOUTUBE_FORMATS, "360p")
+
+        self.assertEqual((plan["kind"], plan["format_ids"]), ("progressive", ["18"]))
+
+    def test_merge_pairs_codecs_that_share_a_container(self):
+        self.assertEqual(plan_download_format(YOUTUBE_FORMATS, "720p")["format_ids"], ["136", "140"])
+
+        webm_only = [fmt for fmt in YOUTUBE_FORMATS if fmt["format_id"] in ("248", "251", "140")]
+        plan = plan_download_format(webm_only, "best")
+        self.assertEqual((plan["kind"], plan["format_ids"], plan["ext"]), ("merge_copy", ["248", "251"], "webm"))
+
+    def test_incompatible_codecs_fall_back_to_mkv_merge(self):
+        formats = [make_format("248", "webm", "vp9", "none", 1080, 3000), make_format("140", "m4a", "none", "mp4a.40.2", tbr=128)]
+
+        plan = plan_download_format(formats, "1080p")
+
+        self.assertEqual((plan["kind"], plan["ext"]), ("merge", "mkv"))
+
+    def test_no_format_within_height_cap_defers_to_format_string(self):
+        above_cap = [fmt for fmt in YOUTUBE_FORMATS if fmt["format_id"] != "18"]
+        self.assertIsNone(plan_download_format(above_cap, "360p"))
+
+        plan = {}
+        formats = [dict(fmt, url=f"https://example.com/{fmt['format_id']}", protocol="https") for fmt in above_cap]
+        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+            selected = list(build_planned_format_selector("360p", "video", plan)(
+                {"formats": formats, "incomplete_formats": False, "has_merged_format": False}, ydl
+            ))
+
+        self.assertEqual(plan["kind"], "selector")
+        self.assertEqual(selected, [])
+
+    def test_fallback_selector_uses_the_calling_instance_params(self):
+        # 높이 정보가 없어 계획을 세울 수 없으면 호출한 인스턴스의 params(merge_output_format)로 고른다
+        formats = [
+            {"format_id": "v", "ext": "mp4", "vcodec": "avc1", "acodec": "none", "url": "https://example.com/v", "protocol": "https"},
+            {"format_id": "a", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "url": "https://example.com/a", "protocol": "https"},
+        ]
+        ctx = {"formats": formats, "incomplete_formats": False, "has_merged_format": False}
+
+        with yt_dlp.YoutubeDL({"quiet": True, "merge_output_format": "mkv"}) as ydl:
+            selected = list(build_planned_format_selector("best", "video", {})(ctx, ydl))
+
+        self.assertEqual([(fmt["format_id"], fmt["ext"]) for fmt in selected], [("v+a", "mkv")])
+
+    def test_audio_without_audio_only_streams_defers_to_format_string(self):
+        formats = [fmt for fmt in YOUTUBE_FORMATS if fmt["format_id"] in ("18", "136", "137", "248")]
+
+        self.assertIsNone(plan_download_format(formats, "best", "audio_mp3"))
+        self.assertIsNone(plan_download_format(formats, "best", "audio_m4a"))
+
+    def test_audio_m4a_prefers_m4a_stream(self):
+        plan = plan_download_format(YOUTUBE_FORMATS, "best", "audio_m4a")
+
+        self.assertEqual((plan["kind"], plan["format_ids"]), ("audio", ["140"]))
+        self.assertIsNone(plan_download_format([], "best"))
+
+
+class PostprocessTests(unittest.TestCase):
+    def test_get_postprocess_kind_only_for_merges_and_mp3(self):
+        self.assertEqual(get_postprocess_kind("video", ["a.f137.mp4", "a.f140.m4a"]), "merge")
+        self.assertEqual(get_postprocess_kind("audio_mp3", ["a.f251.webm"]), "mp3")
+        self.assertIsNone(get_postprocess_kind("video", ["a.f18.mp4"]))
+
+    def test_merge_command_is_a_stream_copy(self):
+        command = build_postprocess_command("merge", ["v.mp4", "a.m4a"], "out.mp4")
+
+        self.assertEqual(command[command.index("-c") + 1], "copy")
+        self.assertEqual(command[-1], "out.mp4")
+        self.assertIn("libmp3lame", build_postprocess_command("mp3", ["a.webm"], "out.mp3"))
+
+
+class ConcurrencyControllerTests(unittest.TestCase):
+    def test_classify_download_error(self):
+        self.assertEqual(classify_download_error('ERROR: HTTP Error 429: Too Many Requests'), 'throttled')
+        self.assertEqual(classify_download_error('ERROR: unable to download video data: HTTP Error 403: Forbidden'), 'forbidden')
+        self.assertEqual(classify_download_error('ERROR: The read operation timed out'), 'network')
+        self.assertEqual(classify_download_error('ERROR: Video unavailable'), 'fatal')
+        self.assertEqual(
+            classify_download_error('ERROR: Unable to download webpage: HTTP Error 404: Not Found'), 'fatal'
+        )
+        self.assertEqual(
+            classify_download_error('ERROR: Unable to download webpage: HTTP Error 503: Service Unavailable'), 'network'
+        )
+
+    def test_retry_delay_is_jittered_within_cap(self):
+        delays = [get_download_retry_delay(attempt, base_seconds=2, max_seconds=10) for attempt in range(6)]
+        self.assertTrue(all(1 <= delay <= 10 for delay in delays))
+
+    def test_throttling_halves_limit_and_success_regrows_it(self):
+        controller = ConcurrencyController(4, cooldown_seconds=60, slow_bytes_per_second=0)
+        controller.record_error('throttled')
+        controller.record_error('throttled')  # 같은 쿨다운 안의 신호는 한 번만 반영
+        snapshot = controller.snapshot()
+        self.assertEqual(snapshot['limit'], 2)
+        self.assertEqual(snapshot['reason'], 'throttled')
+        self.assertGreater(snapshot['backoff_seconds'], 0)
+
+        for _ in range(6):
+            controller.record_success()
+        self.assertEqual(controller.snapshot()['limit'], 4)
+        self.assertEqual(controller.snapshot()['reason'], 'recovered')
+
+    def test_fatal_errors_do_not_shrink_limit(self):
+        controller = ConcurrencyController(3, cooldown_seconds=0)
+        controller.record_error('fatal')
+        controller.record_error('network')
+        self.assertEqual(controller.snapshot()['limit'], 3)
+        self.assertEqual(controller.snapshot()['errors'], {'fatal': 1, 'network': 1})
+
+    def test_slow_throughput_shrinks_limit_only_with_concurrent_downloads(self):
+        controller = ConcurrencyController(4, cooldown_seconds=0, slow_bytes_per_second=1000)
+        controller.acquire()
+        controller.record_success(10)
+        self.assertEqual(controller.limit, 4)
+        controller.acquire()
+        controller.record_success(10)
+        self.assertEqual(controller.limit, 2)
+        self.assertEqual(controller.snapshot()['reason'], 'slow_throughput')
+
+
+class YoutubeDLPoolTests(unittest.TestCase):
+    def test_pooled_instance_is_reused_without_changing_params(self):
+        pool = YoutubeDLPool({'info': {'quiet': True, 'extract_flat': True}}, max_idle=2, max_uses=10)
+
+        with pool.session('info') as ydl:
+            first = ydl
+            params = dict(ydl.params)
+
+        with pool.session('info') as ydl:
+            self.assertIs(ydl, first)
+            self.assertEqual(ydl.params, params)
+            self.assertTrue(ydl.params['extract_flat'])
+            # 앱이 쓰는 공개 API만 남아 있는지 (yt-dlp 업그레이드 시 확인)
+            for name in ('extract_info', 'build_format_selector', 'prepare_filename'):
+                self.assertTrue(callable(getattr(ydl, name)))
+
+        self.assertEqual(pool.snapshot()['created'], 1)
+        self.assertEqual(pool.snapshot()['reused'], 1)
+
+    def test_download_instance_runs_each_job_in_its_work_dir(self):
+        with TemporaryDirectory() as temp_dir:
+            pool = YoutubeDLPool(
+                {"download": {"quiet": True, "outtmpl": "%(title)s.f%(format_id)s.%(ext)s"}},
+                max_idle=2, max_uses=10, download_profiles=("download",), context_folder=str(Path(temp_dir) / "ytdl"),
+            )
+            info = {
+                "id": "x", "title": "clip", "extractor": "generic", "extractor_key": "Generic",
+                "webpage_url": "https://example.com/x",
+                "formats": [
+                    {"format_id": "18", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a", "url": "https://example.com/18", "protocol": "https"},
+                    {"format_id": "22", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a", "url": "https://example.com/22", "protocol": "https"},
+                ],
+            }
+            callers = []
+
+            def pick(format_id):
+                def select(ctx, ydl):
+                    callers.append(ydl)
+                    yield next(fmt for fmt in ctx["formats"] if fmt["format_id"] == format_id)
+                return select
+
+            first_dir = Path(temp_dir) / "jobs" / "first"
+            first_dir.mkdir(parents=True)
+            (first_dir / "clip.f18.mp4.part").write_bytes(b"partial")
+            with pool.session("download", work_dir=str(first_dir), format=pick("18")) as ydl:
+                first = ydl
+                params = dict(ydl.params)
+                result = ydl.process_ie_result(dict(info), download=False)
+                path = YoutubeDLPool.job_path(ydl, ydl.prepare_filename(result), str(first_dir))
+                # 이어받을 부분 파일이 인스턴스 디렉터리로 옮겨져 있다
+                self.assertTrue((Path(ydl.params["paths"]["home"]) / "clip.f18.mp4.part").exists())
+            self.assertEqual(result["format_id"], "18")
+            self.assertEqual(Path(path), first_dir / "clip.f18.mp4")
+            self.assertTrue((first_dir / "clip.f18.mp4.part").exists())
+
+            second_dir = Path(temp_dir) / "jobs" / "second"
+            with pool.session("download", work_dir=str(second_dir), format=pick("22")) as ydl:
+                self.assertIs(ydl, first)
+                self.assertEqual(ydl.params, params)
+                result = ydl.process_ie_result(dict(info), download=False)
+            self.assertEqual(result["format_id"], "22")
+            self.assertTrue(second_dir.is_dir())
+            self.assertEqual(callers, [first, first])
+            self.assertEqual(pool.snapshot()["reused"], 1)
+
+    def test_instance_is_discarded_after_error_or_max_uses(self):
+        pool = YoutubeDLPool({'info': {'quiet': True}}, max_idle=2, max_uses=1)
+        with pool.session('info') as ydl:
+            pass
+        self.assertEqual(pool.snapshot()['idle'], {'info': 0})
+
+        pool.max_uses = 10
+        with self.assertRaises(RuntimeError):
+            with pool.session('info') as ydl:
+                raise RuntimeError('extract failed')
+        self.assertEqual(pool.snapshot()['idle'], {'info': 0})
+        self.assertEqual(pool.snapshot()['discarded'], 2)
+
+
+class ZipExportTests(unittest.TestCase):
+    def test_zip_stream_is_stored_and_chunked(self):
+        with TemporaryDirectory() as temp_dir:
+            media = Path(temp_dir) / "clip.mp4"
+            media.write_bytes(b"v" * 5000)
+            subtitle = Path(temp_dir) / "1_clip.srt"
+            subtitle.write_text("1\n00:00:00,000 --> 00:00:01,000\nhi\n", encoding="utf-8")
+
+            chunks = list(iter_zip_stream(
+                [("clip.mp4", str(media)), ("1_clip.srt", str(subtitle)), ("gone.mp4", str(Path(temp_dir) / "gone.mp4"))],
+                chunk_bytes=1024,
+            ))
+
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 1024 + 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(archive.namelist(), ["clip.mp4", "1_clip.srt"])
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+            self.assertEqual(archive.read("clip.mp4"), b"v" * 5000)
+            self.assertIsNone(archive.testzip())
+
+    def test_collect_export_entries_uses_safe_paths(self):
+        with TemporaryDirectory() as download_dir, TemporaryDirectory() as subtitle_dir:
+            (Path(download_dir) / "a.mp4").write_bytes(b"a")
+            (Path(download_dir) / "b.mp4").write_bytes(b"b")
+            (Path(subtitle_dir) / "1_a.srt").write_text("x", encoding="utf-8")
+            histories = [
+                SimpleNamespace(filename="a.mp4", subtitle_filename="1_a.srt", media_evicted_at=None),
+                SimpleNamespace(filename="../b.mp4", subtitle_filename=None, media_evicted_at=None),
+                SimpleNamespace(filename="b.mp4", subtitle_filename=None, media_evicted_at=datetime(2024, 1, 1)),
+            ]
+            with patch("app.DOWNLOAD_FOLDER", download_dir), patch("app.SUBTITLE_FOLDER", subtitle_dir):
+                entries = collect_export_entries(histories)
+                media_only = collect_export_entries(histories, include_subtitles=False)
+
+        self.assertEqual([name for name, _ in entries], ["a.mp4", "1_a.srt"])
+        self.assertEqual([name for name, _ in media_only], ["a.mp4"])
+
+
+class ProfilingTests(unittest.TestCase):
+    def test_collapsed_stacks_are_sorted_lines(self):
+        text = format_collapsed_stacks({"worker;b;c": 3, "MainThread;a": 1})
+
+        self.assertEqual(text, "MainThread;a 1\nworker;b;c 3\n")
+
+    def test_sampler_roots_stacks_at_thread_name(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait, name="sample-target", daemon=True)
+        thread.start()
+        try:
+            counts = sample_thread_stacks(0.05, 0.01, exclude_thread_ids={threading.get_ident()})
+        finally:
+            stop.set()
+            thread.join()
+
+        stacks = [stack for stack in counts if stack.startswith("sample-target;")]
+        self.assertTrue(stacks)
+        self.assertTrue(all("MainThread" not in stack for stack in counts))
+        self.assertIn("wait (threading.py:", stacks[0])
+
+    def test_profile_endpoint_is_hidden_when_disabled(self):
+        with patch("app.PROFILING_ENABLED", False):
+            response = app.test_client().get("/api/debug/profile?seconds=1")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_profile_endpoint_without_token_is_loopback_only(self):
+        with patch("app.PROFILING_ENABLED", True), patch("app.PROFILING_TOKEN", ""):
+            remote = app.test_client().get(
+                "/api/debug/profile?seconds=0", environ_base={"REMOTE_ADDR": "203.0.113.5"}
+            )
+            local = app.test_client().get("/api/debug/profile?seconds=0", environ_base={"REMOTE_ADDR": "127.0.0.1"})
+
+        self.assertEqual(remote.status_code, 403)
+        # 접근은 허용되고 seconds 검증에서 멈춘다
+        self.assertEqual(local.status_code, 400)
+
+    def test_profile_endpoint_requires_matching_token(self):
+        with patch("app.PROFILING_ENABLED", True), patch("app.PROFILING_TOKEN", "secret"):
+            wrong = app.test_client().get("/api/debug/profile?seconds=0&token=nope")
+            right = app.test_client().get(
+                "/api/debug/profile?seconds=0", headers={"X-Profiling-Token": "secret"},
+                environ_base={"REMOTE_ADDR": "203.0.113.5"},
+            )
+
+        self.assertEqual(wrong.status_code, 403)
+        self.assertEqual(right.status_code, 400)
+
+
+class JobStoreTests(unittest.TestCase):
+    def exercise_store(self, store):
+        store.create("video_1", {"status": "queued", "progress": 0, "timeline": [["queued", 1.0]]})
+        store.create("playlist_1", {"video_ids": ["video_1"]}, kind="playlist")
+        version = store.version()
+        store.update("video_1", status="downloading", progress=40)
+        self.assertNotEqual(store.version(), version)
+
+        self.assertEqual(store.get("video_1")["status"], "downloading")
+        self.assertEqual(store.get("video_1")["timeline"], [["queued", 1.0]])
+        self.assertEqual([job_id for job_id, _ in store.items()], ["video_1"])
+        self.assertEqual([job_id for job_id, _ in store.items(kind="playlist")], ["playlist_1"])
+
+        self.assertFalse(store.is_cancel_requested("video_1"))
+        self.assertTrue(store.request_cancel("video_1"))
+        self.assertTrue(store.is_cancel_requested("video_1"))
+        self.assertFalse(store.request_cancel("missing"))
+
+        self.assertNotIn("finished_at", store.get("video_1"))
+        store.update("video_1", status="cancelled")
+        self.assertIsInstance(store.get("video_1")["finished_at"], float)
+
+        self.assertTrue(store.delete("video_1"))
+        self.assertIsNone(store.get("video_1"))
+        self.assertTrue(store.is_cancel_requested("video_1"))
+
+    def test_local_job_store(self):
+        self.exercise_store(LocalJobStore())
+
+    def test_sqlite_job_store_is_shared_between_instances(self):
+        with TemporaryDirectory() as temp_dir:
+            path = str(Path(temp_dir) / "jobs.db")
+            self.exercise_store(SqliteJobStore(path))
+
+            web, worker = SqliteJobStore(path), SqliteJobStore(path)
+            web.create("video_2", {"status": "queued"})
+            worker.update("video_2", progress=75)
+            web.request_cancel("video_2")
+
+            self.assertEqual(web.get("video_2")["progress"], 75)
+            self.assertTrue(worker.is_cancel_requested("video_2"))
+
+
+class RetentionTests(unittest.TestCase):
+    def test_selects_expired_and_overflow_records(self):
+        records = [("old", 100.0), ("new", 990.0), ("newer", 995.0), ("newest", 999.0), ("unstamped", None)]
+
+        selected = select_retention_candidates(records, now=1000.0, max_age_seconds=60, max_items=2)
+
+        self.assertEqual(sorted(selected), ["new", "old", "unstamped"])
+
+    def test_keeps_everything_within_limits(self):
+        records = [("a", 990.0), ("b", 995.0)]
+
+        self.assertEqual(select_retention_candidates(records, now=1000.0, max_age_seconds=60, max_items=5), [])
+
+
+class JobQueueTests(unittest.TestCase):
+    def test_claim_leases_jobs_in_priority_order(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            queue.enqueue("subtitle", {"history_id": 1}, priority=1)
+            queue.enqueue("subtitle", {"history_id": 2}, priority=0)
+            queue.enqueue("download", {"video_id": "video_1"})
+
+            first = queue.claim("subtitle", "node-a")
+            second = queue.claim("subtitle", "node-b")
+
+            self.assertEqual(first[1], {"history_id": 2})
+            self.assertEqual(second[1], {"history_id": 1})
+            self.assertIsNone(queue.claim("subtitle", "node-c"))
+            self.assertEqual(queue.count("download"), 1)
+
+    def test_expired_lease_is_reclaimed_and_stale_owner_cannot_complete(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            queue.enqueue("download", {"video_id": "video_1"})
+
+            queue_id, _ = queue.claim("download", "node-a", lease_seconds=-1)
+            reclaimed = queue.claim("download", "node-b")
+            queue.complete(queue_id, "node-a")
+
+            self.assertEqual(reclaimed[0], queue_id)
+            self.assertEqual(queue.count("download", statuses=("leased",)), 1)
+
+            queue.complete(queue_id, "node-b")
+            self.assertEqual(queue.count("download"), 0)
+
+    def test_reclaimed_lease_fences_previous_owner(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            queue.enqueue("download", {"video_id": "video_1"})
+
+            queue_id, _ = queue.claim("download", "node-a/1", lease_seconds=-1)
+            queue.claim("download", "node-a/2")
+
+            self.assertFalse(queue.holds_lease(queue_id, "node-a/1"))
+            self.assertEqual(queue.heartbeat([queue_id], "node-a/1"), [])
+            self.assertFalse(queue.complete(queue_id, "node-a/1"))
+            self.assertTrue(queue.holds_lease(queue_id, "node-a/2"))
+            self.assertTrue(queue.complete(queue_id, "node-a/2"))
+
+    def test_exhausted_jobs_are_reported_when_failed(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            failed = []
+            queue.exhausted_handler = lambda kind, payload: failed.append((kind, payload))
+            queue.enqueue("download", {"video_id": "video_1"})
+
+            with patch("app.JOB_MAX_ATTEMPTS", 1):
+                queue.claim("download", "node-a/1", lease_seconds=-1)
+                self.assertIsNone(queue.claim("download", "node-b/1"))
+
+            self.assertEqual(failed, [("download", {"video_id": "video_1"})])
+            self.assertEqual(queue.count("download", statuses=("failed",)), 1)
+
+    def test_not_before_delays_claim(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            queue.enqueue("download", {"video_id": "video_1", "attempt": 1}, not_before=time.time() + 60)
+
+            self.assertIsNone(queue.claim("download", "node-a/1"))
+            with patch("app.time.time", return_value=time.time() + 61):
+                self.assertEqual(queue.claim("download", "node-a/2")[1], {"video_id": "video_1", "attempt": 1})
+
+    def test_advertised_nodes_report_capacity(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            queue.advertise_node("node-a", download_slots=3, stt_slots=1, active_downloads=2)
+
+            nodes = queue.live_nodes()
+
+            self.assertEqual(len(nodes), 1)
+            self.assertEqual(nodes[0]["download_slots"], 3)
+            self.assertEqual(nodes[0]["active_downloads"], 2)
+
+
+class FakeHttpResponse(io.BytesIO):
+    """urlopen 응답 흉내 (with 문에서 쓴다)"""
+
+
+def route_to_test_client(request_obj, timeout=None):
+    """WorkerApiClient의 HTTP 요청을 Flask 테스트 클라이언트로 보낸다."""
+    response = app.test_client().post(
+        request_obj.full_url.replace("http://web", ""),
+        data=request_obj.data,
+        headers=dict(request_obj.header_items()),
+    )
+    if response.status_code >= 400:
+        raise urllib.error.HTTPError(
+            request_obj.full_url, response.status_code, response.status, {}, io.BytesIO(response.data)
+        )
+    return FakeHttpResponse(response.data)
+
+
+class WorkerApiTests(unittest.TestCase):
+    def test_remote_worker_leases_jobs_and_updates_state_over_http(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            store = SqliteJobStore(str(Path(temp_dir) / "jobs.db"))
+            store.create("video_1", {"status": "queued"})
+            queue.enqueue("download", {"video_id": "video_1"})
+            client = WorkerApiClient("http://web", "secret")
+            remote_queue = WorkerApiProxy(client, "queue")
+            remote_store = WorkerApiProxy(client, "store")
+
+            with patch("app.job_queue", queue), patch("app.job_store", store), \
+                    patch("app.WORKER_API_TOKEN", "secret"), \
+                    patch("app.urllib.request.urlopen", side_effect=route_to_test_client):
+                queue_id, job = remote_queue.claim("download", "remote-1/1")
+                remote_store.update(job["video_id"], status="downloading", progress=40)
+                remote_queue.advertise_node("remote-1", 2, 0, hostname="box-b", pid=7, transport="api")
+                self.assertTrue(remote_queue.complete(queue_id, "remote-1/1"))
+
+            self.assertEqual(store.get("video_1")["progress"], 40)
+            self.assertEqual(queue.count("download"), 0)
+            self.assertEqual(
+                [(node["hostname"], node["transport"]) for node in queue.live_nodes()], [("box-b", "api")]
+            )
+
+    def test_worker_api_rejects_wrong_token_and_unknown_methods(self):
+        with TemporaryDirectory() as temp_dir:
+            queue = SqliteJobQueue(str(Path(temp_dir) / "jobs.db"))
+            with patch("app.job_queue", queue), patch("app.WORKER_API_TOKEN", "secret"), \
+                    patch("app.urllib.request.urlopen", side_effect=route_to_test_client):
+                with self.assertRaisesRegex(Exception, "HTTP 403"):
+                    WorkerApiProxy(WorkerApiClient("http://web", "wrong"), "queue").count("download")
+                with self.assertRaisesRegex(Exception, "HTTP 400"):
+                    WorkerApiClient("http://web", "secret").call("queue", "_connect")
+            with patch("app.job_queue", queue), patch("app.WORKER_API_TOKEN", ""):
+                response = app.test_client().post("/api/worker/rpc", json={"target": "queue", "method": "count"})
+                self.assertEqual(response.status_code, 404)
+
+        with self.assertRaises(AttributeError):
+            WorkerApiProxy(WorkerApiClient("http://web", "secret"), "queue").path
+
+    def test_forwarded_history_dates_are_restored(self):
+        completed_at = datetime(2026, 1, 2, 3, 4, 5)
+        operation = json.loads(json.dumps(
+            {"action": "insert", "fields": {"completed_at": completed_at, "video_title": "2026-01-02"}},
+            default=encode_worker_api_value,
+        ))
+
+        fields = decode_history_write(operation)["fields"]
+
+        self.assertEqual(fields["completed_at"], completed_at)
+        self.assertEqual(fields["video_title"], "2026-01-02")
+
+
+if __name__ == "__main__":
+    unittest.main()
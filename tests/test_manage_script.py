@@ -35,6 +35,15 @@ class ManageScriptTests(unittest.TestCase):
         self.assertIn("logs)", script)
         self.assertIn("health)", script)
 
+    def test_script_declares_worker_actions(self):
+        script = Path("manage.sh").read_text(encoding="utf-8")
+
+        self.assertIn("start_worker()", script)
+        self.assertIn("stop_worker()", script)
+        self.assertIn("start-worker)", script)
+        self.assertIn("stop-worker)", script)
+        self.assertIn('WORKER_FILE="worker.py"', script)
+
     def test_health_checks_configured_local_port(self):
         with TemporaryDirectory() as temp_dir:
             root = self.copy_project_files(temp_dir)
@@ -1,18 +1,54 @@
+import math
+import sys
+import threading
+import time
 import unittest
+import wave
+from array import array
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
 
 from app import (
+    build_subtitle_cue_index,
+    build_stt_audio_command,
     build_subtitle_filename,
+    build_subtitle_search_query,
     build_srt_from_word_timestamps,
     collect_word_timestamps_from_results,
     cleanup_orphan_subtitle_files,
     delete_subtitle_file_for_history,
+    find_cue_range_for_window,
     format_stt_exception,
     format_srt_timestamp,
+    LocalJobStore,
+    MemoryBudget,
+    ProgressiveSubtitleWriter,
+    SubtitleJobCancelled,
+    SubtitleJobControl,
+    estimate_stt_memory_bytes,
+    get_partial_subtitle_filename,
+    get_subtitle_schedule_key,
+    get_stt_audio_format,
+    get_subtitle_cue_index,
     get_subtitle_status,
+    iter_wav_chunks,
+    parse_srt_cues,
+    plan_stt_memory,
     parse_stt_grpc_server,
+    read_subtitle_cues,
+    run_cancellable_process,
     read_subtitle_text_for_history,
+    remap_trimmed_time,
+    remap_word_timestamps,
+    replace_subtitle_search_index,
+    resolve_subtitle_file,
+    search_subtitle_cues,
+    shift_word_timestamps,
+    trim_silence_from_wav,
+    wait_for_stt_future,
 )
 
 
@@ -130,6 +166,323 @@ class SubtitleHelperTests(unittest.TestCase):
             with self.assertRaises(FileNotFoundError):
                 read_subtitle_text_for_history(History(), temp_dir)
 
+    def write_cues(self, path, count):
+        blocks = [
+            f"{number + 1}\n{format_srt_timestamp(number * 2000)} --> {format_srt_timestamp(number * 2000 + 1500)}\n문장 {number}\n"
+            for number in range(count)
+        ]
+        path.write_text("\n".join(blocks), encoding="utf-8")
+
+    def test_read_subtitle_cues_reads_only_requested_index_range(self):
+        with TemporaryDirectory() as temp_dir:
+            subtitle_path = Path(temp_dir) / "video.srt"
+            self.write_cues(subtitle_path, 10)
+
+            index = build_subtitle_cue_index(str(subtitle_path))
+            cues = read_subtitle_cues(str(subtitle_path), index, 3, 5)
+
+            self.assertEqual(len(index["offsets"]), 10)
+            self.assertEqual([cue["index"] for cue in cues], [3, 4])
+            self.assertEqual(cues[0]["start_ms"], 6000)
+            self.assertEqual(cues[0]["end_ms"], 7500)
+            self.assertEqual(cues[1]["text"], "문장 4")
+            self.assertEqual(read_subtitle_cues(str(subtitle_path), index, 8, 50)[-1]["text"], "문장 9")
+
+    def test_find_cue_range_for_window_includes_overlapping_cue(self):
+        with TemporaryDirectory() as temp_dir:
+            subtitle_path = Path(temp_dir) / "video.srt"
+            self.write_cues(subtitle_path, 10)
+            index = build_subtitle_cue_index(str(subtitle_path))
+
+            self.assertEqual(find_cue_range_for_window(index, 4500, 9000), (2, 5))
+            self.assertEqual(find_cue_range_for_window(index, 5600, None), (3, 10))
+
+    def test_get_subtitle_cue_index_rebuilds_when_file_changes(self):
+        with TemporaryDirectory() as temp_dir:
+            subtitle_path = Path(temp_dir) / "video.srt"
+            self.write_cues(subtitle_path, 3)
+            first = get_subtitle_cue_index(str(subtitle_path))
+            self.assertIs(first, get_subtitle_cue_index(str(subtitle_path)))
+
+            self.write_cues(subtitle_path, 5)
+            self.assertEqual(len(get_subtitle_cue_index(str(subtitle_path))["offsets"]), 5)
+
+    def test_parse_srt_cues_joins_multiline_text(self):
+        cues = parse_srt_cues("1\n00:00:01,000 --> 00:00:02,000\n첫 줄\n둘째 줄\n\n2\n00:01:00,500 --> 00:01:01,000\nnext\n")
+
+        self.assertEqual(cues, [(1000, "첫 줄 둘째 줄"), (60500, "next")])
+
+    def test_build_subtitle_search_query_uses_quoted_prefix_terms(self):
+        self.assertEqual(build_subtitle_search_query(' 서울 "hello" '), '"서울"* "hello"*')
+        self.assertEqual(build_subtitle_search_query('  "" '), "")
+
+    def test_subtitle_search_index_is_replaced_per_history(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE subtitle_cue_fts USING fts5(text, history_id UNINDEXED, start_ms UNINDEXED)"
+            ))
+            replace_subtitle_search_index(1, [(1000, "서울에서 만났습니다"), (5000, "hello world")], conn)
+            replace_subtitle_search_index(2, [(2000, "world tour")], conn)
+
+            results = search_subtitle_cues("world", connection=conn)
+            self.assertEqual({(result["history_id"], result["start_ms"]) for result in results}, {(1, 5000), (2, 2000)})
+            self.assertEqual(search_subtitle_cues("서울", connection=conn)[0]["snippet"], "«서울에서» 만났습니다")
+
+            replace_subtitle_search_index(1, [(3000, "다시 생성된 자막")], conn)
+            self.assertEqual([result["history_id"] for result in search_subtitle_cues("world", connection=conn)], [2])
+            self.assertEqual(search_subtitle_cues("다시", connection=conn)[0]["start_ms"], 3000)
+
+    def write_wav(self, path, segments, sample_rate=8000):
+        """segments: (초, 소리 여부) 목록으로 테스트용 WAV 생성"""
+        samples = array("h")
+        for seconds, voiced in segments:
+            for position in range(int(seconds * sample_rate)):
+                samples.append(int(8000 * math.sin(position * 0.3)) if voiced else 0)
+        with wave.open(str(path), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(samples.tobytes())
+
+    def test_trim_silence_from_wav_drops_long_silence_and_keeps_offsets(self):
+        with TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "input.wav"
+            trimmed = Path(temp_dir) / "trimmed.wav"
+            self.write_wav(source, [(2, False), (1, True), (0.5, False), (0.5, True), (2, False), (1, True), (3, False)])
+
+            offset_map, metrics = trim_silence_from_wav(
+                str(source), str(trimmed), frame_ms=100, min_silence_ms=1000, padding_ms=200
+            )
+
+            # 짧은 무음(0.5초)은 유지하고 긴 무음은 앞뒤 0.2초만 남긴다
+            self.assertEqual(offset_map, [(0, 1800), (2400, 5800)])
+            self.assertEqual(metrics["audio_seconds"], 10.0)
+            self.assertEqual(metrics["sent_seconds"], 3.8)
+            self.assertEqual(metrics["skipped_seconds"], 6.2)
+            with wave.open(str(trimmed), "rb") as wav_file:
+                self.assertEqual(wav_file.getnframes(), 38 * 800)
+
+    def test_trim_silence_from_wav_reports_no_speech(self):
+        with TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "input.wav"
+            self.write_wav(source, [(1, False)])
+
+            offset_map, metrics = trim_silence_from_wav(str(source), str(Path(temp_dir) / "out.wav"), frame_ms=100)
+
+            self.assertIsNone(offset_map)
+            self.assertEqual(metrics["skipped_seconds"], 1.0)
+
+    def test_remap_word_timestamps_restores_original_media_time(self):
+        offset_map = [(0, 1800), (2400, 5800)]
+
+        self.assertEqual(remap_trimmed_time(offset_map, 200), 2000)
+        self.assertEqual(remap_trimmed_time(offset_map, 2500), 5900)
+        self.assertEqual(
+            remap_word_timestamps([{"word": "hi", "start_time": 2400, "end_time": 2600}], offset_map),
+            [{"word": "hi", "start_time": 5800, "end_time": 6000}],
+        )
+        words = [{"word": "hi", "start_time": 1, "end_time": 2}]
+        self.assertIs(remap_word_timestamps(words, None), words)
+
+    def test_build_stt_audio_command_uses_requested_codec(self):
+        flac_command = build_stt_audio_command("in.mp4", "out.flac", "flac")
+        opus_command = build_stt_audio_command("in.wav", "out.ogg", "ogg_opus")
+
+        self.assertEqual(flac_command[flac_command.index("-c:a") + 1], "flac")
+        self.assertEqual(opus_command[opus_command.index("-c:a") + 1], "libopus")
+        self.assertEqual(flac_command[-1], "out.flac")
+        self.assertIn("-vn", flac_command)
+
+    def test_get_stt_audio_format_rejects_unknown_encoding(self):
+        self.assertEqual(get_stt_audio_format("ogg_opus")[2], "OGGOPUS")
+        with self.assertRaises(ValueError):
+            get_stt_audio_format("mp3")
+
+    def test_plan_stt_memory_routes_large_or_unknown_jobs_to_chunks(self):
+        budget = estimate_stt_memory_bytes(3600)
+
+        self.assertEqual(plan_stt_memory(1800, budget_bytes=budget), (None, estimate_stt_memory_bytes(1800)))
+        self.assertEqual(plan_stt_memory(4 * 3600, budget_bytes=budget, chunk_seconds=600), (600, estimate_stt_memory_bytes(600)))
+        self.assertEqual(plan_stt_memory(None, budget_bytes=budget, chunk_seconds=600)[0], 600)
+        self.assertEqual(plan_stt_memory(4 * 3600, budget_bytes=0), (None, 0))
+
+    def test_memory_budget_defers_jobs_until_budget_is_released(self):
+        budget = MemoryBudget(100)
+        budget.reserve(1, 70)
+        admitted = threading.Event()
+
+        def reserve_second():
+            budget.reserve(2, 50, "chunked")
+            admitted.set()
+
+        thread = threading.Thread(target=reserve_second)
+        thread.start()
+        self.assertFalse(admitted.wait(0.1))
+        self.assertEqual(budget.snapshot()["waiting_jobs"], 1)
+
+        budget.release(1)
+        self.assertTrue(admitted.wait(1))
+        thread.join()
+        snapshot = budget.snapshot()
+        self.assertEqual(snapshot["reserved_bytes"], 50)
+        self.assertEqual(snapshot["available_bytes"], 50)
+        self.assertEqual(snapshot["jobs"], [{"job_id": 2, "bytes": 50, "mode": "chunked"}])
+
+    def test_iter_wav_chunks_splits_audio_and_offsets_words(self):
+        with TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "input.wav"
+            self.write_wav(source, [(2.5, True)])
+
+            chunks = [(start_ms, Path(path).stat().st_size) for start_ms, path in iter_wav_chunks(str(source), 1, temp_dir)]
+
+            self.assertEqual([start_ms for start_ms, _ in chunks], [0, 1000, 2000])
+            self.assertLess(chunks[2][1], chunks[0][1])
+        self.assertEqual(
+            shift_word_timestamps([{"word": "a", "start_time": 10, "end_time": 20}], 1000),
+            [{"word": "a", "start_time": 1010, "end_time": 1020}],
+        )
+
+    def test_iter_wav_chunks_moves_boundaries_into_silence(self):
+        with TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "input.wav"
+            # 1초 경계 바로 앞(0.8~1.1초)에 쉼이 있는 음성
+            self.write_wav(source, [(0.8, True), (0.3, False), (1.5, True)])
+
+            chunks = list(iter_wav_chunks(str(source), 1, temp_dir, snap_seconds=0.5))
+
+            # 경계는 0.5초 검색 창 안 무음의 가운데로 옮겨지고, 무음이 없는 경계는 그대로 둔다
+            self.assertEqual([start_ms for start_ms, _ in chunks], [0, 890, 1890])
+            with wave.open(chunks[0][1], "rb") as wav_file:
+                self.assertEqual(wav_file.getnframes(), 7120)
+            unsnapped = list(iter_wav_chunks(str(source), 1, temp_dir, snap_seconds=0))
+            self.assertEqual([start_ms for start_ms, _ in unsnapped], [0, 1000, 2000])
+
+    def test_subtitle_job_control_detects_cancel_and_replacement(self):
+        store = LocalJobStore()
+        with patch("app.job_store", store):
+            store.create("subtitle-7", {"token": "first"}, kind="subtitle")
+            control = SubtitleJobControl(7, deadline=time.time() + 60, token="first")
+            control.check()
+            self.assertLessEqual(control.remaining(), 60)
+
+            store.create("subtitle-7", {"token": "second"}, kind="subtitle")
+            with self.assertRaises(SubtitleJobCancelled):
+                control.check()
+            control.finish()
+            self.assertIsNotNone(store.get("subtitle-7"))
+
+            replacement = SubtitleJobControl(7, token="second")
+            store.request_cancel("subtitle-7")
+            with self.assertRaises(SubtitleJobCancelled):
+                replacement.check()
+            replacement.finish()
+            self.assertIsNone(store.get("subtitle-7"))
+
+    def test_subtitle_job_control_enforces_deadline(self):
+        store = LocalJobStore()
+        with patch("app.job_store", store):
+            store.create("subtitle-8", {"token": "t"}, kind="subtitle")
+            with self.assertRaises(Exception) as context:
+                SubtitleJobControl(8, deadline=time.time() - 1, token="t").remaining()
+            self.assertNotIsInstance(context.exception, SubtitleJobCancelled)
+
+    def test_run_cancellable_process_kills_process_on_cancel(self):
+        class CancelAfterFirstPoll:
+            def check(self):
+                raise SubtitleJobCancelled("cancelled")
+
+        started_at = time.time()
+        with self.assertRaises(SubtitleJobCancelled):
+            run_cancellable_process([sys.executable, "-c", "import time; time.sleep(30)"], CancelAfterFirstPoll(), poll_seconds=0.05)
+        self.assertLess(time.time() - started_at, 5)
+
+        result = run_cancellable_process([sys.executable, "-c", "print('ok')"])
+        self.assertEqual((result.returncode, result.stdout.strip()), (0, "ok"))
+
+    def test_wait_for_stt_future_cancels_pending_request(self):
+        class PendingFuture:
+            cancelled = False
+
+            def done(self):
+                return False
+
+            def cancel(self):
+                self.cancelled = True
+
+        class Cancelled:
+            def check(self):
+                raise SubtitleJobCancelled("cancelled")
+
+        future = PendingFuture()
+        with self.assertRaises(SubtitleJobCancelled):
+            wait_for_stt_future(future, Cancelled(), poll_seconds=0.01)
+        self.assertTrue(future.cancelled)
+
+    def test_progressive_writer_appends_finalized_cues_and_matches_full_srt(self):
+        words = []
+        for sentence in range(12):
+            base = sentence * 2500
+            words += [
+                {"word": f"w{sentence}a", "start_time": base, "end_time": base + 400},
+                {"word": f"w{sentence}b", "start_time": base + 500, "end_time": base + 900},
+                {"word": "." if sentence % 3 == 0 else ",", "start_time": base + 900, "end_time": base + 900},
+            ]
+        # 청크 경계가 큐 중간에 걸리도록 나눈다
+        chunks = [words[:7], words[7:8], words[8:20], words[20:]]
+
+        with TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "1-video.partial.srt"
+            writer = ProgressiveSubtitleWriter(str(path))
+            written = [writer.add_words(chunk) for chunk in chunks]
+            partial_text = path.read_text(encoding="utf-8")
+            writer.finish()
+            final_text = path.read_text(encoding="utf-8")
+
+        self.assertGreater(written[0], 0)
+        self.assertTrue(build_srt_from_word_timestamps(words).startswith(partial_text))
+        self.assertEqual(final_text, build_srt_from_word_timestamps(words))
+        self.assertEqual(len(parse_srt_cues(final_text)), writer.cue_count)
+
+    def test_resolve_subtitle_file_serves_partial_while_processing(self):
+        class History:
+            id = 3
+            filename = "video.mp4"
+            subtitle_filename = "3-video.srt"
+            subtitle_status = "processing"
+
+        history = History()
+        with TemporaryDirectory() as temp_dir:
+            final_path = Path(temp_dir) / "3-video.srt"
+            final_path.write_text("old", encoding="utf-8")
+            partial_path = Path(temp_dir) / get_partial_subtitle_filename(3, "video.mp4")
+            partial_path.write_text("partial", encoding="utf-8")
+
+            self.assertEqual(resolve_subtitle_file(history, temp_dir), (str(partial_path), True))
+
+            partial_path.replace(final_path)
+            self.assertEqual(resolve_subtitle_file(history, temp_dir), (str(final_path), False))
+
+            history.subtitle_status = "none"
+            self.assertEqual(resolve_subtitle_file(history, temp_dir), (None, False))
+
+    def test_subtitle_schedule_key_is_shortest_first_with_aging(self):
+        short_now = get_subtitle_schedule_key("bulk", 60, 1000, aging_rate=1)
+        long_now = get_subtitle_schedule_key("bulk", 10800, 1000, aging_rate=1)
+        self.assertLess(short_now, long_now)
+
+        # 오래 기다린 긴 작업은 나중에 들어온 짧은 작업보다 앞선다
+        short_later = get_subtitle_schedule_key("bulk", 60, 1000 + 10800, aging_rate=1)
+        self.assertLess(long_now, short_later)
+
+        # 에이징이 우선순위 단계를 넘지는 않는다
+        interactive_later = get_subtitle_schedule_key("interactive", 10800, 1000 + 10 ** 6, aging_rate=1)
+        self.assertLess(interactive_later, short_now)
+
+        # 길이를 모르면 기본 길이로 본다
+        self.assertEqual(get_subtitle_schedule_key("bulk", None, 0, aging_rate=1),
+                         get_subtitle_schedule_key("bulk", 1800, 0, aging_rate=1))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -21,6 +21,14 @@ class TemplateUiTests(unittest.TestCase):
         self.assertIn("if (shouldAutoRefresh)", template)
         self.assertIn("function hasPendingWork(items)", template)
         self.assertIn("subtitleStatus === 'queued' || subtitleStatus === 'processing'", template)
+        self.assertIn("item.status === 'postprocessing'", template)
+
+    def test_subtitle_viewer_polls_partial_subtitles(self):
+        template = Path("templates/index.html").read_text(encoding="utf-8")
+
+        self.assertIn("subtitleStatus === 'processing' && progress > 0", template)
+        self.assertIn("if (data.partial && data.next_offset === null)", template)
+        self.assertIn("state.waiting", template)
 
 
 if __name__ == "__main__":
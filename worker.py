@@ -0,0 +1,9 @@
+"""독립 다운로드/자막 워커 진입점: python worker.py
+
+같은 호스트: WORKER_MODE=external, JOB_STATE_BACKEND=sqlite 설정에서 웹 프로세스와 같은 DB를 공유한다.
+다른 호스트: WORKER_API_URL, WORKER_API_TOKEN 설정으로 웹 프로세스의 워커 API를 거쳐 같은 큐를 쓴다.
+"""
+from app import run_worker_node
+
+if __name__ == '__main__':
+    run_worker_node()
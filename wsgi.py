@@ -0,0 +1,4 @@
+"""WSGI 진입점: gunicorn 'wsgi:application' 등으로 실행"""
+from app import create_app
+
+application = create_app()